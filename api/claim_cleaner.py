@@ -2,10 +2,67 @@
 
 # fix up a Claim payload (as from the /completed-claim/ endpoint)
 # for packaging. E.g. removes all the LOCAL_ properties.
+#
+# The payload is never modified. The cleaned claim shares every value
+# that did not need to change with the payload, and copies only the rest.
 
-import copy
+import itertools
 import re
 
+LOCAL_PREFIX = "LOCAL_"
+REMOVED = object()
+
+# Like SSN from idp in WhoAmI, editable SSN from claim FEIN and Alien Registration number have optional - delimiter,
+# but we always use them in packaged claims.
+# (pattern, replacement)
+SSN_NORMALIZER = (re.compile(r"^([0-9]{3})-?([0-9]{2})-?([0-9]{4})$"), r"\1-\2-\3")
+ALIEN_REGISTRATION_NUMBER_NORMALIZER = (
+    re.compile(r"^([0-9]{3})-?([0-9]{3})-?([0-9]{3})$"),
+    r"\1-\2-\3",
+)
+FEIN_NORMALIZER = (re.compile(r"^([0-9]{2})-?([0-9]{7})$"), r"\1-\2")
+
+
+def normalize(normalizer, value):
+    pattern, replacement = normalizer
+    return pattern.sub(replacement, value)
+
+
+# remove any key that startswith LOCAL_
+# and recurse into any object, or object in an array, similarly.
+# Returns "obj" itself if nothing was removed.
+def without_local_keys(obj):
+    cleaned = None
+    for index, (key, value) in enumerate(obj.items()):
+        if key.startswith(LOCAL_PREFIX):
+            cleaned_value = REMOVED
+        elif isinstance(value, dict):
+            cleaned_value = without_local_keys(value)
+        elif isinstance(value, list):
+            cleaned_value = list_without_local_keys(value)
+        else:
+            cleaned_value = value
+        if cleaned is None:
+            if cleaned_value is value:
+                continue
+            # first change, so copy what we have seen so far
+            cleaned = dict(itertools.islice(obj.items(), index))
+        if cleaned_value is not REMOVED:
+            cleaned[key] = cleaned_value
+    return obj if cleaned is None else cleaned
+
+
+def list_without_local_keys(items):
+    cleaned = None
+    for index, item in enumerate(items):
+        cleaned_item = without_local_keys(item) if isinstance(item, dict) else item
+        if cleaned is None:
+            if cleaned_item is item:
+                continue
+            cleaned = items[:index]
+        cleaned.append(cleaned_item)
+    return items if cleaned is None else cleaned
+
 
 class ClaimCleaner(object):
     def __init__(self, payload, whoami):
@@ -13,67 +70,54 @@ class ClaimCleaner(object):
         self.payload = payload
 
     def cleaned(self):
-        claim = copy.deepcopy(self.payload)
+        claim = {}
+        for key, value in self.payload.items():
+            # backwards compatability
+            if key.startswith(LOCAL_PREFIX) or key == "identity_provider":
+                continue
+            if isinstance(value, dict):
+                value = without_local_keys(value)
+            elif isinstance(value, list):
+                value = list_without_local_keys(value)
+            claim[key] = value
 
         # set values we receive from whoami
         # this is to guarantee that they come directly from the IdP
-        claim["idp_identity"] = self.whoami.as_identity()
+        identity = self.whoami.as_identity()
 
         # because "idp_identity" is a sub-schema that is also used standalone,
         # sync some values just in case.
         # use .get because this might be a partial claim being cleaned,
         # and the values in claim[] might not yet be set.
-        claim["idp_identity"]["swa_code"] = claim.get("swa_code")
-        claim["idp_identity"]["id"] = claim.get("id")
-        claim["idp_identity"]["claimant_id"] = claim.get("claimant_id")
-
-        # backwards compatability
-        # use pop() in case the key does not exist
-        claim.pop("identity_provider", None)
+        identity["swa_code"] = claim.get("swa_code")
+        identity["id"] = claim.get("id")
+        identity["claimant_id"] = claim.get("claimant_id")
+        claim["idp_identity"] = without_local_keys(identity)
 
-        # Like SSN from idp in WhoAmI, editable SSN from claim FEIN and Alien Registration number have optional - delimiter,
-        # but we always use them in packaged claims.
         if "ssn" in claim:
-            claim["ssn"] = re.sub(
-                r"^([0-9]{3})-?([0-9]{2})-?([0-9]{4})$",
-                r"\1-\2-\3",
-                claim["ssn"],
-            )
+            claim["ssn"] = normalize(SSN_NORMALIZER, claim["ssn"])
         if (
             "work_authorization" in claim
             and "alien_registration_number" in claim["work_authorization"]
         ):
-            claim["work_authorization"]["alien_registration_number"] = re.sub(
-                r"^([0-9]{3})-?([0-9]{3})-?([0-9]{3})$",
-                r"\1-\2-\3",
-                claim["work_authorization"]["alien_registration_number"],
+            work_authorization = claim["work_authorization"]
+            claim["work_authorization"] = dict(
+                work_authorization,
+                alien_registration_number=normalize(
+                    ALIEN_REGISTRATION_NUMBER_NORMALIZER,
+                    work_authorization["alien_registration_number"],
+                ),
             )
         if "employers" in claim:
-            for employer in claim["employers"]:
+            employers = claim["employers"]
+            for index, employer in enumerate(employers):
                 if "fein" in employer and employer["fein"]:
-                    employer["fein"] = re.sub(
-                        r"^([0-9]{2})-?([0-9]{7})$", r"\1-\2", employer["fein"]
-                    )
-
-        # remove any key that startswith LOCAL_
-        # and recurse into any object or array similarly.
-        def clean(claim):
-            cleaned_claim = {}
-            for key, value in claim.items():
-                if key.startswith("LOCAL_"):
-                    continue
-                if isinstance(value, dict):
-                    cleaned_claim[key] = clean(value)
-                elif isinstance(value, list):
-                    cleaned_list = []
-                    for item in value:
-                        if isinstance(item, dict):
-                            cleaned_list.append(clean(item))
-                        else:
-                            cleaned_list.append(item)
-                    cleaned_claim[key] = cleaned_list
-                else:
-                    cleaned_claim[key] = value
-            return cleaned_claim
-
-        return clean(claim)
+                    fein = normalize(FEIN_NORMALIZER, employer["fein"])
+                    if fein == employer["fein"]:
+                        continue
+                    if employers is claim["employers"]:
+                        employers = list(employers)
+                    employers[index] = dict(employer, fein=fein)
+            claim["employers"] = employers
+
+        return claim
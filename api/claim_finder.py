@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from .models import Claim, SWA, Claimant
+from .swa_registry import swa_registry
 from .whoami import WhoAmI
 import logging
 
@@ -23,7 +24,7 @@ class ClaimFinder(object):
         except Claimant.DoesNotExist:
             return False
         try:
-            self.swa = SWA.objects.get(code=self.whoami.swa.code)
+            self.swa = swa_registry.get(self.whoami.swa.code, active=False)
         except SWA.DoesNotExist:
             return False
         return True
@@ -45,11 +46,8 @@ class ClaimFinder(object):
         # revisit once we have multiple claims per claimant.
         return (
             Claim.objects.filter(swa=self.swa, claimant=self.claimant)
-            .exclude(
-                events__category__in=[
-                    Claim.EventCategories.FETCHED,
-                    Claim.EventCategories.RESOLVED,
-                ]
+            .without_events(
+                Claim.EventCategories.FETCHED, Claim.EventCategories.RESOLVED
             )
             .order_by("created_at")
             .last()
@@ -59,4 +57,9 @@ class ClaimFinder(object):
         if not self.ok:
             return False
 
-        return Claim.objects.filter(claimant=self.claimant).order_by("-created_at")
+        return (
+            Claim.objects.filter(claimant=self.claimant)
+            .select_related("swa")
+            .prefetch_related("events")
+            .order_by("-created_at")
+        )
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# transactional outbox for completed Claim artifacts.
+# The intent to write is committed to the db first, then the S3 writes happen
+# with no transaction open, then the result is recorded in a short transaction.
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.claim_encryption import (
+    SymmetricClaimEncryptor,
+    RotatableSymmetricClaimDecryptor,
+    symmetric_encryption_key,
+)
+from core.claim_storage import (
+    BUCKET_TYPE_ARCHIVE,
+    BUCKET_TYPE_SWA,
+    ClaimBucket,
+    ClaimFanoutWriter,
+    encode_archive_payload,
+)
+from .models import Claim, ClaimOutboxEntry
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = ClaimOutboxEntry.StatusOptions.PENDING
+DONE = ClaimOutboxEntry.StatusOptions.DONE
+FAILED = ClaimOutboxEntry.StatusOptions.FAILED
+
+
+class ClaimOutbox(object):
+    """
+    Requires "claim" Claim
+    """
+
+    def __init__(self, claim):
+        self.claim = claim
+
+    def pending(self):
+        return self.claim.outbox_entries.filter(status=PENDING)
+
+    def add_completed(self, packaged_payload, archive_payload):
+        entries = [
+            self.__entry(BUCKET_TYPE_SWA, packaged_payload),
+            self.__entry(BUCKET_TYPE_ARCHIVE, archive_payload),
+        ]
+        with transaction.atomic():
+            # a re-submitted Claim supersedes any earlier intent
+            self.pending().delete()
+            ClaimOutboxEntry.objects.bulk_create(entries)
+
+    def __entry(self, bucket_type, payload):
+        # the archive payload is plaintext, so never store it as-is.
+        encrypted_payload = (
+            SymmetricClaimEncryptor(
+                {"id": str(self.claim.uuid), "payload": payload},
+                symmetric_encryption_key(),
+                # the payload is cleared once written, so no DataKey is needed
+                envelope=False,
+            )
+            .packaged_claim()
+            .as_json()
+        )
+        return ClaimOutboxEntry(
+            claim=self.claim,
+            bucket_type=bucket_type,
+            path=self.claim.completed_payload_path(),
+            payload=encrypted_payload,
+        )
+
+    def __payload(self, entry):
+        payload = RotatableSymmetricClaimDecryptor(
+            entry.payload, settings.CLAIM_SECRET_KEY
+        ).decrypt()["payload"]
+        if entry.bucket_type == BUCKET_TYPE_ARCHIVE:
+            return encode_archive_payload(payload)
+        return payload
+
+    # returns True if every entry has been written and the Claim is completed
+    def flush(self):
+        entries = list(self.pending())
+        if not entries:
+            return self.claim.is_completed()
+
+        # an entry that cannot be decrypted counts as a failed attempt, like a failed write
+        writes, errors = {}, {}
+        for entry in entries:
+            try:
+                writes[entry.id] = (
+                    ClaimBucket(entry.bucket_type),
+                    entry.path,
+                    self.__payload(entry),
+                )
+            except Exception as error:
+                logger.exception(error)
+                errors[entry.id] = str(error) or error.__class__.__name__
+        writer = ClaimFanoutWriter(self.claim, list(writes.values()))
+        writer.put()
+        errors.update(zip(writes.keys(), writer.errors))
+
+        with transaction.atomic():
+            # lock the Claim so concurrent flushes cannot both complete it
+            claim = Claim.objects.select_for_update().get(id=self.claim.id)
+            # a concurrent flush may have recorded these entries, or a re-submitted
+            # Claim superseded them, since they were read.
+            current = {entry.id: entry for entry in self.pending().select_for_update()}
+            stored = []
+            for entry in entries:
+                entry = current.get(entry.id)
+                if not entry:
+                    continue
+                error = errors[entry.id]
+                # update() does not touch updated_at, which reconcile_claim_outbox reads
+                changes = {"attempts": entry.attempts + 1, "updated_at": timezone.now()}
+                if error:
+                    changes["last_error"] = error[:255]
+                    if changes["attempts"] >= settings.CLAIM_OUTBOX_MAX_ATTEMPTS:
+                        changes["status"] = FAILED
+                else:
+                    changes.update(status=DONE, payload="", last_error="")
+                    stored.append(writes[entry.id])
+                ClaimOutboxEntry.objects.filter(id=entry.id, status=PENDING).update(
+                    **changes
+                )
+            writer.claim = claim
+            if stored:
+                writer.create_stored_events(stored)
+            # any entry pending, or any of these not written
+            if self.claim.outbox_entries.filter(
+                Q(status=PENDING)
+                | (Q(id__in=[entry.id for entry in entries]) & ~Q(status=DONE))
+            ).exists():
+                return False
+            if not claim.is_completed():
+                claim.events.create(category=Claim.EventCategories.COMPLETED)
+        return True
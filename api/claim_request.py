@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 # turn a HTTPRequest into a valid Claim
-from django.http import JsonResponse
+from core.json_codec import FastJsonResponse, json_decode
 from .models import SWA, Claim, Claimant
+from .swa_registry import swa_registry
 from .whoami import WhoAmI
-import json
 
 
 MISSING_SWA_CODE = "missing swa_code"
@@ -18,7 +18,7 @@ class ClaimRequest(object):
         self.response = None
         self.error = None
         self.whoami = WhoAmI.from_dict(request.session.get("whoami"))
-        self.payload = json.loads(request.body.decode("utf-8"))
+        self.payload = json_decode(request.body)
         self.__build_request()
         self.is_complete = "is_complete" in self.payload and self.payload["is_complete"]
 
@@ -28,28 +28,28 @@ class ClaimRequest(object):
             swa_code = self.payload["swa_code"]
         else:
             self.error = MISSING_SWA_CODE
-            self.response = JsonResponse({"error": MISSING_SWA_CODE}, status=400)
+            self.response = FastJsonResponse({"error": MISSING_SWA_CODE}, status=400)
             return
 
         try:
-            self.swa = SWA.objects.get(code=swa_code)
+            self.swa = swa_registry.get(swa_code, active=False)
         except SWA.DoesNotExist:
             self.error = INVALID_SWA_CODE
-            self.response = JsonResponse({"error": INVALID_SWA_CODE}, status=404)
+            self.response = FastJsonResponse({"error": INVALID_SWA_CODE}, status=404)
             return
 
         if "claimant_id" in self.payload:
             claimant_id = self.payload["claimant_id"]
         else:
             self.error = MISSING_CLAIMANT_ID
-            self.response = JsonResponse({"error": MISSING_CLAIMANT_ID}, status=400)
+            self.response = FastJsonResponse({"error": MISSING_CLAIMANT_ID}, status=400)
             return
 
         try:
             self.claimant = Claimant.objects.get(idp_user_xid=claimant_id)
         except Claimant.DoesNotExist:
             self.error = INVALID_CLAIMANT_ID
-            self.response = JsonResponse({"error": INVALID_CLAIMANT_ID}, status=404)
+            self.response = FastJsonResponse({"error": INVALID_CLAIMANT_ID}, status=404)
             return
 
         claim_id = None
@@ -61,7 +61,7 @@ class ClaimRequest(object):
                 self.claim = Claim.objects.get(uuid=claim_id)
                 if self.claim.claimant != self.claimant:
                     self.error = INVALID_CLAIM_ID
-                    self.response = JsonResponse(
+                    self.response = FastJsonResponse(
                         {"error": INVALID_CLAIM_ID}, status=401
                     )
                     return
@@ -71,5 +71,5 @@ class ClaimRequest(object):
                 self.payload["id"] = str(self.claim.uuid)
         except Claim.DoesNotExist:
             self.error = INVALID_CLAIM_ID
-            self.response = JsonResponse({"error": INVALID_CLAIM_ID}, status=404)
+            self.response = FastJsonResponse({"error": INVALID_CLAIM_ID}, status=404)
             return
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+# ClaimValidator results (errors_as_dict()), keyed by a digest of the cleaned claim
+# and the schema it was validated against, so an unchanged claim is validated once.
+# Results live in a bounded in-process LRU, and optionally in a shared Django cache.
+
+from collections import OrderedDict
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from core.json_codec import json_encode
+import hashlib
+import json
+import logging
+import threading
+from .claim_validator import ClaimValidator, DEFAULT_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "claim-validation"
+
+
+# the files named by "$ref"s, e.g. "file:schemas/identity-v1.0.json#/definitions/x"
+def schema_refs(schema):
+    if isinstance(schema, dict):
+        for key, value in schema.items():
+            if key == "$ref" and isinstance(value, str):
+                ref = value.split("#")[0]
+                if ref.startswith("file:"):
+                    yield ref[len("file:") :]  # noqa: E203
+            else:
+                yield from schema_refs(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            yield from schema_refs(value)
+
+
+# a digest of the schema and every schema it references
+@lru_cache(maxsize=None)
+def schema_version(schema_name):
+    digest = hashlib.sha256()
+    pending = [f"schemas/{schema_name}.json"]
+    seen = set()
+    while pending:
+        path = pending.pop(0)
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(settings.BASE_DIR / path, "rb") as f:
+            content = f.read()
+        digest.update(path.encode("utf-8"))
+        digest.update(content)
+        pending.extend(schema_refs(json.loads(content)))
+    return digest.hexdigest()[:16]
+
+
+def claim_digest(claim):
+    return hashlib.sha256(json_encode(claim).encode("utf-8")).hexdigest()
+
+
+# quacks like a ClaimValidator for the views
+class ClaimValidationResult(object):
+    def __init__(self, errors, schema_url):
+        self.errors = errors
+        self.schema_url = schema_url
+        self.valid = len(errors) == 0
+
+    def errors_as_dict(self):
+        return self.errors
+
+
+class ClaimValidationCache(object):
+    def __init__(self, max_size=None, cache_alias=None, timeout=None):
+        self.max_size = (
+            settings.CLAIM_VALIDATION_CACHE_SIZE if max_size is None else max_size
+        )
+        self.cache_alias = (
+            settings.CLAIM_VALIDATION_CACHE_ALIAS
+            if cache_alias is None
+            else cache_alias
+        )
+        self.timeout = (
+            settings.CLAIM_VALIDATION_CACHE_TIMEOUT if timeout is None else timeout
+        )
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, claim, schema_name=DEFAULT_SCHEMA):
+        return ":".join(
+            [KEY_PREFIX, schema_name, schema_version(schema_name), claim_digest(claim)]
+        )
+
+    def get(self, key):
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                return self.results[key]
+        if not self.cache_alias:
+            return None
+        try:
+            errors_json = caches[self.cache_alias].get(key)
+        except Exception as error:
+            logger.exception(error)
+            return None
+        if errors_json is None:
+            return None
+        errors = json.loads(errors_json)
+        self.remember(key, errors)
+        return errors
+
+    def set(self, key, errors):
+        self.remember(key, errors)
+        if not self.cache_alias:
+            return
+        try:
+            caches[self.cache_alias].set(key, json.dumps(errors), self.timeout)
+        except Exception as error:
+            logger.exception(error)
+
+    def remember(self, key, errors):
+        if self.max_size < 1:
+            return
+        with self.lock:
+            self.results[key] = errors
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+    def validate(
+        self,
+        claim,
+        schema_name=DEFAULT_SCHEMA,
+        base_url="https://unemployment.dol.gov",
+    ):
+        key = self.key(claim, schema_name)
+        errors = self.get(key)
+        if errors is None:
+            claim_validator = ClaimValidator(
+                claim, schema_name=schema_name, base_url=base_url
+            )
+            # round trip so cached and fresh results look the same
+            errors = json.loads(json.dumps(claim_validator.errors_as_dict()))
+            self.set(key, errors)
+        return ClaimValidationResult(errors, f"{base_url}/schemas/{schema_name}.json")
+
+    # record that "claim" is valid without validating it,
+    # e.g. a valid claim marked with server generated validated_at and $schema.
+    def mark_valid(self, claim, schema_name=DEFAULT_SCHEMA):
+        self.set(self.key(claim, schema_name), {})
+
+
+claim_validation_cache = ClaimValidationCache()
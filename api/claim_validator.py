@@ -3,6 +3,7 @@ from jsonschema.validators import validator_for
 from jsonschema.exceptions import ValidationError
 from jsonschema import FormatChecker
 from django.conf import settings
+from core.instrumentation import timed
 import jsonref
 from datetime import datetime
 
@@ -17,10 +18,11 @@ class ClaimValidator(object):
         schema_name=DEFAULT_SCHEMA,
         base_url="https://unemployment.dol.gov",
     ):
-        self.schema = self.read_schema(schema_name)
         self.schema_url = f"{base_url}/schemas/{schema_name}.json"
         self.claim = claim_payload
-        self.valid = self.validate()
+        with timed("schema_validation", schema_name):
+            self.schema = self.read_schema(schema_name)
+            self.valid = self.validate()
 
     def read_schema(self, schema_name):
         schema_path = settings.BASE_DIR / "schemas" / f"{schema_name}.json"
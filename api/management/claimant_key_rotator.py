@@ -24,14 +24,19 @@ class ClaimantKeyRotator(object):
 
     def rotate(self):
         rotator = SymmetricKeyRotator(self.old_key, self.new_key)
-        total_rotated = 0
+        total_rotated = rotator.rotate_data_keys()
         for claimant in self.find_claimants():
-            with transaction.atomic():
-                total_rotated += rotator.rotate_artifacts_for_claimant(claimant)
-                claimant.encryption_key_hash = self.new_key_hash
-                claimant.save()
+            total_rotated += self.rotate_claimant(claimant, rotator)
         return total_rotated
 
+    def rotate_claimant(self, claimant, rotator=None):
+        rotator = rotator or SymmetricKeyRotator(self.old_key, self.new_key)
+        with transaction.atomic():
+            rotated = rotator.rotate_artifacts_for_claimant(claimant)
+            claimant.encryption_key_hash = self.new_key_hash
+            claimant.save()
+        return rotated
+
     def find_claimants(self):
         queryset = Claimant.objects.filter(
             encryption_key_hash=self.old_key_hash
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from api.models import SWA
+from swa.tasks import archive_completed_claims
+
+
+class Command(BaseCommand):
+    help = "Queue a batch archive of newly completed claims for each active SWA"
+
+    def handle(self, *args, **options):
+        for swa in SWA.active.all():
+            archive_completed_claims.delay(swa.code)
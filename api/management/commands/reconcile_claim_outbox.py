@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import ClaimOutboxEntry
+from api.tasks import flush_claim_outbox
+
+
+class Command(BaseCommand):
+    help = "Retry claim artifact writes that were interrupted or failed"
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            seconds=settings.CLAIM_OUTBOX_RECONCILE_AFTER
+        )
+        claim_ids = (
+            ClaimOutboxEntry.objects.filter(
+                status=ClaimOutboxEntry.StatusOptions.PENDING, updated_at__lt=cutoff
+            )
+            .values_list("claim_id", flat=True)
+            .distinct()
+        )
+        for claim_id in claim_ids:
+            flush_claim_outbox.delay(claim_id)
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+from datetime import timedelta
 from django.core.management.base import BaseCommand
-from api.management.claimant_key_rotator import ClaimantKeyRotator
+from api.management.key_rotation_engine import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    KeyRotationEngine,
+)
+from api.management.storage_key_rotator import StorageKeyRotator
 from core.claim_encryption import (
     symmetric_encryption_key,
 )
@@ -12,11 +18,72 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("old_key", nargs=1, type=str, help="old CLAIM_SECRET_KEY")
         parser.add_argument("new_key", nargs=1, type=str, help="new CLAIM_SECRET_KEY")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Estimate the work to be done, without rotating anything",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of claimants per batch",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=DEFAULT_WORKERS,
+            help="Number of batches (or objects, with --from-storage) to rotate concurrently",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            help="File to record progress in. An interrupted rotation resumes from it",
+        )
+        parser.add_argument(
+            "--from-storage",
+            action="store_true",
+            help="Find artifacts to rotate by listing the bucket instead of querying the db",
+        )
 
     def handle(self, *args, **options):
-        ckr = ClaimantKeyRotator(
-            old_key=symmetric_encryption_key(options["old_key"][0]),
-            new_key=symmetric_encryption_key(options["new_key"][0]),
+        old_key = symmetric_encryption_key(options["old_key"][0])
+        new_key = symmetric_encryption_key(options["new_key"][0])
+        if options["from_storage"]:
+            rotator = StorageKeyRotator(
+                old_key,
+                new_key,
+                workers=options["workers"],
+                report=print,
+                dry_run=options["dry_run"],
+            )
+            total_rotated = rotator.rotate()
+            if options["dry_run"]:
+                print("{} artifacts and data keys to rotate".format(total_rotated))
+            else:
+                print("{} artifacts rotated".format(total_rotated))
+            return
+        engine = KeyRotationEngine(
+            old_key=old_key,
+            new_key=new_key,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            checkpoint_path=options["checkpoint"],
+            report=print,
         )
-        total_rotated = ckr.rotate()
+        if options["dry_run"]:
+            estimate = engine.estimate()
+            print("{} claimants to rotate".format(estimate["claimants"]))
+            print("{} data keys to re-wrap".format(estimate["data_keys"]))
+            print("up to {} artifacts to re-encrypt".format(estimate["artifacts"]))
+            if estimate["estimated_seconds"] is not None:
+                print(
+                    "{:.3f}s per artifact read and re-encrypted, about {} with {} workers".format(
+                        estimate["seconds_per_artifact"],
+                        timedelta(seconds=int(estimate["estimated_seconds"])),
+                        options["workers"],
+                    )
+                )
+            return
+        total_rotated = engine.rotate()
         print("{} artifacts rotated".format(total_rotated))
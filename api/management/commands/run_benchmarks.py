@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from jwcrypto.common import json_encode
+from core.benchmarks import SUITES, compare
+import importlib
+import json
+
+
+class Command(BaseCommand):
+    help = "Run offline microbenchmarks and print the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "suites",
+            nargs="*",
+            type=str,
+            help="Benchmark suites to run (default all): {}".format(", ".join(SUITES)),
+        )
+        parser.add_argument("--number", type=int, default=10, help="Calls per timing")
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Timings per benchmark"
+        )
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            help="Payload sizes in bytes (default 5KB, 50KB and 500KB), or numbers of claims for claim_queries",
+        )
+        parser.add_argument("--output", type=str, help="File to write the JSON to")
+        parser.add_argument(
+            "--compare",
+            type=str,
+            help="JSON file of a previous run (e.g. on another commit) to compare medians with",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="With --compare, fail if any median is this much slower, e.g. 0.25 for 25%%",
+        )
+
+    def handle(self, *args, **options):
+        suites = options["suites"] or list(SUITES)
+        for suite in suites:
+            if suite not in SUITES:
+                raise CommandError("Unknown benchmark suite {}".format(suite))
+
+        results = []
+        for suite in suites:
+            results += importlib.import_module(SUITES[suite]).run(
+                sizes=options["sizes"],
+                number=options["number"],
+                repeat=options["repeat"],
+            )
+        output = {"results": results}
+        regressions = []
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                output["comparison"] = compare(results, json.load(fh)["results"])
+            if options["max_regression"] is not None:
+                regressions = [
+                    "{} {} is {:.0%} slower".format(
+                        result["name"], json_encode(result["params"]), result["change"]
+                    )
+                    for result in output["comparison"]
+                    if result["change"] > options["max_regression"]
+                ]
+        output = json_encode(output)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
+        if regressions:
+            raise CommandError("\n".join(regressions))
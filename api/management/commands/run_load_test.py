@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.json_codec import json_encode
+from api.management.load_test import (
+    DEFAULT_AUTOSAVES,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_JOURNEYS,
+    DEFAULT_SWA_CODE,
+    LoadTest,
+)
+
+
+class Command(BaseCommand):
+    help = "Run end-to-end claimant journeys and print per-endpoint latencies as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--journeys",
+            type=int,
+            default=DEFAULT_JOURNEYS,
+            help="Number of claimant journeys",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help="Number of journeys run at once",
+        )
+        parser.add_argument(
+            "--autosaves",
+            type=int,
+            default=DEFAULT_AUTOSAVES,
+            help="Number of partial claim autosaves per journey",
+        )
+        parser.add_argument(
+            "--base-url",
+            type=str,
+            help="URL of a local service sharing this database (default in-process)",
+        )
+        parser.add_argument(
+            "--swa-code",
+            type=str,
+            default=DEFAULT_SWA_CODE,
+            help="Code of the SWA created (or re-keyed) for the journeys",
+        )
+        parser.add_argument("--output", type=str, help="File to write the JSON to")
+
+    def handle(self, *args, **options):
+        if not options["base_url"] and not settings.ENABLE_TEST_LOGIN:
+            raise CommandError("In-process journeys require ENABLE_TEST_LOGIN=true")
+
+        results = LoadTest(
+            journeys=options["journeys"],
+            concurrency=options["concurrency"],
+            autosaves=options["autosaves"],
+            base_url=options["base_url"],
+            swa_code=options["swa_code"],
+            report=lambda message: self.stderr.write(message),
+        ).run()
+        output = json_encode(results)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from api.management.load_data_generator import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_EVENTS_PER_CLAIM,
+    DEFAULT_WORKERS,
+    MIN_EVENTS_PER_CLAIM,
+    LoadDataGenerator,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic Claimants, Claims, ClaimantFiles and Events for load tests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--claims", type=int, default=10000, help="Number of Claims to create"
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed. The same seed creates the same rows",
+        )
+        parser.add_argument(
+            "--events-per-claim",
+            type=int,
+            default=DEFAULT_EVENTS_PER_CLAIM,
+            help="Number of Events per Claim, at least {}".format(MIN_EVENTS_PER_CLAIM),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of Claims per batch",
+        )
+        parser.add_argument(
+            "--as-of",
+            type=datetime.fromisoformat,
+            help=(
+                "ISO 8601 datetime the generated history leads up to "
+                "(default a fixed date derived from --seed)"
+            ),
+        )
+        parser.add_argument(
+            "--artifacts",
+            action="store_true",
+            help="Also write encrypted claim and claimant file artifacts to storage",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=DEFAULT_WORKERS,
+            help="Number of artifacts to write concurrently",
+        )
+
+    def handle(self, *args, **options):
+        if options["events_per_claim"] < MIN_EVENTS_PER_CLAIM:
+            raise CommandError(
+                "--events-per-claim must be at least {}".format(MIN_EVENTS_PER_CLAIM)
+            )
+        generator = LoadDataGenerator(
+            claims=options["claims"],
+            seed=options["seed"],
+            events_per_claim=options["events_per_claim"],
+            batch_size=options["batch_size"],
+            as_of=options["as_of"],
+            write_artifacts=options["artifacts"],
+            workers=options["workers"],
+            report=print,
+        )
+        generator.generate()
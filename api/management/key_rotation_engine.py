@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.db import connections
+from jwcrypto.common import json_decode, json_encode
+from api.models import Claim, ClaimantFile
+from core.claim_encryption import SymmetricKeyRotator, data_key_model
+from core.claim_storage import ClaimReader
+from .claimant_key_rotator import ClaimantKeyRotator
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+"""
+
+Administrative task helper for rotating many Claimants at once.
+Claimants are rotated in batches, ordered by id, with several batches in flight.
+Progress is checkpointed by Claimant id so an interrupted rotation can resume.
+
+"""
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WORKERS = 8
+
+
+class KeyRotationEngine(object):
+    """
+    Requires:
+    * "old_key" JWK
+    * "new_key" JWK
+    * "batch_size" (optional) number of Claimants per batch
+    * "workers" (optional) number of batches rotated concurrently
+    * "checkpoint_path" (optional) file to record progress in, and resume from
+    * "report" (optional) callable given each progress message
+    """
+
+    def __init__(
+        self,
+        old_key,
+        new_key,
+        batch_size=None,
+        workers=None,
+        checkpoint_path=None,
+        report=None,
+    ):
+        self.claimant_rotator = ClaimantKeyRotator(old_key, new_key)
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.workers = workers or DEFAULT_WORKERS
+        self.checkpoint_path = checkpoint_path
+        self.report = report or logger.info
+        self.checkpoint = self.load_checkpoint()
+
+    def new_checkpoint(self):
+        return {
+            "old_key_hash": self.claimant_rotator.old_key_hash,
+            "new_key_hash": self.claimant_rotator.new_key_hash,
+            "last_claimant_id": 0,
+            "claimants": 0,
+            "rotated": 0,
+        }
+
+    def load_checkpoint(self):
+        checkpoint = self.new_checkpoint()
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return checkpoint
+        with open(self.checkpoint_path) as fh:
+            saved = json_decode(fh.read())
+        for key in ["old_key_hash", "new_key_hash"]:
+            if saved[key] != checkpoint[key]:
+                raise ValueError(
+                    "Checkpoint {} is for a different key rotation".format(
+                        self.checkpoint_path
+                    )
+                )
+        return saved
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        # write-then-rename, so a crash never leaves a truncated checkpoint
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(json_encode(self.checkpoint))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def claimants(self):
+        return (
+            self.claimant_rotator.find_claimants()
+            .filter(id__gt=self.checkpoint["last_claimant_id"])
+            .order_by("id")
+        )
+
+    def batches(self):
+        last_claimant_id = self.checkpoint["last_claimant_id"]
+        while True:
+            batch = list(
+                self.claimants().filter(id__gt=last_claimant_id)[: self.batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+            last_claimant_id = batch[-1].id
+
+    def rotate_batch(self, claimants):
+        rotator = SymmetricKeyRotator(
+            self.claimant_rotator.old_key, self.claimant_rotator.new_key
+        )
+        try:
+            return sum(
+                self.claimant_rotator.rotate_claimant(claimant, rotator)
+                for claimant in claimants
+            )
+        finally:
+            if self.workers > 1:
+                # each worker thread has its own db connection
+                connections.close_all()
+
+    # returns the total number of artifacts and data keys rotated, including earlier runs
+    def rotate(self):
+        data_keys_rotated = SymmetricKeyRotator(
+            self.claimant_rotator.old_key, self.claimant_rotator.new_key
+        ).rotate_data_keys()
+        self.checkpoint["rotated"] += data_keys_rotated
+        self.save_checkpoint()
+
+        self.progress = Progress(self.claimants().count(), self.report)
+        if self.workers == 1:
+            for batch in self.batches():
+                self.batch_done(batch, self.rotate_batch(batch))
+        else:
+            self.rotate_concurrently()
+        self.progress.finish()
+        # a finished rotation has nothing to resume
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.checkpoint["rotated"]
+
+    def rotate_concurrently(self):
+        # batches finish out of order, so the checkpoint only advances past
+        # a batch once every batch before it has finished too.
+        in_flight = {}
+        finished = {}
+        next_to_checkpoint = 0
+        batches = enumerate(self.batches())
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while True:
+                    while len(in_flight) < self.workers * 2:
+                        seq, batch = next(batches, (None, None))
+                        if batch is None:
+                            break
+                        future = executor.submit(self.rotate_batch, batch)
+                        in_flight[future] = (seq, batch)
+                    if not in_flight:
+                        return
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        seq, batch = in_flight.pop(future)
+                        finished[seq] = (batch, future.result())
+                    while next_to_checkpoint in finished:
+                        self.batch_done(*finished.pop(next_to_checkpoint))
+                        next_to_checkpoint += 1
+            except Exception:
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+    def batch_done(self, batch, rotated):
+        self.checkpoint["last_claimant_id"] = batch[-1].id
+        self.checkpoint["claimants"] += len(batch)
+        self.checkpoint["rotated"] += rotated
+        self.save_checkpoint()
+        self.progress.update(len(batch), rotated)
+
+    # estimate the work remaining, without rotating anything
+    def estimate(self, sample_size=20):
+        claimants = self.claimants()
+        candidate_claims = Claim.objects.filter(claimant__in=claimants).without_events(
+            Claim.EventCategories.COMPLETED, Claim.EventCategories.DELETED
+        )
+        candidate_files = ClaimantFile.objects.filter(claimant__in=claimants)
+        estimate = {
+            "claimants": claimants.count(),
+            "data_keys": data_key_model()
+            .objects.filter(kek_kid=self.claimant_rotator.old_key.thumbprint())
+            .count(),
+            "artifacts": candidate_claims.count() + candidate_files.count(),
+            "seconds_per_artifact": None,
+            "estimated_seconds": None,
+        }
+
+        # time the read and re-encryption of a sample of partial claims
+        rotator = SymmetricKeyRotator(
+            self.claimant_rotator.old_key, self.claimant_rotator.new_key
+        )
+        sampled = 0
+        started = time.monotonic()
+        for claim in candidate_claims.order_by("id")[:sample_size]:
+            reader = ClaimReader(claim, path=claim.partial_payload_path())
+            if not reader.exists():
+                continue
+            packaged_claim = reader.read()
+            if rotator.needs_rotation(packaged_claim):
+                # without envelope encryption, which would save DataKeys
+                rotator.rotate(packaged_claim, envelope=False)
+            sampled += 1
+        if sampled:
+            per_artifact = (time.monotonic() - started) / sampled
+            estimate["seconds_per_artifact"] = per_artifact
+            estimate["estimated_seconds"] = (
+                per_artifact * estimate["artifacts"] / self.workers
+            )
+        return estimate
+
+
+class Progress(object):
+    """
+    Reports throughput and ETA for "total" Claimants
+    """
+
+    def __init__(self, total, report):
+        self.total = total
+        self.report = report
+        self.claimants = 0
+        self.rotated = 0
+        self.started = time.monotonic()
+
+    def elapsed(self):
+        return max(time.monotonic() - self.started, 0.001)
+
+    def update(self, claimants, rotated):
+        self.claimants += claimants
+        self.rotated += rotated
+        elapsed = self.elapsed()
+        rate = self.claimants / elapsed
+        remaining = max(self.total - self.claimants, 0)
+        self.report(
+            "{}/{} claimants, {} artifacts rotated, {:.1f} artifacts/s, ETA {}".format(
+                self.claimants,
+                self.total,
+                self.rotated,
+                self.rotated / elapsed,
+                timedelta(seconds=int(remaining / rate)),
+            )
+        )
+
+    def finish(self):
+        self.report(
+            "{} claimants, {} artifacts rotated in {}".format(
+                self.claimants,
+                self.rotated,
+                timedelta(seconds=int(self.elapsed())),
+            )
+        )
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from django.contrib.contenttypes.models import ContentType
+from api.models import Claim, Claimant, ClaimantFile, Event, IdentityProvider, SWA
+from core.benchmarks import example_claim
+from core.claim_encryption import (
+    AsymmetricClaimEncryptor,
+    SymmetricClaimEncryptor,
+    encryption_key_hash,
+    symmetric_encryption_key,
+)
+from core.claim_storage import ClaimBucket, ClaimStore
+import logging
+import random
+import uuid
+
+logger = logging.getLogger(__name__)
+
+"""
+
+Synthetic, production-like rows (and optionally artifacts) for load tests and benchmarks.
+Everything, including the default "as_of", is derived from "seed", so two runs
+with the same arguments against empty databases create the same rows.
+
+"""
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_EVENTS_PER_CLAIM = 10
+DEFAULT_WORKERS = 8
+CLAIMS_PER_CLAIMANT = 2
+CLAIMANT_FILE_RATE = 0.2
+SWA_XID_RATE = 0.1
+# claims are created up to this many days before "as_of"
+MAX_CLAIM_AGE_DAYS = 90
+# the default "as_of" is this many days, chosen by "seed", after the epoch
+AS_OF_EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+AS_OF_EPOCH_DAYS = 365
+
+# the events of a Claim, by how far along it is
+IN_PROGRESS = [Claim.EventCategories.SUBMITTED, Claim.EventCategories.STORED]
+QUEUED = IN_PROGRESS + [
+    Claim.EventCategories.COMPLETED,
+    Claim.EventCategories.CONFIRMATION_EMAIL,
+]
+FETCHED = QUEUED + [Claim.EventCategories.FETCHED, Claim.EventCategories.STATUS_CHANGED]
+RESOLVED = FETCHED + [Claim.EventCategories.RESOLVED]
+EXPIRED = IN_PROGRESS + [Claim.EventCategories.DELETED]
+CANCELLED = QUEUED + [Claim.EventCategories.RESOLVED, Claim.EventCategories.DELETED]
+# (weight, events)
+LIFECYCLE_STAGES = [
+    (55, IN_PROGRESS),
+    (15, QUEUED),
+    (12, FETCHED),
+    (10, RESOLVED),
+    (5, EXPIRED),
+    (3, CANCELLED),
+]
+# the longest lifecycle, plus the INITIATED_WITH_SWA_XID event
+MIN_EVENTS_PER_CLAIM = max(len(events) for _, events in LIFECYCLE_STAGES) + 1
+
+
+def default_as_of(seed):
+    return AS_OF_EPOCH + timedelta(days=seed % AS_OF_EPOCH_DAYS)
+
+
+class LoadDataGenerator(object):
+    """
+    Requires:
+    * "claims" number of Claims to create
+    * "seed" (optional) random seed
+    * "events_per_claim" (optional) every Claim gets exactly this many events,
+      padded with repeated SUBMITTED events as each partial claim autosave creates one.
+      Must be at least MIN_EVENTS_PER_CLAIM so every lifecycle fits
+    * "batch_size" (optional) number of Claims per bulk_create batch
+    * "as_of" (optional) datetime the generated history leads up to,
+      default a fixed date derived from "seed"
+    * "write_artifacts" (optional) write encrypted partial, completed and 1099-G artifacts
+    * "workers" (optional) number of artifacts written concurrently
+    * "report" (optional) callable given each progress message
+    """
+
+    def __init__(
+        self,
+        claims,
+        seed=0,
+        events_per_claim=None,
+        batch_size=None,
+        as_of=None,
+        write_artifacts=False,
+        workers=None,
+        claim_store=None,
+        report=None,
+    ):
+        self.claims = claims
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.events_per_claim = events_per_claim or DEFAULT_EVENTS_PER_CLAIM
+        if self.events_per_claim < MIN_EVENTS_PER_CLAIM:
+            raise ValueError(
+                "events_per_claim must be at least {}".format(MIN_EVENTS_PER_CLAIM)
+            )
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.as_of = as_of or default_as_of(seed)
+        self.write_artifacts = write_artifacts
+        self.workers = workers or DEFAULT_WORKERS
+        self.claim_store = claim_store
+        self.report = report or logger.info
+        self.counts = {
+            "claimants": 0,
+            "claims": 0,
+            "claimant_files": 0,
+            "events": 0,
+            "artifacts": 0,
+        }
+
+    def uuid(self):
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def generate(self):
+        self.swas = list(SWA.objects.order_by("id"))
+        self.idp, _ = IdentityProvider.objects.get_or_create(name="load data")
+        self.claim_content_type = ContentType.objects.get_for_model(Claim)
+        self.file_content_type = ContentType.objects.get_for_model(ClaimantFile)
+        self.key = symmetric_encryption_key()
+        self.key_hash = encryption_key_hash(self.key)
+        if self.write_artifacts:
+            self.claim_store = self.claim_store or ClaimStore()
+            self.bucket_name = ClaimBucket().name
+            self.example_claim = example_claim()
+            self.public_keys = {
+                swa.code: swa.public_key_as_jwk() for swa in self.swas if swa.public_key
+            }
+
+        for start in range(0, self.claims, self.batch_size):
+            self.generate_batch(start, min(self.batch_size, self.claims - start))
+            self.report(
+                "{claims} claims, {claimants} claimants, {claimant_files} claimant files, "
+                "{events} events, {artifacts} artifacts".format(**self.counts)
+            )
+        return self.counts
+
+    def generate_batch(self, start, size):
+        first_claimant = start // CLAIMS_PER_CLAIMANT
+        last_claimant = (start + size - 1) // CLAIMS_PER_CLAIMANT
+        claimants = Claimant.objects.bulk_create(
+            [
+                Claimant(
+                    idp=self.idp,
+                    idp_user_xid=f"load-{self.seed}-{index}",
+                    IAL=self.random.choice(Claimant.IALOptions.values),
+                    encryption_key_hash=self.key_hash,
+                )
+                for index in range(first_claimant, last_claimant + 1)
+            ]
+        )
+        # bulk_create does not set the ids on MySQL
+        claimant_ids = dict(
+            Claimant.objects.filter(
+                idp_user_xid__in=[claimant.idp_user_xid for claimant in claimants]
+            ).values_list("idp_user_xid", "id")
+        )
+        for claimant in claimants:
+            claimant.id = claimant_ids[claimant.idp_user_xid]
+
+        claims = []
+        histories = []
+        for index in range(start, start + size):
+            claimant = claimants[index // CLAIMS_PER_CLAIMANT - first_claimant]
+            created_days_ago = self.random.randint(0, MAX_CLAIM_AGE_DAYS)
+            swa_xid = None
+            if self.random.random() < SWA_XID_RATE:
+                swa_xid = f"load-{self.seed}-{index}"
+            claims.append(
+                Claim(
+                    uuid=self.uuid(),
+                    swa=self.random.choice(self.swas),
+                    claimant=claimant,
+                    swa_xid=swa_xid,
+                )
+            )
+            stage = self.random.choices(
+                [events for _, events in LIFECYCLE_STAGES],
+                weights=[weight for weight, _ in LIFECYCLE_STAGES],
+            )[0]
+            histories.append((created_days_ago, stage))
+        Claim.objects.bulk_create(claims)
+        claim_ids = dict(
+            Claim.objects.filter(uuid__in=[claim.uuid for claim in claims]).values_list(
+                "uuid", "id"
+            )
+        )
+
+        claimant_files = []
+        for claimant in claimants:
+            if self.random.random() < CLAIMANT_FILE_RATE:
+                claimant_files.append(
+                    ClaimantFile(
+                        uuid=self.uuid(),
+                        claimant=claimant,
+                        swa=self.random.choice(self.swas),
+                        year=str(self.as_of.year - 1),
+                        fileext="pdf",
+                        filetype=ClaimantFile.FileTypeOptions.F1099G,
+                    )
+                )
+        ClaimantFile.objects.bulk_create(claimant_files)
+        claimant_file_ids = dict(
+            ClaimantFile.objects.filter(
+                uuid__in=[claimant_file.uuid for claimant_file in claimant_files]
+            ).values_list("uuid", "id")
+        )
+
+        events = []
+        updated_days_ago = {}
+        for claim, (created_days_ago, stage) in zip(claims, histories):
+            claim.id = claim_ids[claim.uuid]
+            created_at = self.as_of - timedelta(days=created_days_ago)
+            categories = list(stage)
+            if claim.swa_xid:
+                categories.insert(0, Claim.EventCategories.INITIATED_WITH_SWA_XID)
+            categories += [Claim.EventCategories.SUBMITTED] * (
+                self.events_per_claim - len(categories)
+            )
+            for offset, category in enumerate(categories):
+                happened_at = created_at + timedelta(minutes=offset)
+                events.append(
+                    Event(
+                        model_name=self.claim_content_type,
+                        model_id=claim.id,
+                        category=category,
+                        description=happened_at.isoformat(),
+                        happened_at=happened_at,
+                    )
+                )
+            updated_days_ago.setdefault(created_days_ago, []).append(claim.id)
+        for claimant_file in claimant_files:
+            claimant_file.id = claimant_file_ids[claimant_file.uuid]
+            events.append(
+                Event(
+                    model_name=self.file_content_type,
+                    model_id=claimant_file.id,
+                    category=ClaimantFile.EventCategories.STORED,
+                    description=(
+                        self.bucket_name if self.write_artifacts else "load data"
+                    ),
+                )
+            )
+        Event.objects.bulk_create(events, batch_size=self.batch_size)
+
+        # auto_now applies to bulk_create but not update(), so age the claims afterwards
+        for days_ago, ids in updated_days_ago.items():
+            timestamp = self.as_of - timedelta(days=days_ago)
+            Claim.objects.filter(id__in=ids).update(
+                created_at=timestamp, updated_at=timestamp
+            )
+
+        if self.write_artifacts:
+            self.counts["artifacts"] += self.write(
+                self.artifacts(zip(claims, histories), claimant_files)
+            )
+        self.counts["claimants"] += len(claimants)
+        self.counts["claims"] += len(claims)
+        self.counts["claimant_files"] += len(claimant_files)
+        self.counts["events"] += len(events)
+
+    # (path, packaged claim) for each artifact the batch would have in storage.
+    # encryption may create DataKey rows, so it happens in the calling thread.
+    def artifacts(self, claims_and_histories, claimant_files):
+        for claim, (_, stage) in claims_and_histories:
+            if Claim.EventCategories.DELETED in stage:
+                continue
+            payload = dict(
+                self.example_claim,
+                id=str(claim.uuid),
+                claimant_id=claim.claimant.idp_user_xid,
+                swa_code=claim.swa.code,
+            )
+            if Claim.EventCategories.COMPLETED not in stage:
+                path = claim.partial_payload_path()
+                encryptor = SymmetricClaimEncryptor(payload, self.key, path=path)
+            elif claim.swa.code in self.public_keys:
+                encryptor = AsymmetricClaimEncryptor(
+                    payload, self.public_keys[claim.swa.code]
+                )
+                path = claim.completed_payload_path()
+            else:
+                continue
+            yield path, encryptor.packaged_claim().as_json()
+        for claimant_file in claimant_files:
+            payload = {
+                "id": str(claimant_file.uuid),
+                "claimant_id": claimant_file.claimant.idp_user_xid,
+                "swa_code": claimant_file.swa.code,
+                "year": claimant_file.year,
+                "filename": f"1099G.{claimant_file.fileext}",
+                "file": "",
+            }
+            path = claimant_file.payload_path()
+            yield path, SymmetricClaimEncryptor(
+                payload, self.key, path=path
+            ).packaged_claim().as_json()
+
+    def write(self, artifacts):
+        # create the client before we fan out to threads.
+        if self.claim_store.backend_name == "s3":
+            self.claim_store.s3_client()
+        written = 0
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for path, packaged_claim in artifacts:
+                in_flight.add(
+                    executor.submit(self.claim_store.write, path, packaged_claim)
+                )
+                if len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                        written += 1
+            for future in in_flight:
+                future.result()
+                written += 1
+        return written
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from jwcrypto import jwk, jwt
+from api.models import SWA
+from api.whoami import WhoAmI
+from core.benchmarks import example_claim
+from core.json_codec import json_decode, json_encode
+import boto3
+import django_redis.client
+import logging
+import math
+import requests
+import secrets
+import statistics
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+"""
+
+End-to-end claimant journeys for load tests. Each journey:
+
+* logs in via the local identity provider (/api/login/, requires ENABLE_TEST_LOGIN)
+* GETs /api/whoami/
+* autosaves a growing partial claim "autosaves" times
+* POSTs the completed claim
+* acts as the SWA: fetches the claim queue and the claim, then PATCHes
+  the claim fetched, its status and resolved, authenticating with a JWT
+  signed as in scripts/generate-swa-auth-token.py
+
+Journeys run against this process (django.test.Client) or, with "base_url",
+against a running local service that shares this database.
+
+"""
+
+DEFAULT_JOURNEYS = 10
+DEFAULT_CONCURRENCY = 1
+DEFAULT_AUTOSAVES = 5
+DEFAULT_SWA_CODE = "LT"
+PERCENTILES = [50, 95, 99]
+JSON = "application/json"
+
+
+class JourneyError(Exception):
+    pass
+
+
+# nearest-rank percentile of sorted "values"
+def percentile(values, pct):
+    if not values:
+        return None
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+def swa_auth_token(swa_code, private_key):
+    token = jwt.JWT(
+        header={"alg": "ES256", "kid": private_key.thumbprint()},
+        claims={"iss": swa_code, "iat": time.time(), "nonce": secrets.token_hex(8)},
+        algs=["RS256", "ES256"],
+    )
+    token.make_signed_token(private_key)
+    return token.serialize()
+
+
+class InProcessClient(object):
+    def __init__(self):
+        # "localhost" is always in ALLOWED_HOSTS
+        self.client = Client(
+            enforce_csrf_checks=True,
+            raise_request_exception=False,
+            HTTP_HOST="localhost",
+        )
+
+    def csrf_token(self):
+        cookie = self.client.cookies.get("csrftoken")
+        return cookie.value if cookie else None
+
+    def request(self, method, path, payload=None, headers=None):
+        meta = {
+            "HTTP_" + name.upper().replace("-", "_"): value
+            for name, value in (headers or {}).items()
+        }
+        if payload is not None:
+            meta["data"] = json_encode(payload)
+            meta["content_type"] = JSON
+        response = self.client.generic(method, path, **meta)
+        return response.status_code, response.content
+
+
+class HttpClient(object):
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def csrf_token(self):
+        return self.session.cookies.get("csrftoken")
+
+    def request(self, method, path, payload=None, headers=None):
+        # CSRF checks the Referer of https requests
+        headers = dict(headers or {}, Referer=self.base_url + "/")
+        data = None
+        if payload is not None:
+            data = json_encode(payload)
+            headers["Content-Type"] = JSON
+        response = self.session.request(
+            method, self.base_url + path, data=data, headers=headers
+        )
+        return response.status_code, response.content
+
+
+class LoadTestMetrics(object):
+    """
+    Request latencies per endpoint, plus the DB queries, S3 calls and Redis bytes
+    of the requests served by this process.
+    """
+
+    COUNTERS = ["db_queries", "s3_calls", "redis_bytes_written", "redis_bytes_read"]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def record(self, endpoint, seconds, error=False):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if error:
+                self.errors[endpoint] += 1
+
+    # connection.execute_wrapper()
+    def count_query(self, execute, sql, params, many, context):
+        self.count("db_queries")
+        return execute(sql, params, many, context)
+
+    def count_s3_call(self, **kwargs):
+        self.count("s3_calls")
+
+    @contextmanager
+    def instrument(self):
+        metrics = self
+        client_class = django_redis.client.DefaultClient
+        encode, decode = client_class.encode, client_class.decode
+
+        def counted_encode(self, value):
+            encoded = encode(self, value)
+            if isinstance(encoded, bytes):
+                metrics.count("redis_bytes_written", len(encoded))
+            return encoded
+
+        def counted_decode(self, value):
+            if isinstance(value, bytes):
+                metrics.count("redis_bytes_read", len(value))
+            return decode(self, value)
+
+        # clients created from the default session copy its event handlers
+        if not boto3.DEFAULT_SESSION:
+            boto3.setup_default_session()
+        events = boto3.DEFAULT_SESSION.events
+        events.register("before-call.s3", self.count_s3_call)
+        client_class.encode, client_class.decode = counted_encode, counted_decode
+        try:
+            yield
+        finally:
+            client_class.encode, client_class.decode = encode, decode
+            events.unregister("before-call.s3", self.count_s3_call)
+
+    def endpoints(self):
+        results = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            results[endpoint] = {
+                "requests": len(latencies),
+                "errors": self.errors[endpoint],
+                "mean": statistics.mean(latencies),
+            }
+            for pct in PERCENTILES:
+                results[endpoint][f"p{pct}"] = percentile(latencies, pct)
+        return results
+
+
+class ClaimantJourney(object):
+    def __init__(self, index, client, swa, private_key, autosaves, metrics):
+        self.index = index
+        self.client = client
+        self.swa = swa
+        self.private_key = private_key
+        self.autosaves = autosaves
+        self.metrics = metrics
+
+    def request(self, method, path, expected_status, payload=None, endpoint=None):
+        headers = {}
+        if path.startswith("/swa/"):
+            headers["Authorization"] = "JWT " + swa_auth_token(
+                self.swa.code, self.private_key
+            )
+        elif method != "GET":
+            headers["X-CSRFToken"] = self.client.csrf_token() or ""
+        endpoint = endpoint or f"{method} {path}"
+        start = time.perf_counter()
+        status, content = self.client.request(method, path, payload, headers)
+        error = status != expected_status
+        self.metrics.record(endpoint, time.perf_counter() - start, error)
+        if error:
+            raise JourneyError(f"{endpoint} returned {status}: {content[:200]}")
+        return json_decode(content)
+
+    def login_payload(self):
+        return {
+            "email": f"load-test-{self.index}-{secrets.token_hex(4)}@example.com",
+            "IAL": "2",
+            "swa_code": self.swa.code,
+            "first_name": "Load",
+            "last_name": "Test",
+            "birthdate": "2000-01-01",
+            "ssn": "900-00-1234",
+            "phone": "555-555-1234",
+            "address": {
+                "address1": "123 Any St",
+                "city": "Somewhere",
+                "state": "KS",
+                "zipcode": "00000",
+            },
+        }
+
+    def claim(self, whoami):
+        claim = example_claim()
+        for key in ["$schema", "id", "validated_at"]:
+            claim.pop(key)
+        claim.update(
+            claimant_id=whoami["claimant_id"],
+            swa_code=self.swa.code,
+            email=whoami["email"],
+            idp_identity=WhoAmI.from_dict(whoami).as_identity(),
+        )
+        return claim
+
+    def run(self):
+        self.request("POST", "/api/login/", 200, self.login_payload())
+        whoami = self.request("GET", "/api/whoami/", 200)
+        claim = self.claim(whoami)
+
+        # each autosave sends more of the claim, as the claimant fills in the form
+        keys = list(claim)
+        claim_id = None
+        for autosave in range(1, self.autosaves + 1):
+            partial_claim = {
+                key: claim[key]
+                for key in keys[: math.ceil(len(keys) * autosave / self.autosaves)]
+            }
+            partial_claim.update(
+                claimant_id=claim["claimant_id"], swa_code=self.swa.code
+            )
+            if claim_id:
+                partial_claim["id"] = claim_id
+            claim_id = self.request("POST", "/api/partial-claim/", 202, partial_claim)[
+                "claim_id"
+            ]
+
+        claim.update(id=claim_id, is_complete=True)
+        self.request("POST", "/api/completed-claim/", 201, claim)
+
+        path = f"/swa/v1/claims/{claim_id}/"
+        self.request("GET", "/swa/v1/claims/", 200)
+        self.request("GET", path, 200, endpoint="GET /swa/v1/claims/<id>/")
+        for action, value in [
+            ("fetched", "true"),
+            ("status", "processing"),
+            ("resolved", "load test"),
+        ]:
+            self.request(
+                "PATCH",
+                path,
+                200,
+                {action: value},
+                endpoint=f"PATCH /swa/v1/claims/<id>/ {action}",
+            )
+        return claim_id
+
+
+class LoadTest(object):
+    """
+    Requires:
+    * "journeys" number of claimant journeys
+    * "concurrency" (optional) number of journeys run at once
+    * "autosaves" (optional) number of partial claim autosaves per journey
+    * "base_url" (optional) URL of a local service to run against, instead of in-process
+    * "swa_code" (optional) code of the SWA created (or re-keyed) for the journeys
+    * "report" (optional) callable given each progress message
+    """
+
+    def __init__(
+        self,
+        journeys,
+        concurrency=None,
+        autosaves=None,
+        base_url=None,
+        swa_code=None,
+        report=None,
+    ):
+        self.journeys = journeys
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.autosaves = autosaves or DEFAULT_AUTOSAVES
+        self.base_url = base_url
+        self.swa_code = swa_code or DEFAULT_SWA_CODE
+        self.report = report or logger.info
+        self.metrics = LoadTestMetrics()
+        self.failures = []
+
+    # an active SWA with a fresh keypair, so we can sign its JWTs
+    def setup_swa(self):
+        private_key = jwk.JWK.generate(kty="EC", crv="P-256")
+        public_key = jwk.JWK.from_json(private_key.export_public())
+        swa, _ = SWA.objects.get_or_create(
+            code=self.swa_code,
+            defaults={
+                "name": "Load Test",
+                "fullname": "Load Test SWA",
+                "claimant_url": "https://example.com",
+                "featureset": SWA.FeatureSetOptions.CLAIM_AND_IDENTITY,
+            },
+        )
+        swa.public_key = public_key.export_to_pem().decode("utf-8")
+        swa.public_key_fingerprint = public_key.thumbprint()
+        swa.status = SWA.StatusOptions.ACTIVE
+        swa.save()
+        return swa, private_key
+
+    def client(self):
+        return HttpClient(self.base_url) if self.base_url else InProcessClient()
+
+    def run_journey(self, index):
+        journey = ClaimantJourney(
+            index,
+            self.client(),
+            self.swa,
+            self.private_key,
+            self.autosaves,
+            self.metrics,
+        )
+        try:
+            with connection.execute_wrapper(self.metrics.count_query):
+                journey.run()
+        except JourneyError as error:
+            logger.error(error)
+            self.failures.append(str(error))
+        finally:
+            # each worker thread has its own connection
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+    def run(self):
+        self.swa, self.private_key = self.setup_swa()
+        self.started_at = timezone.now()
+        start = time.perf_counter()
+        with self.metrics.instrument():
+            if self.concurrency == 1:
+                for index in range(self.journeys):
+                    self.run_journey(index)
+            else:
+                with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                    list(executor.map(self.run_journey, range(self.journeys)))
+        seconds = time.perf_counter() - start
+        self.report(
+            "{} journeys, {} failed, in {:.1f}s".format(
+                self.journeys, len(self.failures), seconds
+            )
+        )
+        return self.results(seconds)
+
+    def results(self, seconds):
+        # a local service does not report its own queries, S3 calls or Redis bytes
+        per_journey = {
+            counter: None if self.base_url else total / self.journeys
+            for counter, total in self.metrics.counters.items()
+        }
+        return {
+            "target": self.base_url or "in-process",
+            "started_at": self.started_at.isoformat(),
+            "journeys": self.journeys,
+            "failed_journeys": len(self.failures),
+            "failures": self.failures,
+            "concurrency": self.concurrency,
+            "autosaves": self.autosaves,
+            "seconds": seconds,
+            "journeys_per_second": self.journeys / seconds,
+            "endpoints": self.metrics.endpoints(),
+            "per_journey": per_journey,
+        }
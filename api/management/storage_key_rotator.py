@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.db.models import Q
+from jwcrypto.common import JWException, json_decode
+from api.models import SWA, Claimant, DataKey
+from core.claim_encryption import PackagedClaim, SymmetricKeyRotator
+from core.claim_storage import ClaimStore
+from core.exceptions import ClaimThumbprintMismatchError
+from .claimant_key_rotator import ClaimantKeyRotator
+from .key_rotation_engine import DEFAULT_WORKERS
+from botocore.exceptions import BotoCoreError, ClientError
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+"""
+
+Administrative task helper. Rotate symmetrically encrypted artifacts by listing
+the bucket, rather than by querying every Claimant, Claim and ClaimantFile.
+Only the tail of each object is read to find the key it is encrypted with,
+since json_encode() sorts keys and "public_kid" is always the last one.
+
+"""
+
+PARTIAL_CLAIM_SUFFIX = ".partial.json"
+# enough for '"data_key":"{uuid}","format":"jwe+def","public_kid":"{thumbprint}"}'
+ENVELOPE_TAIL_LENGTH = 256
+ENVELOPE_TAIL = re.compile(rb'"public_kid":"([^"]+)"}\s*$')
+
+
+class StorageKeyRotator(object):
+    """
+    Requires:
+    * "old_key" JWK
+    * "new_key" JWK
+    * "claim_store" (optional) ClaimStore holding partial Claims and ClaimantFiles
+    * "workers" (optional) number of objects rotated concurrently
+    * "report" (optional) callable given the summary message
+    * "dry_run" (optional) scan the bucket and count, without rotating anything
+    """
+
+    def __init__(
+        self,
+        old_key,
+        new_key,
+        claim_store=None,
+        workers=None,
+        report=None,
+        dry_run=False,
+    ):
+        self.claimant_rotator = ClaimantKeyRotator(old_key, new_key)
+        self.rotator = SymmetricKeyRotator(old_key, new_key)
+        self.old_kid = old_key.thumbprint()
+        self.claim_store = claim_store or ClaimStore()
+        self.workers = workers or DEFAULT_WORKERS
+        self.report = report or logger.info
+        self.dry_run = dry_run
+        self.scanned = 0
+        self.rotated = 0
+        self.failed = []
+
+    # partial Claims are {swa_code}/{uuid}.partial.json
+    # ClaimantFiles are {idp_user_xid}/{uuid}.{fileext}
+    def candidate_paths(self):
+        swa_codes = set(SWA.objects.values_list("code", flat=True))
+        for path in self.claim_store.list():
+            parts = path.split("/")
+            if len(parts) != 2:
+                continue
+            if parts[0] in swa_codes and not path.endswith(PARTIAL_CLAIM_SUFFIX):
+                continue
+            yield path
+
+    def envelope_kid(self, path):
+        tail = self.claim_store.tail(path, ENVELOPE_TAIL_LENGTH)
+        match = ENVELOPE_TAIL.search(tail)
+        if match:
+            if b'"data_key":' in tail:
+                return None
+            return match.group(1).decode("utf-8")
+        # not a packaged claim we recognize, so read the whole thing to be sure
+        packaged_claim = json_decode(self.claim_store.read(path)["Body"].read())
+        if "data_key" in packaged_claim:
+            return None
+        return packaged_claim.get("public_kid")
+
+    # returns True if the object at path was (or, in a dry run, would be) re-encrypted
+    def rotate_path(self, path):
+        if self.envelope_kid(path) != self.old_kid:
+            return False
+        if self.dry_run:
+            return True
+        old_encrypted_package = self.claim_store.read(path)["Body"].read()
+        new_encrypted_package = self.rotator.rotate(
+            old_encrypted_package.decode("utf-8"), path=path
+        )
+        # returned unchanged if the old key does not match after all
+        if not isinstance(new_encrypted_package, PackagedClaim):
+            raise ClaimThumbprintMismatchError(
+                "{} is not encrypted with the old key".format(path)
+            )
+        self.claim_store.write(path, new_encrypted_package.as_json())
+        return True
+
+    # returns the total number of artifacts and data keys rotated
+    def rotate(self):
+        if self.dry_run:
+            data_keys_rotated = DataKey.objects.filter(kek_kid=self.old_kid).count()
+        else:
+            data_keys_rotated = self.rotator.rotate_data_keys()
+        if self.claim_store.backend_name == "s3":
+            # create the client before we fan out to threads.
+            self.claim_store.s3_client()
+        paths = self.candidate_paths()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                while len(in_flight) < self.workers * 2:
+                    path = next(paths, None)
+                    if path is None:
+                        break
+                    in_flight[executor.submit(self.rotate_path, path)] = path
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = in_flight.pop(future)
+                    self.scanned += 1
+                    try:
+                        self.rotated += int(future.result())
+                    # e.g. an artifact that cannot be decrypted with the old key
+                    except (
+                        BotoCoreError,
+                        ClientError,
+                        ValueError,
+                        JWException,
+                        ClaimThumbprintMismatchError,
+                    ) as error:
+                        logger.exception(error)
+                        self.failed.append(path)
+
+        if self.dry_run:
+            claimants_updated = 0
+        else:
+            claimants_updated = self.update_claimants()
+        self.report(
+            ("dry run: " if self.dry_run else "")
+            + "{} objects scanned, {} rotated, {} failed, {} data keys re-wrapped, {} claimants updated".format(
+                self.scanned,
+                self.rotated,
+                len(self.failed),
+                data_keys_rotated,
+                claimants_updated,
+            )
+        )
+        return self.rotated + data_keys_rotated
+
+    # Claimants with an artifact that failed to rotate keep the old key hash,
+    # so a later run (of either rotator) picks them up again.
+    def update_claimants(self):
+        claim_uuids = []
+        idp_user_xids = []
+        for path in self.failed:
+            prefix, filename = path.split("/")
+            if filename.endswith(PARTIAL_CLAIM_SUFFIX):
+                claim_uuids.append(filename[: -len(PARTIAL_CLAIM_SUFFIX)])
+            else:
+                idp_user_xids.append(prefix)
+        failed_claimants = Claimant.objects.filter(
+            Q(claim__uuid__in=claim_uuids) | Q(idp_user_xid__in=idp_user_xids)
+        ).values_list("id", flat=True)
+        return (
+            self.claimant_rotator.find_claimants()
+            .exclude(id__in=list(failed_claimants))
+            .update(encryption_key_hash=self.claimant_rotator.new_key_hash)
+        )
@@ -1,25 +1,44 @@
 # -*- coding: utf-8 -*-
 from django.conf import settings
+from django.test import override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
 from .claimant_key_rotator import ClaimantKeyRotator
+from .key_rotation_engine import KeyRotationEngine
+from .storage_key_rotator import StorageKeyRotator
+from .load_data_generator import (
+    MIN_EVENTS_PER_CLAIM,
+    LoadDataGenerator,
+    default_as_of,
+)
+from .load_test import LoadTest, percentile
 from .claim_packager import ClaimPackager, SchemaError
 from core.claim_encryption import (
     symmetric_encryption_key,
     encryption_key_hash,
     SymmetricClaimEncryptor,
+    SymmetricClaimDecryptor,
 )
-from core.claim_storage import ClaimWriter
+from core.claim_storage import ClaimStore, ClaimWriter
 from core.exceptions import ClaimStorageError
 from core.test_utils import (
     BucketableTestCase,
     generate_symmetric_encryption_key,
 )
 from api.test_utils import create_idp, create_swa
-from api.models import Claim, Claimant, ClaimantFile
+from api.models import Claim, Claimant, ClaimantFile, DataKey
+import contextlib
+import io
+import json
+import os
 import uuid
 import tempfile
 from unittest.mock import patch
 import boto3
+from botocore.exceptions import ClientError
 from botocore.stub import Stubber
+from jwcrypto.jwe import InvalidJWEData
 
 
 class BucketTestCase(BucketableTestCase):
@@ -164,6 +183,23 @@ class ClaimantKeyRotatorTestCase(BucketTestCase):
         self.assertEqual(claimant_with_key_hash.encryption_key_hash, ckr.new_key_hash)
         self.assertEqual(claimant_with_null_hash.encryption_key_hash, ckr.new_key_hash)
 
+    @override_settings(CLAIM_ENVELOPE_ENCRYPTION=True)
+    def test_rotate_envelope_encrypted(self):
+        old_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        new_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+
+        claimant = self.create_claim_with_key(old_key)
+        self.create_claimant_file(claimant, old_key)
+
+        ckr = ClaimantKeyRotator(old_key, new_key)
+        with patch("core.claim_storage.ClaimWriter.write") as mock_write:
+            self.assertEqual(ckr.rotate(), 2)  # 2 data keys
+            mock_write.assert_not_called()
+        self.assertFalse(DataKey.objects.filter(kek_kid=old_key.thumbprint()).exists())
+
+        claimant.refresh_from_db()
+        self.assertEqual(claimant.encryption_key_hash, ckr.new_key_hash)
+
     def test_rotate_one_claim_old_key_null_hash_no_file(self):
         old_key = symmetric_encryption_key(generate_symmetric_encryption_key())
         new_key = symmetric_encryption_key(generate_symmetric_encryption_key())
@@ -416,3 +452,354 @@ class ClaimantKeyRotatorTestCase(BucketTestCase):
             self.assertIn(
                 "Failed to write re-encrypted partial claim", str(context.exception)
             )
+
+    def test_rotation_engine(self):
+        old_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        new_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+
+        claimants = [self.create_claim_with_key(old_key) for _ in range(3)]
+        self.create_claimant_file(claimants[0], old_key)
+
+        reports = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpoint_path = os.path.join(tmpdir, "checkpoint.json")
+            engine = KeyRotationEngine(
+                old_key,
+                new_key,
+                batch_size=2,
+                workers=1,
+                checkpoint_path=checkpoint_path,
+                report=reports.append,
+            )
+            estimate = engine.estimate()
+            self.assertEqual(estimate["claimants"], 3)
+            # 3 claims with artifacts, 3 partial claims without, 1 file
+            self.assertEqual(estimate["artifacts"], 7)
+            self.assertGreater(estimate["estimated_seconds"], 0)
+
+            self.assertEqual(engine.rotate(), 4)  # 3 claims + 1 file
+            self.assertFalse(os.path.exists(checkpoint_path))
+
+        self.assertEqual(len(reports), 3)  # 2 batches + summary
+        self.assertIn("2/3 claimants, 3 artifacts rotated", reports[0])
+        self.assertIn("ETA", reports[0])
+        for claimant in claimants:
+            claimant.refresh_from_db()
+            self.assertEqual(claimant.encryption_key_hash, encryption_key_hash(new_key))
+
+    def test_rotation_engine_resume(self):
+        old_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        new_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+
+        claimants = [self.create_claim_with_key(old_key) for _ in range(3)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpoint_path = os.path.join(tmpdir, "checkpoint.json")
+            engine = KeyRotationEngine(
+                old_key,
+                new_key,
+                batch_size=1,
+                workers=1,
+                checkpoint_path=checkpoint_path,
+            )
+            with patch(
+                "api.management.claimant_key_rotator.ClaimantKeyRotator.rotate_claimant",
+                side_effect=[1, ClaimStorageError("oops")],
+            ):
+                with self.assertRaises(ClaimStorageError):
+                    engine.rotate()
+            with open(checkpoint_path) as fh:
+                checkpoint = json.load(fh)
+            self.assertEqual(checkpoint["last_claimant_id"], claimants[0].id)
+            self.assertEqual(checkpoint["rotated"], 1)
+
+            # a checkpoint for other keys is refused
+            with self.assertRaises(ValueError):
+                KeyRotationEngine(new_key, old_key, checkpoint_path=checkpoint_path)
+
+            engine = KeyRotationEngine(
+                old_key,
+                new_key,
+                batch_size=1,
+                workers=1,
+                checkpoint_path=checkpoint_path,
+            )
+            self.assertEqual(engine.claimants().count(), 2)
+            self.assertEqual(engine.rotate(), 3)
+
+    def test_rotation_engine_concurrent(self):
+        old_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        new_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+
+        for _ in range(5):
+            self.create_claim_with_key(old_key)
+
+        reports = []
+        engine = KeyRotationEngine(
+            old_key, new_key, batch_size=1, workers=3, report=reports.append
+        )
+        # worker threads have their own db connection, which cannot see
+        # this test's transaction, so only the batching is exercised here.
+        with patch(
+            "api.management.claimant_key_rotator.ClaimantKeyRotator.rotate_claimant",
+            return_value=2,
+        ) as mock_rotate:
+            with patch("api.management.key_rotation_engine.connections"):
+                self.assertEqual(engine.rotate(), 10)
+        self.assertEqual(mock_rotate.call_count, 5)
+        self.assertEqual(len(reports), 6)
+        self.assertIn("5 claimants, 10 artifacts rotated", reports[-1])
+
+    def test_rotate_claim_keys_dry_run(self):
+        old_key_string = generate_symmetric_encryption_key()
+        new_key_string = generate_symmetric_encryption_key()
+        claimant = self.create_claim_with_key(symmetric_encryption_key(old_key_string))
+
+        data_keys = DataKey.objects.count()
+        with io.StringIO() as buf, override_settings(CLAIM_ENVELOPE_ENCRYPTION=True):
+            with contextlib.redirect_stdout(buf):
+                call_command(
+                    "rotate_claim_keys", old_key_string, new_key_string, "--dry-run"
+                )
+            output = buf.getvalue()
+        self.assertEqual(DataKey.objects.count(), data_keys)
+        self.assertIn("1 claimants to rotate", output)
+        self.assertIn("up to 2 artifacts to re-encrypt", output)
+        claimant.refresh_from_db()
+        self.assertIsNone(claimant.encryption_key_hash)
+
+    def test_storage_key_rotator(self):
+        old_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        new_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+
+        claimant_with_old_key = self.create_claim_with_key(old_key)
+        claimant_file = self.create_claimant_file(claimant_with_old_key, old_key)
+        claimant_with_new_key = self.create_claim_with_key(new_key)
+        claimant_with_failure = self.create_claim_with_key(old_key)
+        failing_path = (
+            claimant_with_failure.claim_set.order_by("id")
+            .first()
+            .partial_payload_path()
+        )
+
+        reports = []
+        rotator = StorageKeyRotator(old_key, new_key, workers=2, report=reports.append)
+        self.assertEqual(
+            rotator.envelope_kid(claimant_file.payload_path()), old_key.thumbprint()
+        )
+        real_write = rotator.claim_store.write
+
+        def write(path, payload):
+            if path == failing_path:
+                raise ClientError({"Error": {"Code": "500"}}, "PutObject")
+            return real_write(path, payload)
+
+        with patch.object(rotator.claim_store, "write", side_effect=write):
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(rotator.rotate(), 2)  # 1 claim + 1 file
+        self.assertEqual(rotator.failed, [failing_path])
+        self.assertIn("2 rotated, 1 failed", reports[0])
+
+        self.assertEqual(
+            rotator.envelope_kid(claimant_file.payload_path()), new_key.thumbprint()
+        )
+        self.assertEqual(
+            SymmetricClaimDecryptor(
+                claimant_file.get_encrypted_package(), new_key
+            ).decrypt()["id"],
+            str(claimant_file.uuid),
+        )
+        claimant_with_old_key.refresh_from_db()
+        self.assertEqual(
+            claimant_with_old_key.encryption_key_hash, encryption_key_hash(new_key)
+        )
+        claimant_with_new_key.refresh_from_db()
+        self.assertEqual(
+            claimant_with_new_key.encryption_key_hash, encryption_key_hash(new_key)
+        )
+        # kept on the old key hash so it is rotated again next time
+        claimant_with_failure.refresh_from_db()
+        self.assertIsNone(claimant_with_failure.encryption_key_hash)
+
+        self.assertEqual(StorageKeyRotator(old_key, new_key).rotate(), 1)
+
+    def test_storage_key_rotator_decrypt_error(self):
+        old_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        new_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        claimant = self.create_claim_with_key(old_key)
+        path = claimant.claim_set.order_by("id").first().partial_payload_path()
+
+        rotator = StorageKeyRotator(old_key, new_key, report=lambda message: None)
+        with patch.object(
+            rotator.rotator, "rotate", side_effect=InvalidJWEData("bad")
+        ), self.assertLogs(level="ERROR"):
+            self.assertEqual(rotator.rotate(), 0)
+        self.assertEqual(rotator.failed, [path])
+        # the run still finishes, leaving the claimant for the next one
+        claimant.refresh_from_db()
+        self.assertIsNone(claimant.encryption_key_hash)
+
+    def test_rotate_claim_keys_from_storage_dry_run(self):
+        old_key_string = generate_symmetric_encryption_key()
+        new_key_string = generate_symmetric_encryption_key()
+        old_key = symmetric_encryption_key(old_key_string)
+        claimant = self.create_claim_with_key(old_key)
+        path = claimant.claim_set.order_by("id").first().partial_payload_path()
+        packaged_claim = ClaimStore().read(path)["Body"].read()
+
+        with io.StringIO() as buf:
+            with contextlib.redirect_stdout(buf):
+                call_command(
+                    "rotate_claim_keys",
+                    old_key_string,
+                    new_key_string,
+                    "--from-storage",
+                    "--dry-run",
+                )
+            output = buf.getvalue()
+        self.assertIn("1 rotated, 0 failed", output)
+        self.assertTrue(output.startswith("dry run: "))
+        self.assertIn("1 artifacts and data keys to rotate", output)
+        self.assertEqual(ClaimStore().read(path)["Body"].read(), packaged_claim)
+        claimant.refresh_from_db()
+        self.assertIsNone(claimant.encryption_key_hash)
+
+
+class LoadDataGeneratorTestCase(BucketTestCase):
+    def snapshot(self):
+        return [
+            (
+                str(claim.uuid),
+                claim.swa.code,
+                claim.claimant.idp_user_xid,
+                claim.swa_xid,
+                list(claim.events.order_by("id").values_list("category", flat=True)),
+            )
+            for claim in Claim.objects.filter(
+                claimant__idp_user_xid__startswith="load-"
+            )
+            .select_related("swa", "claimant")
+            .order_by("id")
+        ]
+
+    def test_generate(self):
+        reports = []
+        generator = LoadDataGenerator(
+            25,
+            seed=3,
+            batch_size=10,
+            write_artifacts=True,
+            workers=2,
+            report=reports.append,
+        )
+        counts = generator.generate()
+        self.assertEqual(counts["claims"], 25)
+        self.assertEqual(counts["claimants"], 13)
+        self.assertEqual(counts["events"], 25 * 10 + ClaimantFile.objects.count())
+        self.assertEqual(len(reports), 3)
+        self.assertIn("25 claims, 13 claimants", reports[-1])
+        self.assertEqual(
+            Claimant.objects.filter(encryption_key_hash=generator.key_hash).count(),
+            13,
+        )
+
+        # artifacts match the claim and file rows
+        self.assertGreater(counts["artifacts"], 0)
+        for claim in Claim.objects.all():
+            if claim.is_deleted():
+                self.assertFalse(claim.read_partial())
+            elif not claim.is_completed():
+                self.assertEqual(claim.read_partial()["id"], str(claim.uuid))
+            elif claim.swa.public_key:
+                self.assertTrue(claim.completed_artifact_exists())
+        for claimant_file in ClaimantFile.objects.all():
+            self.assertEqual(
+                SymmetricClaimDecryptor(
+                    claimant_file.get_encrypted_package(), symmetric_encryption_key()
+                ).decrypt()["id"],
+                str(claimant_file.uuid),
+            )
+
+    def test_deterministic(self):
+        snapshots = []
+        for _ in range(2):
+            with transaction.atomic():
+                LoadDataGenerator(30, seed=7, report=lambda message: None).generate()
+                snapshots.append(self.snapshot())
+                transaction.set_rollback(True)
+        self.assertEqual(len(snapshots[0]), 30)
+        self.assertEqual(snapshots[0], snapshots[1])
+
+    def test_default_as_of(self):
+        generator = LoadDataGenerator(1, seed=7)
+        self.assertEqual(generator.as_of, LoadDataGenerator(1, seed=7).as_of)
+        self.assertEqual(generator.as_of, default_as_of(7))
+        self.assertNotEqual(generator.as_of, LoadDataGenerator(1, seed=8).as_of)
+
+    def test_events_per_claim_too_small(self):
+        with self.assertRaises(ValueError):
+            LoadDataGenerator(1, events_per_claim=MIN_EVENTS_PER_CLAIM - 1)
+        with self.assertRaises(CommandError):
+            call_command(
+                "seed_load_data",
+                "--claims",
+                "1",
+                "--events-per-claim",
+                str(MIN_EVENTS_PER_CLAIM - 1),
+            )
+
+    def test_seed_load_data_command(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            call_command(
+                "seed_load_data",
+                "--claims",
+                "4",
+                "--seed",
+                "9",
+                "--events-per-claim",
+                "12",
+            )
+        self.assertIn("4 claims, 2 claimants", stdout.getvalue())
+        self.assertEqual(
+            Claim.objects.filter(claimant__idp_user_xid__startswith="load-9-").count(),
+            4,
+        )
+
+
+class LoadTestTestCase(BucketTestCase):
+    def test_journeys(self):
+        reports = []
+        results = LoadTest(2, autosaves=2, report=reports.append).run()
+        self.assertEqual(results["failures"], [])
+        self.assertEqual(results["journeys"], 2)
+        self.assertIn("2 journeys, 0 failed", reports[0])
+
+        endpoints = results["endpoints"]
+        self.assertEqual(endpoints["POST /api/partial-claim/"]["requests"], 4)
+        self.assertEqual(endpoints["PATCH /swa/v1/claims/<id>/ resolved"]["errors"], 0)
+        for endpoint in endpoints.values():
+            self.assertLessEqual(endpoint["p50"], endpoint["p99"])
+        for counter in ["db_queries", "s3_calls", "redis_bytes_written"]:
+            self.assertGreater(results["per_journey"][counter], 0)
+
+        # the SWA resolved every claim
+        claims = Claim.objects.filter(swa__code="LT")
+        self.assertEqual(claims.count(), 2)
+        self.assertTrue(all(claim.is_resolved() for claim in claims))
+
+    def test_run_load_test_command(self):
+        stdout = io.StringIO()
+        call_command(
+            "run_load_test", "--journeys", "1", "--autosaves", "1", stdout=stdout
+        )
+        results = json.loads(stdout.getvalue())
+        self.assertEqual(results["target"], "in-process")
+        self.assertEqual(results["failed_journeys"], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 4.0.4 on 2026-10-19 03:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_swa_fullnames"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClaimOutboxEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("bucket_type", models.CharField(max_length=16)),
+                ("path", models.CharField(max_length=255)),
+                ("payload", models.TextField(blank=True)),
+                (
+                    "status",
+                    models.IntegerField(
+                        choices=[(0, "Pending"), (1, "Done"), (2, "Failed")], default=0
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0)),
+                ("last_error", models.CharField(blank=True, max_length=255)),
+                (
+                    "claim",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outbox_entries",
+                        to="api.claim",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "claim_outbox_entries",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "updated_at"],
+                        name="claim_outbo_status_c181fd_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 4.0.4 on 2026-10-19 03:35
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0021_claim_outbox_entry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("uuid", models.UUIDField(default=uuid.uuid4, unique=True)),
+                ("kek_kid", models.CharField(db_index=True, max_length=255)),
+                ("wrapped_key", models.TextField()),
+            ],
+            options={
+                "db_table": "data_keys",
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 4.0.4 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0022_data_key"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["model_name", "model_id", "category"],
+                name="events_model_n_f6ac00_idx",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="event",
+            name="events_model_n_2544b6_idx",
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 4.0.4 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_event_category_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datakey",
+            name="path",
+            field=models.CharField(max_length=255, null=True, unique=True),
+        ),
+    ]
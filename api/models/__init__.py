@@ -5,5 +5,16 @@ from .claim import Claim
 from .claimant import Claimant
 from .event import Event
 from .claimant_file import ClaimantFile
+from .claim_outbox_entry import ClaimOutboxEntry
+from .data_key import DataKey
 
-__all__ = ["IdentityProvider", "SWA", "Claim", "Claimant", "Event", "ClaimantFile"]
+__all__ = [
+    "IdentityProvider",
+    "SWA",
+    "Claim",
+    "Claimant",
+    "Event",
+    "ClaimantFile",
+    "ClaimOutboxEntry",
+    "DataKey",
+]
@@ -21,13 +21,13 @@ from core.claim_encryption import (
     symmetric_encryption_key,
 )
 from core.claim_storage import (
-    BUCKET_TYPE_ARCHIVE,
-    ClaimBucket,
+    ClaimBatchReader,
     ClaimReader,
     ClaimStore,
     ClaimWriter,
 )
-from django.db.models import Q
+from django.db.models import Case, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.contrib.contenttypes.models import ContentType
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +35,9 @@ NOOP = -1
 SUCCESS = 1
 FAILURE = 0
 
+# expired identity claims are completed this many at a time
+EXPIRED_IDENTITY_CLAIMS_CHUNK_SIZE = 100
+
 # see Claim.status_for_claimant
 # this is a pseudo-enum (derived from events, not a column)
 CLAIMANT_STATUS_IN_PROCESS = "in_process"
@@ -59,7 +62,35 @@ class DuplicateSwaXid(Exception):
         )
 
 
-class ExpiredPartialClaimManager(models.Manager):
+class ClaimQuerySet(models.QuerySet):
+    """
+    Filters on a Claim's events as correlated EXISTS / NOT EXISTS subqueries,
+    rather than joins over the generic "events" relation (which need .distinct()).
+    These use the (model_name, model_id, category) index on events.
+    """
+
+    def events_exist(self, *categories):
+        return Exists(
+            Event.objects.filter(
+                model_name=ContentType.objects.get_for_model(self.model),
+                model_id=OuterRef("pk"),
+                category__in=categories,
+            )
+        )
+
+    # claims with an event of "category". Chain to require several categories.
+    def with_event(self, category):
+        return self.filter(self.events_exist(category))
+
+    # claims with no event of any of "categories"
+    def without_events(self, *categories):
+        return self.filter(~self.events_exist(*categories))
+
+
+ClaimManager = models.Manager.from_queryset(ClaimQuerySet)
+
+
+class ExpiredPartialClaimManager(ClaimManager):
     def delete_artifacts(self):
         count = 0
         for claim in self.all():
@@ -88,54 +119,95 @@ class ExpiredPartialClaimManager(models.Manager):
         claims = (
             super()
             .get_queryset()
-            .filter(
-                updated_at__lt=threshold_date,
-                events__category=Claim.EventCategories.STORED,
+            .filter(updated_at__lt=threshold_date)
+            .with_event(Claim.EventCategories.STORED)
+            .without_events(
+                Claim.EventCategories.COMPLETED,
+                Claim.EventCategories.DELETED,
+                Claim.EventCategories.INITIATED_WITH_SWA_XID,
             )
-            .exclude(events__category=Claim.EventCategories.COMPLETED)
-            .exclude(events__category=Claim.EventCategories.DELETED)
-            .exclude(events__category=Claim.EventCategories.INITIATED_WITH_SWA_XID)
-            .distinct()
         )
 
         return claims
 
 
-class ExpiredIdentityClaimsManager(models.Manager):
-    def complete_all(self):
+class ExpiredIdentityClaimsManager(ClaimManager):
+    def complete_all(self, chunk_size=None, max_workers=None):
+        # partial artifacts are read concurrently, ahead of the claims being completed,
+        # so the reads overlap with writing the completed claims.
         count = 0
-        for claim in self.all():
-            if not claim.is_swa_xid_expired():
-                logger.debug(
-                    "Skipping claim {} -- not swa_xid_expired".format(claim.uuid)
-                )
-                continue
-            partial_artifact = claim.read_partial()
-            if not partial_artifact:
-                logger.error("Missing partial artifact for claim {}".format(claim.uuid))
-                continue
-
-            if claim.write_completed(partial_artifact):
-                claim.delete_artifacts(partial_only=True)
-                count += 1
-            else:
-                raise ClaimStorageError("Failed to write Identity claim")
+        for chunk in self.chunks(chunk_size or EXPIRED_IDENTITY_CLAIMS_CHUNK_SIZE):
+            reader = ClaimBatchReader(
+                chunk,
+                path_for=lambda claim: claim.partial_payload_path(),
+                max_workers=max_workers,
+            )
+            for claim, packaged_claim_str in reader.read():
+                if not packaged_claim_str:
+                    logger.error(
+                        "Missing partial artifact for claim {}".format(claim.uuid)
+                    )
+                    continue
+                partial_artifact = RotatableSymmetricClaimDecryptor(
+                    packaged_claim_str, settings.CLAIM_SECRET_KEY
+                ).decrypt()
+
+                if claim.write_completed(partial_artifact):
+                    claim.delete_artifacts(partial_only=True)
+                    count += 1
+                else:
+                    raise ClaimStorageError("Failed to write Identity claim")
         logger.info(f"Total expired partial claims completed: {count}")
         return count
 
+    # completed claims drop out of the queryset, so page by id rather than offset
+    def chunks(self, chunk_size):
+        last_id = 0
+        while True:
+            chunk = list(
+                self.get_queryset().filter(id__gt=last_id).order_by("id")[:chunk_size]
+            )
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1].id
+
     def get_queryset(self):
         # different SWAs can have different retention definitions,
-        # so find all the incomplete claims with a swa_xid event,
-        # and let complete_all() determine whether they should be completed.
+        # so compare the oldest swa_xid event with a per-SWA threshold.
+        now = timezone.now()
+        swa_xid_initiated_at = Subquery(
+            Event.objects.filter(
+                model_name=ContentType.objects.get_for_model(Claim),
+                model_id=OuterRef("pk"),
+                category=Claim.EventCategories.INITIATED_WITH_SWA_XID,
+            )
+            .exclude(description="")
+            .order_by("happened_at")
+            .values("happened_at")[:1]
+        )
+        swa_xid_expired_before = Case(
+            *[
+                When(swa__code=swa_code, then=Value(now - timedelta(days=days)))
+                for swa_code, days in settings.EXPIRE_SWA_XID_CLAIMS_AFTER.items()
+            ],
+            default=Value(now),
+            output_field=models.DateTimeField(),
+        )
 
         claims = (
             super()
             .get_queryset()
-            .filter(events__category=Claim.EventCategories.STORED)
-            .filter(events__category=Claim.EventCategories.INITIATED_WITH_SWA_XID)
-            .exclude(events__category=Claim.EventCategories.COMPLETED)
-            .exclude(events__category=Claim.EventCategories.DELETED)
-            .distinct()
+            .filter(swa_xid__isnull=False)
+            .annotate(
+                swa_xid_initiated_at=swa_xid_initiated_at,
+                swa_xid_expired_before=swa_xid_expired_before,
+            )
+            .filter(swa_xid_initiated_at__lt=F("swa_xid_expired_before"))
+            .with_event(Claim.EventCategories.STORED)
+            .without_events(
+                Claim.EventCategories.COMPLETED, Claim.EventCategories.DELETED
+            )
         )
 
         return claims
@@ -158,6 +230,7 @@ class Claim(TimeStampedModel):
         DELETED = 7
         STATUS_CHANGED = 8
         INITIATED_WITH_SWA_XID = 9
+        BATCHED = 10
 
     uuid = models.UUIDField(default=uuid.uuid4, unique=True)
     swa = models.ForeignKey(SWA, on_delete=models.PROTECT)
@@ -168,7 +241,7 @@ class Claim(TimeStampedModel):
         Event, content_type_field="model_name", object_id_field="model_id"
     )
 
-    objects = models.Manager()
+    objects = ClaimManager()
     expired_partial_claims = ExpiredPartialClaimManager()
     expired_identity_claims = ExpiredIdentityClaimsManager()
 
@@ -262,78 +335,73 @@ class Claim(TimeStampedModel):
             + timedelta(days=settings.EXPIRE_SWA_XID_CLAIMS_AFTER.get(self.swa.code, 0))
         ) < timezone.now()
 
+    # the events loaded by prefetch_related("events"), if any
+    def prefetched_events(self):
+        return getattr(self, "_prefetched_objects_cache", {}).get("events")
+
+    def has_event(self, category):
+        events = self.prefetched_events()
+        if events is None:
+            return self.events.filter(category=category).exists()
+        return any(event.category == category for event in events)
+
+    def first_event(self, category):
+        events = self.prefetched_events()
+        if events is None:
+            return self.events.filter(category=category).order_by("id").first()
+        return min(
+            (event for event in events if event.category == category),
+            key=lambda event: event.id,
+            default=None,
+        )
+
     def is_completed(self):
-        return self.events.filter(category=Claim.EventCategories.COMPLETED).count() > 0
+        return self.has_event(Claim.EventCategories.COMPLETED)
 
     def completed_at(self):
-        if not self.is_completed():
-            return None
-        return (
-            self.events.filter(category=Claim.EventCategories.COMPLETED)
-            .first()
-            .happened_at
-        )
+        event = self.first_event(Claim.EventCategories.COMPLETED)
+        return event.happened_at if event else None
 
     def is_resolved(self):
-        return self.events.filter(category=Claim.EventCategories.RESOLVED).count() > 0
+        return self.has_event(Claim.EventCategories.RESOLVED)
 
     def resolved_at(self):
-        if not self.is_resolved():
-            return None
-        return (
-            self.events.filter(category=Claim.EventCategories.RESOLVED)
-            .first()
-            .happened_at
-        )
+        event = self.first_event(Claim.EventCategories.RESOLVED)
+        return event.happened_at if event else None
 
     def resolution_description(self):
-        if not self.is_resolved():
-            return None
-        return (
-            self.events.filter(category=Claim.EventCategories.RESOLVED)
-            .first()
-            .description
-        )
+        event = self.first_event(Claim.EventCategories.RESOLVED)
+        return event.description if event else None
 
     def is_deleted(self):
-        return self.events.filter(category=Claim.EventCategories.DELETED).count() > 0
+        return self.has_event(Claim.EventCategories.DELETED)
 
     def deleted_at(self):
-        if not self.is_deleted():
-            return None
-        return (
-            self.events.filter(category=Claim.EventCategories.DELETED)
-            .first()
-            .happened_at
-        )
+        event = self.first_event(Claim.EventCategories.DELETED)
+        return event.happened_at if event else None
 
     def is_fetched(self):
-        return self.events.filter(category=Claim.EventCategories.FETCHED).count() > 0
+        return self.has_event(Claim.EventCategories.FETCHED)
 
     def fetched_at(self):
-        if not self.is_fetched():
-            return None
-        return (
-            self.events.filter(category=Claim.EventCategories.FETCHED)
-            .first()
-            .happened_at
-        )
+        event = self.first_event(Claim.EventCategories.FETCHED)
+        return event.happened_at if event else None
 
     def is_initiated_with_swa_xid(self):
-        return (
-            self.events.filter(
-                category=Claim.EventCategories.INITIATED_WITH_SWA_XID
-            ).count()
-            > 0
-        )
+        return self.has_event(Claim.EventCategories.INITIATED_WITH_SWA_XID)
 
     def public_events(self):
-        return list(
-            map(
-                lambda event: event.as_public_dict(),
-                self.events.order_by("happened_at").all(),
-            )
-        )
+        events = self.prefetched_events()
+        if events is None:
+            events = self.events.order_by("happened_at")
+        else:
+            events = sorted(events, key=lambda event: event.happened_at)
+        public_events = []
+        for event in events:
+            # as_public_dict() would otherwise load this Claim again for each event
+            event.event_target = self
+            public_events.append(event.as_public_dict())
+        return public_events
 
     def delete_artifacts(self, partial_only=False):
         completed_artifact = ClaimReader(self, path=self.completed_payload_path())
@@ -377,7 +445,9 @@ class Claim(TimeStampedModel):
 
     def write_partial(self, validated_payload):
         sym_encryptor = SymmetricClaimEncryptor(
-            validated_payload, symmetric_encryption_key()
+            validated_payload,
+            symmetric_encryption_key(),
+            path=self.partial_payload_path(),
         )
         packaged_claim = sym_encryptor.packaged_claim()
         packaged_payload = packaged_claim.as_json()
@@ -393,31 +463,20 @@ class Claim(TimeStampedModel):
             return False
 
     def write_completed(self, validated_payload):
+        from api.claim_outbox import ClaimOutbox
+
         asym_encryptor = AsymmetricClaimEncryptor(
             validated_payload, self.swa.public_key_as_jwk()
         )
         packaged_claim = asym_encryptor.packaged_claim()
         packaged_payload = packaged_claim.as_json()
+        # commit the intent first, so no transaction is open during the S3 writes.
+        # the COMPLETED event is created only once both buckets have been written.
+        outbox = ClaimOutbox(self)
+        outbox.add_completed(packaged_payload, json_encode(validated_payload))
         try:
-            with transaction.atomic():
-                self.events.create(category=Claim.EventCategories.COMPLETED)
-                cw = ClaimWriter(
-                    self, packaged_payload, path=self.completed_payload_path()
-                )
-                if not cw.write():
-                    raise ClaimStorageError("Failed to write completed claim")
-                archive_cw = ClaimWriter(
-                    self,
-                    json_encode(validated_payload),
-                    path=self.completed_payload_path(),
-                    claim_store=ClaimStore(
-                        claim_bucket=ClaimBucket(BUCKET_TYPE_ARCHIVE)
-                    ),
-                )
-                if not archive_cw.write():
-                    raise ClaimStorageError(
-                        "Failed to write completed claim to archive"
-                    )
+            if not outbox.flush():
+                raise ClaimStorageError("Failed to write completed claim")
             logger.debug("🚀 wrote completed claim")
             return True
         except ClaimStorageError as error:
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from .base import TimeStampedModel
+from .claim import Claim
+from django.db import models
+
+
+# a pending S3 write for a Claim, committed to the db before the write happens
+# so that no transaction is held open for the length of the network I/O.
+class ClaimOutboxEntry(TimeStampedModel):
+    class Meta:
+        db_table = "claim_outbox_entries"
+        indexes = [
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    class StatusOptions(models.IntegerChoices):
+        PENDING = 0
+        DONE = 1
+        FAILED = 2
+
+    claim = models.ForeignKey(
+        Claim, on_delete=models.CASCADE, related_name="outbox_entries"
+    )
+    bucket_type = models.CharField(max_length=16)
+    path = models.CharField(max_length=255)
+    # symmetrically encrypted, and cleared once written
+    payload = models.TextField(blank=True)
+    status = models.IntegerField(
+        choices=StatusOptions.choices, default=StatusOptions.PENDING
+    )
+    attempts = models.IntegerField(default=0)
+    last_error = models.CharField(max_length=255, blank=True)
@@ -2,6 +2,7 @@
 from .base import TimeStampedModel
 from .identity_provider import IdentityProvider
 from .event import Event
+from .swa import SWA
 from django.db import models, transaction
 from django.contrib.contenttypes.fields import GenericRelation
 
@@ -49,13 +50,19 @@ class Claimant(TimeStampedModel):
                 )
             return True
 
+    # the oldest Claim initiated with a swa_xid, for an Identity Only SWA,
+    # that is neither completed nor resolved.
     def pending_identity_only_claim(self):
-        for claim in self.claim_set.all():
-            if (
-                not claim.is_completed()
-                and not claim.is_resolved()
-                and claim.swa.is_identity_only()
-                and claim.is_initiated_with_swa_xid()
-            ):
-                return claim
-        return False
+        from .claim import Claim
+
+        return (
+            self.claim_set.filter(swa__featureset=SWA.FeatureSetOptions.IDENTITY_ONLY)
+            .with_event(Claim.EventCategories.INITIATED_WITH_SWA_XID)
+            .without_events(
+                Claim.EventCategories.COMPLETED, Claim.EventCategories.RESOLVED
+            )
+            .select_related("swa")
+            .order_by("id")
+            .first()
+            or False
+        )
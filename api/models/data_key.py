@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from .base import TimeStampedModel
+from django.db import models
+import uuid
+
+
+# the wrapped (encrypted) per-artifact data key for an envelope-encrypted artifact.
+# Rotating CLAIM_SECRET_KEY re-wraps these rows, without touching the artifacts.
+class DataKey(TimeStampedModel):
+    class Meta:
+        db_table = "data_keys"
+
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True)
+    # thumbprint of the CLAIM_SECRET_KEY the data key is wrapped with
+    kek_kid = models.CharField(max_length=255, db_index=True)
+    # JSON of the JWE "encrypted_key" and per-recipient "header"
+    wrapped_key = models.TextField()
+    # path of the artifact in the SWA bucket, which is deleted with it
+    path = models.CharField(max_length=255, null=True, unique=True)
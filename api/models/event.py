@@ -10,7 +10,7 @@ class Event(TimeStampedModel):
     class Meta:
         db_table = "events"
         indexes = [
-            models.Index(fields=["model_name", "model_id"]),
+            models.Index(fields=["model_name", "model_id", "category"]),
             models.Index(fields=["category"]),
             models.Index(fields=["happened_at"]),
         ]
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from .base import TimeStampedModel
 from .identity_provider import IdentityProvider
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 
 class ActiveSwaManager(models.Manager):
@@ -62,13 +64,18 @@ class SWA(TimeStampedModel):
         from .claim import Claim
 
         return (
-            self.claim_set.filter(events__category=Claim.EventCategories.COMPLETED)
-            .exclude(
-                events__category__in=[
-                    Claim.EventCategories.FETCHED,
-                    Claim.EventCategories.RESOLVED,
-                    Claim.EventCategories.DELETED,
-                ]
+            self.claim_set.with_event(Claim.EventCategories.COMPLETED)
+            .without_events(
+                Claim.EventCategories.FETCHED,
+                Claim.EventCategories.RESOLVED,
+                Claim.EventCategories.DELETED,
             )
             .order_by("created_at")
         )
+
+
+@receiver([post_save, post_delete], sender=SWA)
+def swa_changed(sender, **kwargs):
+    from api.swa_registry import swa_registry
+
+    transaction.on_commit(swa_registry.changed)
@@ -13,6 +13,7 @@ from api.models.claim import (
     CLAIMANT_STATUS_DELETED,
 )
 import datetime
+import uuid
 from datetime import timedelta
 from dateutil.tz import gettz
 from django.utils import timezone
@@ -28,9 +29,11 @@ import boto3
 from botocore.stub import Stubber
 from core.claim_storage import ClaimWriter
 from unittest.mock import patch
+from django.test.utils import override_settings
 from core.test_utils import BucketableTestCase, generate_keypair
 from api.identity_claim_maker import IdentityClaimMaker
 from core.exceptions import ClaimStorageError
+from core.benchmarks import claim_queries
 
 logger = logging.getLogger(__name__)
 
@@ -219,37 +222,56 @@ class ClaimTestCase(BucketableTestCase):
                 swa_xid=case.get("swa_xid", None),
             )
 
-        # since expiration is SWA-dependent, we expect the query to return all those with swa_xid
+        # expiration is SWA-dependent, and applied in the query
         claims = Claim.expired_identity_claims.all()
         claim_ids = list(map(lambda c: str(c.uuid), claims))
-        self.assertEqual(claims.count(), 3)
-        self.assertCountEqual(
-            claim_ids, [expired_claim_uuid, expired_claim_uuid_2, unexpired_claim_uuid]
-        )
-        # however, the complete_all method should operate on only one.
+        self.assertEqual(claims.count(), 2)
+        self.assertCountEqual(claim_ids, [expired_claim_uuid, expired_claim_uuid_2])
+        for claim in Claim.objects.filter(swa_xid__isnull=False):
+            self.assertEqual(
+                claim.is_swa_xid_expired(), str(claim.uuid) in claim_ids, claim.uuid
+            )
+        with override_settings(
+            EXPIRE_SWA_XID_CLAIMS_AFTER={swa.code: claim_lifespan - 2}
+        ):
+            self.assertEqual(Claim.expired_identity_claims.count(), 3)
+        # SWAs without a setting expire right away
+        with override_settings(EXPIRE_SWA_XID_CLAIMS_AFTER={}):
+            self.assertEqual(Claim.expired_identity_claims.count(), 3)
+        with override_settings(
+            EXPIRE_SWA_XID_CLAIMS_AFTER={swa.code: claim_lifespan + 2}
+        ):
+            self.assertEqual(Claim.expired_identity_claims.count(), 0)
+
+        # the complete_all method should operate on only one.
         # must create a partial artifact for it to operate on. Contents are irrelevant (we test contents elsewhere).
         claim = Claim.objects.get(uuid=expired_claim_uuid)
         maker = IdentityClaimMaker(claim, whoami=None)
         maker.write_partial({"id": expired_claim_uuid, "foo": "bar"})
 
         # run it once with mocked writer to simulate failure
-        with patch("api.models.claim.ClaimWriter") as mock_writer:
-            mock_writer.return_value.write.return_value = False
+        with patch("api.claim_outbox.ClaimOutbox.flush") as mock_flush:
+            mock_flush.return_value = False
             with self.assertRaises(ClaimStorageError) as context:
                 Claim.expired_identity_claims.complete_all()
             self.assertIn("Failed to write Identity claim", str(context.exception))
 
-        # run it again for real
+        # run it again for real, one claim at a time
         with self.assertLogs(level="DEBUG") as cm:
-            self.assertEqual(Claim.expired_identity_claims.complete_all(), 1)
-            self.assertIn(
-                f"DEBUG:api.models.claim:Skipping claim {unexpired_claim_uuid} -- not swa_xid_expired",
-                cm.output,
+            self.assertEqual(
+                Claim.expired_identity_claims.complete_all(chunk_size=1), 1
             )
             self.assertIn(
                 f"ERROR:api.models.claim:Missing partial artifact for claim {expired_claim_uuid_2}",
                 cm.output,
             )
+        self.assertTrue(claim.is_completed())
+        self.assertTrue(claim.completed_artifact_exists())
+        self.assertFalse(claim.read_partial())
+        self.assertEqual(
+            list(Claim.expired_identity_claims.values_list("uuid", flat=True)),
+            [uuid.UUID(expired_claim_uuid_2)],
+        )
 
     def test_swa_claim_queue(self):
         swa, _ = create_swa()
@@ -274,6 +296,35 @@ class ClaimTestCase(BucketableTestCase):
         claim2.events.create(category=Claim.EventCategories.DELETED)
         self.assertEqual(swa.claim_queue().count(), 0)
 
+        # a second COMPLETED event does not list the claim twice
+        claim3 = Claim(swa=swa, claimant=claimant)
+        claim3.save()
+        claim3.events.create(category=Claim.EventCategories.COMPLETED)
+        claim3.events.create(category=Claim.EventCategories.COMPLETED)
+        self.assertEqual(list(swa.claim_queue()), [claim3])
+
+    def test_claim_event_queries(self):
+        # the EXISTS querysets match the joins they replaced
+        claim_queries.seed(200, random_seed=1)
+        claim = Claim.objects.order_by("-id").first()
+        self.assertTrue(claim_queries.legacy_expired_partial_claims().exists())
+        self.assertCountEqual(
+            claim_queries.legacy_expired_partial_claims(),
+            Claim.expired_partial_claims.all(),
+        )
+        for swa in SWA.objects.all():
+            self.assertCountEqual(
+                claim_queries.legacy_claim_queue(swa), swa.claim_queue()
+            )
+        self.assertCountEqual(
+            claim_queries.legacy_find(claim), claim_queries.find(claim)
+        )
+
+        results = claim_queries.run(sizes=[10], number=1, repeat=1)
+        self.assertEqual(len(results), 7)
+        self.assertEqual(results[0]["params"], {"claims": 10, "events": 100})
+        self.assertTrue(results[0]["plan"])
+
     def test_claim_initiate_with_swa_xid(self):
         # we use AR because we know we have a swa_xid format defined
         swa = SWA.active.get(code="AR")
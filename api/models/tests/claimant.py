@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 from django.test import TestCase
 from django.db.models import ProtectedError
-from api.models import Claimant
-from api.test_utils import create_idp, create_claimant
+from api.models import Claim, Claimant, SWA
+from api.test_utils import create_idp, create_claimant, create_swa
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,3 +31,32 @@ class ClaimantTestCase(TestCase):
             claimant.bump_IAL_if_necessary("2")
         )  # only the first results in a change
         self.assertFalse(claimant.bump_IAL_if_necessary("2"))
+
+    def test_pending_identity_only_claim(self):
+        idp = create_idp()
+        claimant = create_claimant(idp)
+        identity_swa, _ = create_swa(
+            code="ZZ", featureset=SWA.FeatureSetOptions.IDENTITY_ONLY
+        )
+        claim_swa, _ = create_swa(code="ZY")
+        self.assertFalse(claimant.pending_identity_only_claim())
+
+        def create_claim(swa, *categories):
+            claim = Claim.objects.create(swa=swa, claimant=claimant)
+            for category in categories:
+                claim.events.create(category=category)
+            return claim
+
+        initiated = Claim.EventCategories.INITIATED_WITH_SWA_XID
+        create_claim(claim_swa, initiated)
+        create_claim(identity_swa)
+        create_claim(identity_swa, initiated, Claim.EventCategories.COMPLETED)
+        create_claim(identity_swa, initiated, Claim.EventCategories.RESOLVED)
+        pending = create_claim(identity_swa, initiated)
+        create_claim(identity_swa, initiated)
+
+        # one query however many claims, with the SWA loaded
+        with self.assertNumQueries(1):
+            claim = claimant.pending_identity_only_claim()
+            self.assertEqual(claim, pending)
+            self.assertTrue(claim.swa.is_identity_only())
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# Every SWA, loaded once per process and looked up by code without a query.
+# Saving or deleting a SWA (see the signal receiver in api/models/swa.py) changes a version
+# key in the shared cache once the transaction commits. Each process checks that key at
+# most every SWA_REGISTRY_CHECK_SECONDS, and reloads when it has changed.
+#
+# Inside a transaction (e.g. in tests) lookups go to the database, so the registry
+# never holds rows that may yet be rolled back.
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from .models import SWA
+import copy
+import logging
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "swa-registry-version"
+
+
+class SWARegistry(object):
+    def __init__(self, check_seconds=None, cache_alias=None):
+        self.check_seconds = (
+            settings.SWA_REGISTRY_CHECK_SECONDS
+            if check_seconds is None
+            else check_seconds
+        )
+        self.cache_alias = cache_alias or settings.SWA_REGISTRY_CACHE_ALIAS
+        self.lock = threading.Lock()
+        # (SWAs ordered by name, SWAs by upper case code)
+        self.swas = None
+        self.version = None
+        self.checked_at = 0
+
+    def shared_version(self):
+        try:
+            cache = caches[self.cache_alias]
+            # the first process to look sets it
+            cache.add(VERSION_KEY, secrets.token_hex(8), None)
+            return cache.get(VERSION_KEY)
+        except Exception as error:
+            logger.exception(error)
+            return None
+
+    def cacheable(self):
+        return not connection.in_atomic_block
+
+    def load(self):
+        now = time.time()
+        with self.lock:
+            if self.swas is not None and now - self.checked_at < self.check_seconds:
+                return self.swas
+        version = self.shared_version()
+        with self.lock:
+            # a version of None (e.g. the cache is unreachable) is never current
+            if self.swas is None or version is None or version != self.version:
+                swas = list(SWA.objects.order_by("name"))
+                self.swas = (swas, {swa.code.upper(): swa for swa in swas})
+                self.version = version
+            self.checked_at = now
+            return self.swas
+
+    def all(self):
+        if not self.cacheable():
+            return list(SWA.objects.order_by("name"))
+        # copies, as the cached instances are shared by every request in the process
+        swas, _ = self.load()
+        return [copy.copy(swa) for swa in swas]
+
+    def active_ordered_by_name(self):
+        return [swa for swa in self.all() if swa.status == SWA.StatusOptions.ACTIVE]
+
+    # like SWA.active.get(code=code), or SWA.objects.get(code=code) with active=False.
+    # codes match case-insensitively, as they do in MySQL.
+    def get(self, code, active=True):
+        if not self.cacheable():
+            manager = SWA.active if active else SWA.objects
+            return manager.get(code=code)
+        _, by_code = self.load()
+        swa = by_code.get(str(code).upper())
+        if swa and (not active or swa.status == SWA.StatusOptions.ACTIVE):
+            return copy.copy(swa)
+        raise SWA.DoesNotExist("No SWA with code {}".format(code))
+
+    def clear(self):
+        with self.lock:
+            self.swas = None
+
+    def changed(self):
+        self.clear()
+        try:
+            caches[self.cache_alias].set(VERSION_KEY, secrets.token_hex(8), None)
+        except Exception as error:
+            logger.exception(error)
+
+
+swa_registry = SWARegistry()
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from celery import shared_task
+from core.exceptions import ClaimStorageError
+from .claim_outbox import ClaimOutbox
+from .models import Claim
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(ClaimStorageError,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 3},
+)
+def flush_claim_outbox(self, claim_id):
+    outbox = ClaimOutbox(Claim.objects.get(id=claim_id))
+    if not outbox.flush() and outbox.pending().exists():
+        raise ClaimStorageError(
+            "Failed to flush claim outbox for claim {}".format(claim_id)
+        )
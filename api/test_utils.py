@@ -115,7 +115,9 @@ def create_claimant_file(claimant, swa, key):
         "swa_code": swa.code,
         "id": str(claimant_file.uuid),
     }
-    sym_encryptor = SymmetricClaimEncryptor(payload, key)
+    sym_encryptor = SymmetricClaimEncryptor(
+        payload, key, path=claimant_file.payload_path()
+    )
     packaged_file = sym_encryptor.packaged_claim()
     packaged_payload = packaged_file.as_json()
     cw = ClaimWriter(claim=claimant_file, payload=packaged_payload)
@@ -1,17 +1,24 @@
 # -*- coding: utf-8 -*-
 from .views import ApiViewsTestCase, ClaimApiTestCase
-from .claim_cleaner import ClaimCleanerTestCase
+from .claim_cleaner import ClaimCleanerTestCase, ClaimCleanerPropertiesTestCase
 from .claim_validator import ClaimValidatorTestCase
+from .claim_validation_cache import ClaimValidationCacheTestCase
 from .claim_finder import ClaimFinderTestCase
 from .identity_claim_maker import IdentityClaimMakerTestCase
 from .whoami import WhoAmITestCase
+from .claim_outbox import ClaimOutboxTestCase
+from .swa_registry import SWARegistryTestCase
 
 __all__ = [
     "ApiViewsTestCase",
     "ClaimApiTestCase",
     "ClaimCleanerTestCase",
+    "ClaimCleanerPropertiesTestCase",
     "ClaimValidatorTestCase",
+    "ClaimValidationCacheTestCase",
     "ClaimFinderTestCase",
     "IdentityClaimMakerTestCase",
     "WhoAmITestCase",
+    "ClaimOutboxTestCase",
+    "SWARegistryTestCase",
 ]
@@ -3,12 +3,112 @@ from django.test import TestCase
 from api.test_utils import create_whoami, BaseClaim
 from api.whoami import WhoAmI
 from api.claim_cleaner import ClaimCleaner
+from hypothesis import given, settings, strategies as st
+from hypothesis.extra.django import TestCase as HypothesisTestCase
+import copy
 import logging
+import re
 
 
 logger = logging.getLogger(__name__)
 
 
+# ClaimCleaner.cleaned() as it was before it was made copy-on-write,
+# kept as the reference its output is compared to.
+def deepcopy_cleaned(payload, whoami):
+    claim = copy.deepcopy(payload)
+    claim["idp_identity"] = whoami.as_identity()
+    claim["idp_identity"]["swa_code"] = claim.get("swa_code")
+    claim["idp_identity"]["id"] = claim.get("id")
+    claim["idp_identity"]["claimant_id"] = claim.get("claimant_id")
+    claim.pop("identity_provider", None)
+    if "ssn" in claim:
+        claim["ssn"] = re.sub(
+            r"^([0-9]{3})-?([0-9]{2})-?([0-9]{4})$", r"\1-\2-\3", claim["ssn"]
+        )
+    if (
+        "work_authorization" in claim
+        and "alien_registration_number" in claim["work_authorization"]
+    ):
+        claim["work_authorization"]["alien_registration_number"] = re.sub(
+            r"^([0-9]{3})-?([0-9]{3})-?([0-9]{3})$",
+            r"\1-\2-\3",
+            claim["work_authorization"]["alien_registration_number"],
+        )
+    if "employers" in claim:
+        for employer in claim["employers"]:
+            if "fein" in employer and employer["fein"]:
+                employer["fein"] = re.sub(
+                    r"^([0-9]{2})-?([0-9]{7})$", r"\1-\2", employer["fein"]
+                )
+
+    def clean(claim):
+        cleaned_claim = {}
+        for key, value in claim.items():
+            if key.startswith("LOCAL_"):
+                continue
+            if isinstance(value, dict):
+                cleaned_claim[key] = clean(value)
+            elif isinstance(value, list):
+                cleaned_claim[key] = [
+                    clean(item) if isinstance(item, dict) else item for item in value
+                ]
+            else:
+                cleaned_claim[key] = value
+        return cleaned_claim
+
+    return clean(claim)
+
+
+def claim_payloads():
+    keys = (
+        st.sampled_from(
+            [
+                "id",
+                "swa_code",
+                "claimant_id",
+                "email",
+                "identity_provider",
+                "idp_identity",
+            ]
+        )
+        | st.text(max_size=8).map(lambda key: "LOCAL_" + key)
+        | st.text(max_size=8)
+    )
+    scalars = st.none() | st.booleans() | st.integers() | st.text(max_size=10)
+    values = st.recursive(
+        scalars,
+        lambda children: st.lists(children, max_size=4)
+        | st.dictionaries(keys, children, max_size=4),
+        max_leaves=20,
+    )
+    ssn = st.from_regex(r"[0-9]{3}-?[0-9]{2}-?[0-9]{4}", fullmatch=True)
+    alien_registration_number = st.from_regex(
+        r"[0-9]{3}-?[0-9]{3}-?[0-9]{3}", fullmatch=True
+    )
+    fein = st.from_regex(r"[0-9]{2}-?[0-9]{7}", fullmatch=True)
+    employer = st.fixed_dictionaries(
+        {}, optional={"fein": fein | scalars, "LOCAL_x": values, "name": values}
+    ) | st.dictionaries(keys, values, max_size=4)
+    special_values = st.fixed_dictionaries(
+        {},
+        optional={
+            "ssn": ssn | st.text(max_size=12),
+            "work_authorization": st.fixed_dictionaries(
+                {},
+                optional={
+                    "alien_registration_number": alien_registration_number,
+                    "LOCAL_x": values,
+                },
+            ),
+            "employers": st.lists(employer, max_size=4),
+        },
+    )
+    return st.tuples(st.dictionaries(keys, values, max_size=6), special_values).map(
+        lambda dicts: dicts[0] | dicts[1]
+    )
+
+
 class ClaimCleanerTestCase(TestCase, BaseClaim):
     def test_claim_cleaner(self):
         payload = self.base_claim() | {
@@ -35,3 +135,39 @@ class ClaimCleanerTestCase(TestCase, BaseClaim):
             cleaned_claim["work_authorization"]["alien_registration_number"],
             "111-111-111",
         )
+
+    def test_claim_cleaner_does_not_modify_payload(self):
+        payload = self.base_claim() | {
+            "ssn": "666000000",
+            "LOCAL_foo": "bar",
+            "identity_provider": "old",
+        }
+        payload["employers"][0]["LOCAL_same_address"] = True
+        original = copy.deepcopy(payload)
+        cleaned_claim = ClaimCleaner(
+            payload, WhoAmI.from_dict(create_whoami())
+        ).cleaned()
+        self.assertEqual(payload, original)
+        self.assertNotIn("LOCAL_foo", cleaned_claim)
+        self.assertNotIn("identity_provider", cleaned_claim)
+        self.assertNotIn("LOCAL_same_address", cleaned_claim["employers"][0])
+        # unchanged values are shared, not copied
+        self.assertIs(cleaned_claim["claimant_name"], payload["claimant_name"])
+
+
+class ClaimCleanerPropertiesTestCase(HypothesisTestCase):
+    @settings(max_examples=300, deadline=None)
+    @given(payload=claim_payloads())
+    def test_claim_cleaner_matches_deepcopy_cleaner(self, payload):
+        whoami = WhoAmI.from_dict(create_whoami())
+        original = copy.deepcopy(payload)
+        try:
+            expected = deepcopy_cleaned(payload, whoami)
+        except Exception as error:
+            with self.assertRaises(type(error)):
+                ClaimCleaner(payload, whoami).cleaned()
+            return
+        cleaned_claim = ClaimCleaner(payload, whoami).cleaned()
+        self.assertEqual(cleaned_claim, expected)
+        self.assertEqual(list(cleaned_claim), list(expected))
+        self.assertEqual(payload, original)
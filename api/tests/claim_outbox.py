@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from django.core.management import call_command
+from django.test import override_settings
+from api.test_utils import create_idp, create_swa, create_claimant
+from api.models import Claim, ClaimOutboxEntry
+from api.claim_outbox import ClaimOutbox
+from core.test_utils import BucketableTestCase
+from core.claim_encryption import AsymmetricClaimDecryptor
+from core.claim_storage import (
+    BUCKET_TYPE_ARCHIVE,
+    ClaimBucket,
+    ClaimFanoutWriter,
+    ClaimReader,
+    ClaimStore,
+)
+from jwcrypto.common import json_decode
+from unittest.mock import patch
+import boto3
+from botocore.stub import Stubber
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = ClaimOutboxEntry.StatusOptions.PENDING
+DONE = ClaimOutboxEntry.StatusOptions.DONE
+FAILED = ClaimOutboxEntry.StatusOptions.FAILED
+
+
+class ClaimOutboxTestCase(BucketableTestCase):
+    def setUp(self):
+        super().setUp()
+        self.swa, self.private_key_jwk = create_swa(True)
+        self.claimant = create_claimant(create_idp())
+        self.claim = Claim(swa=self.swa, claimant=self.claimant)
+        self.claim.save()
+        self.payload = {"id": str(self.claim.uuid), "foo": "bar"}
+
+    def failing_s3_client(self, mock_client):
+        client = boto3.client("s3")
+        stubber = Stubber(client)
+        stubber.add_client_error("put_object")
+        stubber.add_client_error("put_object")
+        stubber.activate()
+        mock_client.return_value = client
+
+    def test_write_completed(self):
+        self.assertTrue(self.claim.write_completed(self.payload))
+        self.assertTrue(self.claim.is_completed())
+        self.assertEqual(
+            self.claim.events.filter(category=Claim.EventCategories.STORED).count(), 2
+        )
+
+        entries = ClaimOutboxEntry.objects.filter(claim=self.claim)
+        self.assertEqual(entries.count(), 2)
+        for entry in entries:
+            self.assertEqual(entry.status, DONE)
+            self.assertEqual(entry.attempts, 1)
+            self.assertEqual(entry.payload, "")
+
+        packaged_claim = ClaimReader(
+            self.claim, path=self.claim.completed_payload_path()
+        ).read()
+        self.assertEqual(
+            AsymmetricClaimDecryptor(packaged_claim, self.private_key_jwk).decrypt(),
+            self.payload,
+        )
+        archived_claim = ClaimReader(
+            self.claim,
+            path=self.claim.completed_payload_path(),
+            claim_store=ClaimStore(claim_bucket=ClaimBucket(BUCKET_TYPE_ARCHIVE)),
+        ).read()
+        self.assertEqual(json_decode(archived_claim), self.payload)
+
+    def test_write_completed_failure(self):
+        with patch("core.claim_storage.ClaimStore.s3_client") as mock_client:
+            self.failing_s3_client(mock_client)
+            with self.assertLogs(level="ERROR"):
+                self.assertFalse(self.claim.write_completed(self.payload))
+        self.assertFalse(self.claim.is_completed())
+
+        outbox = ClaimOutbox(self.claim)
+        self.assertEqual(outbox.pending().count(), 2)
+        for entry in outbox.pending():
+            self.assertEqual(entry.attempts, 1)
+            self.assertNotEqual(entry.last_error, "")
+            # the plaintext archive payload is never stored as-is
+            self.assertNotIn("bar", entry.payload)
+
+        # the intent survives, so a later flush completes the Claim
+        self.assertTrue(outbox.flush())
+        self.assertTrue(self.claim.is_completed())
+        self.assertEqual(outbox.pending().count(), 0)
+        # flushing again is a no-op
+        self.assertTrue(outbox.flush())
+        self.assertEqual(
+            self.claim.events.filter(category=Claim.EventCategories.COMPLETED).count(),
+            1,
+        )
+
+    def test_resubmit_supersedes_pending(self):
+        outbox = ClaimOutbox(self.claim)
+        outbox.add_completed("first", "first")
+        outbox.add_completed("second", "second")
+        self.assertEqual(outbox.pending().count(), 2)
+        self.assertTrue(outbox.flush())
+        self.assertEqual(
+            ClaimReader(self.claim, path=self.claim.completed_payload_path()).read(),
+            "second",
+        )
+
+    def test_resubmit_during_flush(self):
+        outbox = ClaimOutbox(self.claim)
+        outbox.add_completed("first", "first")
+        put = ClaimFanoutWriter.put
+
+        def resubmit(writer):
+            put(writer)
+            outbox.add_completed("second", "second")
+
+        with patch.object(ClaimFanoutWriter, "put", resubmit):
+            self.assertFalse(outbox.flush())
+        # the superseded entries are not recorded (or re-created)
+        self.assertEqual(ClaimOutboxEntry.objects.filter(claim=self.claim).count(), 2)
+        for entry in outbox.pending():
+            self.assertEqual(entry.attempts, 0)
+        self.assertFalse(self.claim.is_completed())
+
+        self.assertTrue(outbox.flush())
+        self.assertEqual(
+            ClaimReader(self.claim, path=self.claim.completed_payload_path()).read(),
+            "second",
+        )
+
+    def test_concurrent_flush(self):
+        outbox = ClaimOutbox(self.claim)
+        outbox.add_completed("packaged", "archive")
+        put = ClaimFanoutWriter.put
+
+        def flush_elsewhere(writer):
+            put(writer)
+            with patch.object(ClaimFanoutWriter, "put", put):
+                self.assertTrue(ClaimOutbox(self.claim).flush())
+
+        with patch.object(ClaimFanoutWriter, "put", flush_elsewhere):
+            self.assertTrue(outbox.flush())
+        for entry in ClaimOutboxEntry.objects.filter(claim=self.claim):
+            self.assertEqual(entry.status, DONE)
+            self.assertEqual(entry.attempts, 1)
+        for category, count in [
+            (Claim.EventCategories.COMPLETED, 1),
+            (Claim.EventCategories.STORED, 2),
+        ]:
+            self.assertEqual(self.claim.events.filter(category=category).count(), count)
+
+    @override_settings(CLAIM_OUTBOX_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        outbox = ClaimOutbox(self.claim)
+        outbox.add_completed("packaged", "archive")
+        with patch("core.claim_storage.ClaimStore.s3_client") as mock_client:
+            for attempt in range(2):
+                self.failing_s3_client(mock_client)
+                with self.assertLogs(level="ERROR"):
+                    self.assertFalse(outbox.flush())
+        self.assertEqual(outbox.pending().count(), 0)
+        self.assertEqual(
+            ClaimOutboxEntry.objects.filter(claim=self.claim, status=FAILED).count(), 2
+        )
+        self.assertFalse(outbox.flush())
+        self.assertFalse(self.claim.is_completed())
+
+    @override_settings(CLAIM_OUTBOX_MAX_ATTEMPTS=2)
+    def test_undecryptable_entry(self):
+        outbox = ClaimOutbox(self.claim)
+        outbox.add_completed("packaged", "archive")
+        outbox.pending().filter(bucket_type=BUCKET_TYPE_ARCHIVE).update(
+            payload="not a JWE"
+        )
+        for attempt in range(2):
+            with self.assertLogs(level="ERROR"):
+                self.assertFalse(outbox.flush())
+        entry = ClaimOutboxEntry.objects.get(
+            claim=self.claim, bucket_type=BUCKET_TYPE_ARCHIVE
+        )
+        self.assertEqual(entry.status, FAILED)
+        self.assertEqual(entry.attempts, 2)
+        self.assertNotEqual(entry.last_error, "")
+        # the other entry is still written
+        self.assertEqual(outbox.claim.outbox_entries.filter(status=DONE).count(), 1)
+        self.assertFalse(self.claim.is_completed())
+
+    def test_local_backend_write_failure(self):
+        with patch("core.claim_storage.ClaimStore.write") as mock_write:
+            mock_write.side_effect = PermissionError("denied")
+            with self.assertLogs(level="ERROR"):
+                self.assertFalse(self.claim.write_completed(self.payload))
+        for entry in ClaimOutbox(self.claim).pending():
+            self.assertEqual(entry.attempts, 1)
+            self.assertEqual(entry.last_error, "denied")
+
+    @override_settings(CLAIM_OUTBOX_RECONCILE_AFTER=60)
+    def test_reconcile_command(self):
+        ClaimOutbox(self.claim).add_completed("packaged", "archive")
+        with patch("api.tasks.flush_claim_outbox.delay") as mock_delay:
+            call_command("reconcile_claim_outbox")
+            mock_delay.assert_not_called()
+
+            ClaimOutboxEntry.objects.filter(claim=self.claim).update(
+                updated_at=self.claim.created_at - timedelta(minutes=5)
+            )
+            call_command("reconcile_claim_outbox")
+            mock_delay.assert_called_once_with(self.claim.id)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase, override_settings
+from django.core.cache import caches
+from unittest.mock import patch
+from api.test_utils import BaseClaim
+from api.claim_validator import ClaimValidator
+from api.claim_validation_cache import (
+    ClaimValidationCache,
+    claim_digest,
+    schema_version,
+)
+from pathlib import Path
+import json
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimValidationCacheTestCase(TestCase, BaseClaim):
+    def test_validate_once(self):
+        validation_cache = ClaimValidationCache(max_size=10, cache_alias="")
+        claim = {"claimant_name": {"first_name": "foo"}, "birthdate": "1234"}
+        with patch(
+            "api.claim_validation_cache.ClaimValidator", wraps=ClaimValidator
+        ) as mocked_validator:
+            result = validation_cache.validate(claim)
+            cached_result = validation_cache.validate(dict(claim))
+            self.assertEqual(mocked_validator.call_count, 1)
+        self.assertFalse(result.valid)
+        self.assertIn("'1234' is not a 'date'", result.errors_as_dict())
+        self.assertEqual(result.errors_as_dict(), cached_result.errors_as_dict())
+        self.assertEqual(
+            ClaimValidator(claim).errors_as_dict().keys(),
+            cached_result.errors_as_dict().keys(),
+        )
+        self.assertEqual(
+            cached_result.schema_url,
+            "https://unemployment.dol.gov/schemas/claim-v1.0.json",
+        )
+
+    def test_digest_ignores_key_order(self):
+        self.assertEqual(
+            claim_digest({"a": 1, "b": {"c": 2, "d": 3}}),
+            claim_digest({"b": {"d": 3, "c": 2}, "a": 1}),
+        )
+        self.assertNotEqual(claim_digest({"a": 1}), claim_digest({"a": 2}))
+        validation_cache = ClaimValidationCache(max_size=10, cache_alias="")
+        self.assertNotEqual(
+            validation_cache.key({"a": 1}),
+            validation_cache.key({"a": 1}, schema_name="identity-v1.0"),
+        )
+
+    def test_lru_is_bounded(self):
+        validation_cache = ClaimValidationCache(max_size=2, cache_alias="")
+        validation_cache.set("a", {})
+        validation_cache.set("b", {})
+        self.assertEqual(validation_cache.get("a"), {})  # "b" is now oldest
+        validation_cache.set("c", {})
+        self.assertEqual(list(validation_cache.results), ["a", "c"])
+        self.assertIsNone(validation_cache.get("b"))
+
+        validation_cache.clear()
+        self.assertIsNone(validation_cache.get("a"))
+
+        no_lru = ClaimValidationCache(max_size=0, cache_alias="")
+        no_lru.set("a", {})
+        self.assertIsNone(no_lru.get("a"))
+
+    def test_shared_tier(self):
+        claim = self.base_claim(id="123", claimant_id="abc", email="foo@example.com")
+        validation_cache = ClaimValidationCache(max_size=10, cache_alias="default")
+        key = validation_cache.key(claim)
+        caches["default"].delete(key)
+        result = validation_cache.validate(claim)
+
+        # another process, with an empty LRU, finds the result in the shared tier
+        other_cache = ClaimValidationCache(max_size=10, cache_alias="default")
+        with patch("api.claim_validation_cache.ClaimValidator") as mocked_validator:
+            other_result = other_cache.validate(claim)
+            mocked_validator.assert_not_called()
+        self.assertEqual(result.errors_as_dict(), other_result.errors_as_dict())
+        self.assertIn(key, other_cache.results)
+        caches["default"].delete(key)
+
+    def test_shared_tier_errors_are_not_fatal(self):
+        validation_cache = ClaimValidationCache(max_size=10, cache_alias="default")
+        with patch("api.claim_validation_cache.caches") as mocked_caches:
+            mocked_caches.__getitem__.return_value.get.side_effect = Exception("down")
+            mocked_caches.__getitem__.return_value.set.side_effect = Exception("down")
+            with self.assertLogs(level=logging.ERROR):
+                self.assertIsNone(validation_cache.get("missing"))
+            with self.assertLogs(level=logging.ERROR):
+                result = validation_cache.validate({"birthdate": "2000-01-01"})
+        self.assertFalse(result.valid)
+        self.assertIn(
+            validation_cache.key({"birthdate": "2000-01-01"}), validation_cache.results
+        )
+
+    def test_schema_version_includes_refs(self):
+        self.addCleanup(schema_version.cache_clear)
+        with tempfile.TemporaryDirectory() as base_dir:
+            schemas = Path(base_dir) / "schemas"
+            schemas.mkdir()
+
+            def write(name, schema):
+                (schemas / f"{name}.json").write_text(json.dumps(schema))
+                schema_version.cache_clear()
+
+            write("claim", {"$ref": "file:schemas/identity.json#/definitions/id"})
+            write("identity", {"properties": {"$ref": "file:schemas/claim.json"}})
+            with override_settings(BASE_DIR=Path(base_dir)):
+                version = schema_version("claim")
+                write("identity", {"properties": {}})
+                self.assertNotEqual(schema_version("claim"), version)
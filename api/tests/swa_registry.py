@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+from unittest.mock import patch
+from api.models import SWA
+from api.swa_registry import SWARegistry, swa_registry
+from api.test_utils import create_swa
+
+
+# TestCase runs each test in a transaction, which the registry does not cache
+@patch("api.swa_registry.SWARegistry.cacheable", return_value=True)
+class SWARegistryTestCase(TestCase):
+    def setUp(self):
+        self.active_swa, _ = create_swa(is_active=True, code="ZZ", name="Zed")
+        self.inactive_swa, _ = create_swa(code="ZY", name="Wye")
+        self.registry = SWARegistry(check_seconds=60)
+
+    def test_get(self, cacheable):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.registry.get("ZZ"), self.active_swa)
+            self.assertEqual(self.registry.get("zz"), self.active_swa)
+            self.assertEqual(self.registry.get("ZY", active=False), self.inactive_swa)
+            with self.assertRaises(SWA.DoesNotExist):
+                self.registry.get("ZY")
+            with self.assertRaises(SWA.DoesNotExist):
+                self.registry.get("XX")
+
+        # each lookup gets its own copy
+        swa = self.registry.get("ZZ")
+        swa.name = "changed"
+        self.assertEqual(self.registry.get("ZZ").name, "Zed")
+
+    def test_active_ordered_by_name(self, cacheable):
+        self.inactive_swa.status = SWA.StatusOptions.ACTIVE
+        self.inactive_swa.save()
+        codes = [swa.code for swa in self.registry.active_ordered_by_name()]
+        self.assertEqual(codes, [swa.code for swa in SWA.active.order_by("name")])
+        self.assertLess(codes.index("ZY"), codes.index("ZZ"))
+
+    def test_changed(self, cacheable):
+        # which this test leaves holding rows that are rolled back
+        self.addCleanup(swa_registry.clear)
+        other_process = SWARegistry(check_seconds=0)
+        self.assertEqual(self.registry.get("ZZ").name, "Zed")
+        self.assertEqual(other_process.get("ZZ").name, "Zed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.active_swa.name = "Zed Prime"
+            self.active_swa.save()
+        # this process
+        self.assertEqual(swa_registry.get("ZZ").name, "Zed Prime")
+        # another process, once it checks the shared version
+        self.assertEqual(other_process.get("ZZ").name, "Zed Prime")
+        self.assertEqual(self.registry.get("ZZ").name, "Zed")
+        self.registry.checked_at = 0
+        self.assertEqual(self.registry.get("ZZ").name, "Zed Prime")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.active_swa.delete()
+        with self.assertRaises(SWA.DoesNotExist):
+            other_process.get("ZZ")
@@ -298,6 +298,16 @@ class ApiViewsTestCase(
         partial_artifact = claim.read_partial()
         self.assertTrue("validated_at" in partial_artifact)
 
+        # the marked claim in the session is already known to be valid
+        with patch("api.claim_validation_cache.ClaimValidator") as mocked_validator:
+            response = csrf_client.get(url, content_type=JSON, **headers)
+            mocked_validator.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["claim"]["validated_at"], partial_artifact["validated_at"]
+        )
+        self.assertNotIn("validation_errors", response.json())
+
     def test_get_completed_claim_at_partial_endpoint(self):
         # heavily contrived example to exercise the edges of caching logic.
         idp = create_idp()
@@ -350,6 +360,29 @@ class ApiViewsTestCase(
         self.assertFalse(response.json()["claims"][1]["resolved_at"])
         self.assertFalse(response.json()["claims"][1]["resolution"])
 
+    def test_get_claims_query_budget(self):
+        idp = create_idp()
+        swa, _ = create_swa()
+        claimant = create_claimant(idp)
+        client = self.csrf_client(claimant, swa)
+        for _ in range(10):
+            claim = Claim(swa=swa, claimant=claimant)
+            claim.save()
+            for category in [
+                Claim.EventCategories.COMPLETED,
+                Claim.EventCategories.FETCHED,
+                Claim.EventCategories.RESOLVED,
+            ]:
+                claim.events.create(category=category, description="done")
+
+        # the Claims' events are prefetched, so the queries do not grow with the Claims
+        with self.assertNumQueries(4):
+            response = client.get("/api/claims/")
+        self.assertEqual(response.status_code, 200)
+        claims = response.json()["claims"]
+        self.assertEqual(len(claims), 10)
+        self.assertTrue(all(claim["resolution"] == "done" for claim in claims))
+
     def test_cancel_claim(self):
         idp = create_idp()
         swa, _ = create_swa()
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse
 from django.views.decorators.cache import never_cache
 from django.core.exceptions import BadRequest
 import logging
@@ -9,12 +9,13 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from datetime import timedelta
-from api.models.swa import SWA
+from api.swa_registry import swa_registry
 from .decorators import authenticated_claimant_session
 from .claim_finder import ClaimFinder
 from .claim_request import ClaimRequest
 from .claim_validator import ClaimValidator
 from .claim_cleaner import ClaimCleaner
+from .claim_validation_cache import claim_validation_cache
 from .claim_serializer import ClaimSerializer
 from .claim_maker import ClaimMaker
 from .models import Claim
@@ -22,6 +23,8 @@ from .whoami import WhoAmI, WhoAmISWA
 from core.email import InitialClaimConfirmationEmail
 from core.utils import register_local_login
 from core.exceptions import ClaimStorageError
+from core.json_codec import FastJsonResponse
+from core.query_budget import query_budget
 from dacite import from_dict
 
 
@@ -34,24 +37,27 @@ def whoami_from_session(request):
     return from_dict(data_class=WhoAmI, data=whoami_dict)
 
 
+@query_budget(20)
 @require_http_methods(["POST"])
 @csrf_exempt
 @never_cache
 def login(request):
     """testing only"""
     whoami = register_local_login(request)
-    return JsonResponse(whoami.as_dict(), status=200)
+    return FastJsonResponse(whoami.as_dict(), status=200)
 
 
+@query_budget(0)
 @require_http_methods(["POST"])
 @authenticated_claimant_session
 @never_cache
 def logout(request):
     """testing only"""
     request.session.flush()
-    return JsonResponse({"status": "ok"}, status=200)
+    return FastJsonResponse({"status": "ok"}, status=200)
 
 
+@query_budget(2)
 @require_http_methods(["GET"])
 @authenticated_claimant_session
 @never_cache
@@ -64,16 +70,17 @@ def whoami(request):
     """
     whoami = whoami_from_session(request)
     if "swa" in request.session and not whoami.swa:
-        swa = SWA.objects.get(code=request.session["swa"])
+        swa = swa_registry.get(request.session["swa"], active=False)
         whoami.swa = from_dict(data_class=WhoAmISWA, data=swa.for_whoami())
     # set csrftoken cookie
     django.middleware.csrf.get_token(request)
 
     # always reset in case we mutated
     request.session["whoami"] = whoami.as_dict()
-    return JsonResponse(whoami.as_dict(), status=200)
+    return FastJsonResponse(whoami.as_dict(), status=200)
 
 
+@query_budget(0)
 @require_http_methods(["GET"])
 @never_cache
 def index(request):
@@ -81,6 +88,7 @@ def index(request):
     return HttpResponse(status=200)
 
 
+@query_budget(5)
 @require_http_methods(["GET"])
 @authenticated_claimant_session
 @never_cache
@@ -91,13 +99,14 @@ def claims(request):
     whoami = whoami_from_session(request)
     claims = ClaimFinder(whoami).all()
     if not claims:
-        return JsonResponse({"claims": []}, status=200)
-    return JsonResponse(
+        return FastJsonResponse({"claims": []}, status=200)
+    return FastJsonResponse(
         {"claims": list(map(lambda c: ClaimSerializer(c).for_claimant(), claims))},
         status=200,
     )
 
 
+@query_budget(10)
 @require_http_methods(["DELETE"])
 @authenticated_claimant_session
 @never_cache
@@ -113,7 +122,7 @@ def cancel_claim(request, claim_id):
     claim = ClaimFinder(whoami).find()
     if not claim or claim.is_fetched():
         logger.debug("🚀 not found {}".format(claim))
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "No eligible claim found"}, status=404
         )
     try:
@@ -128,16 +137,17 @@ def cancel_claim(request, claim_id):
             if request.session["whoami"].get("claim_id"):
                 del request.session["whoami"]["claim_id"]
 
-            return JsonResponse({"status": "ok"}, status=200)
+            return FastJsonResponse({"status": "ok"}, status=200)
         else:
             raise ClaimStorageError("Failed to delete artifacts")
     except Exception as err:
         logger.exception(err)
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "failed to save change"}, status=500
         )
 
 
+@query_budget(16)
 @require_http_methods(["GET", "POST"])
 @authenticated_claimant_session
 @never_cache
@@ -151,6 +161,7 @@ def partial_claim(request):
         raise BadRequest("require_http_methods failed to recognize GET or POST")
 
 
+@query_budget(25)
 @require_http_methods(["GET", "POST"])
 @authenticated_claimant_session
 @never_cache
@@ -170,7 +181,7 @@ def completed_claim(request):
 
 def invalid_claim_response(claim_validator):
     logger.debug("🚀 invalid claim errors: {}".format(claim_validator.errors_as_dict()))
-    return JsonResponse(
+    return FastJsonResponse(
         {
             "status": "error",
             "error": "invalid claim",
@@ -187,7 +198,7 @@ def POST_partial_claim(request):
         return claim_request.response
 
     if claim_request.is_complete:
-        return JsonResponse(
+        return FastJsonResponse(
             {
                 "status": "error",
                 "error": "is_complete payload sent to partial-claim endpoint",
@@ -195,9 +206,8 @@ def POST_partial_claim(request):
             status=400,
         )
 
-    claim_validator = cleaned_claim_validator(
-        claim_request.payload, claim_request.whoami
-    )
+    cleaned_claim = ClaimCleaner(claim_request.payload, claim_request.whoami).cleaned()
+    claim_validator = claim_validation_cache.validate(cleaned_claim)
     if not claim_validator.valid:
         # we allow the save regardless because it may be (e.g.) a partial address
         pass
@@ -205,6 +215,10 @@ def POST_partial_claim(request):
         # mark our payload with validation info
         claim_request.payload["validated_at"] = timezone.now().isoformat()
         claim_request.payload["$schema"] = claim_validator.schema_url
+        # the marked payload is what GET_partial_claim will validate next.
+        cleaned_claim["validated_at"] = claim_request.payload["validated_at"]
+        cleaned_claim["$schema"] = claim_request.payload["$schema"]
+        claim_validation_cache.mark_valid(cleaned_claim)
 
     # log we received the claim
     claim_request.claim.events.create(category=Claim.EventCategories.SUBMITTED)
@@ -218,22 +232,22 @@ def POST_partial_claim(request):
         body = {"status": "accepted", "claim_id": claim_request.payload["id"]}
         if not claim_validator.valid:
             body["validation_errors"] = claim_validator.errors_as_dict()
-        return JsonResponse(body, status=202)
+        return FastJsonResponse(body, status=202)
     else:
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "unable to save claim"}, status=500
         )
 
 
 # we want to know what the validation errors would be if this were a "final" claim,
 def cleaned_claim_validator(payload, whoami):
-    return ClaimValidator(ClaimCleaner(payload, whoami).cleaned())
+    return claim_validation_cache.validate(ClaimCleaner(payload, whoami).cleaned())
 
 
 def partial_claim_response(claim, whoami, json_payload):
     # calculate time remaining before claim will be cleaned up
-    if claim.should_be_deleted_after():
-        removed_after = claim.should_be_deleted_after()
+    removed_after = claim.should_be_deleted_after()
+    if removed_after:
         removed_remaining = removed_after - timezone.now()
         seconds = removed_remaining.total_seconds()
         remaining_time = (
@@ -260,7 +274,7 @@ def partial_claim_response(claim, whoami, json_payload):
         validation_errors = claim_validator.errors_as_dict()
         response_body["validation_errors"] = validation_errors
 
-    return JsonResponse(
+    return FastJsonResponse(
         response_body,
         status=200,
     )
@@ -270,7 +284,7 @@ def GET_partial_claim(request):
     whoami = whoami_from_session(request)
     claim_finder = ClaimFinder(whoami)
     claim = claim_finder.find()
-    claim_not_found_response = JsonResponse(
+    claim_not_found_response = FastJsonResponse(
         {
             "status": "error",
             "error": "partial claim not found for SWA {} with Claimant {}".format(
@@ -318,7 +332,7 @@ def POST_completed_claim(request):
         return claim_request.response
 
     if not claim_request.is_complete:
-        return JsonResponse(
+        return FastJsonResponse(
             {
                 "status": "error",
                 "error": "is_complete payload false/missing at completed-claim endpoint",
@@ -358,11 +372,11 @@ def POST_completed_claim(request):
 
         claim_request.claim.delete_artifacts(partial_only=True)
 
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "accepted", "claim_id": claim_request.payload["id"]}, status=201
         )
     else:
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "unable to save claim"}, status=500
         )
 
@@ -372,9 +386,9 @@ def GET_completed_claim(request):
     claim = ClaimFinder(whoami).find()
     if not claim or not claim.is_completed() or claim.is_resolved():
         logger.debug("🚀 not found {}".format(claim))
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "No completed claim found"}, status=404
         )
 
     response_claim = ClaimSerializer(claim).for_claimant()
-    return JsonResponse(response_claim, status=200)
+    return FastJsonResponse(response_claim, status=200)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# offline microbenchmarks. Run with "python manage.py run_benchmarks".
+from django.conf import settings
+import copy
+import json
+import os
+import statistics
+import timeit
+
+# payload sizes, in bytes of JSON
+PAYLOAD_SIZES = [5 * 1024, 50 * 1024, 500 * 1024]
+
+SUITES = {
+    "claim_encryption": "core.benchmarks.claim_encryption",
+    "claim_cleaner": "core.benchmarks.claim_cleaner",
+    "json_codec": "core.benchmarks.json_codec",
+    "claim_queries": "core.benchmarks.claim_queries",
+    "claim_validator": "core.benchmarks.claim_validator",
+    "claim_serializer": "core.benchmarks.claim_serializer",
+    "whoami": "core.benchmarks.whoami",
+    "swa_xid": "core.benchmarks.swa_xid",
+}
+
+
+def example_claim():
+    with open(
+        os.path.join(settings.BASE_DIR, "schemas", "claim-v1.0-example.json")
+    ) as fh:
+        return json.load(fh)
+
+
+# the example claim, with employers repeated until it is at least "size" bytes of JSON
+def sized_claim(size):
+    claim = example_claim()
+    employer = claim["employers"][0]
+    employer_size = len(json.dumps(employer))
+    missing = size - len(json.dumps(claim))
+    if missing > 0:
+        claim["employers"] += [
+            copy.deepcopy(employer) for _ in range(missing // employer_size + 1)
+        ]
+    return claim
+
+
+# run "func" "number" times per repeat, returns seconds per call
+def measure(name, func, number=10, repeat=5, **params):
+    timings = [
+        timing / number for timing in timeit.repeat(func, number=number, repeat=repeat)
+    ]
+    return {
+        "name": name,
+        "params": params,
+        "number": number,
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def result_key(result):
+    return (result["name"], json.dumps(result["params"], sort_keys=True))
+
+
+# the change in median of each result also in "baseline_results", e.g. 0.25 is 25% slower
+def compare(results, baseline_results):
+    baseline_medians = {
+        result_key(result): result["median"] for result in baseline_results
+    }
+    comparison = []
+    for result in results:
+        baseline_median = baseline_medians.get(result_key(result))
+        if not baseline_median:
+            continue
+        comparison.append(
+            {
+                "name": result["name"],
+                "params": result["params"],
+                "median": result["median"],
+                "baseline_median": baseline_median,
+                "change": result["median"] / baseline_median - 1,
+            }
+        )
+    return comparison
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# ClaimCleaner.cleaned() by payload size.
+# "deepcopy" is the cost of the copy.deepcopy() ClaimCleaner used to start with.
+from api.claim_cleaner import ClaimCleaner
+from api.test_utils import create_whoami
+from api.whoami import WhoAmI
+from . import PAYLOAD_SIZES, measure, sized_claim
+import copy
+
+
+def run(sizes=None, number=10, repeat=5):
+    whoami = WhoAmI.from_dict(create_whoami())
+    results = []
+    for size in sizes or PAYLOAD_SIZES:
+        claim = sized_claim(size)
+        # the web app keeps some LOCAL_ state in each employer
+        for employer in claim["employers"]:
+            employer["LOCAL_same_address"] = True
+        for name, func in [
+            ("cleaned", lambda: ClaimCleaner(claim, whoami).cleaned()),
+            ("deepcopy", lambda: copy.deepcopy(claim)),
+        ]:
+            results.append(
+                measure(
+                    f"claim_cleaner.{name}",
+                    func,
+                    number=number,
+                    repeat=repeat,
+                    size=size,
+                )
+            )
+    return results
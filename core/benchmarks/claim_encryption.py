@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# packaging and unpackaging of encrypted claims, by payload size.
+# The "legacy" benchmarks decode and re-encode the whole JWE, as PackagedClaim used to.
+# "decrypt.rotatable" finds the key last in a list of two, as after a key rotation.
+from jwcrypto import jwe
+from jwcrypto.common import json_decode, json_encode
+from core.claim_encryption import (
+    AsymmetricClaimDecryptor,
+    AsymmetricClaimEncryptor,
+    RotatableSymmetricClaimDecryptor,
+    SymmetricClaimDecryptor,
+    SymmetricClaimEncryptor,
+    symmetric_encryption_key,
+)
+from core.test_utils import generate_keypair, generate_symmetric_encryption_key
+from . import PAYLOAD_SIZES, measure, sized_claim
+
+
+def legacy_as_json(packaged_claim):
+    return json_encode(packaged_claim.as_dict())
+
+
+def legacy_decrypt(packaged_claim_str, key):
+    packaged_claim = json_decode(packaged_claim_str)
+    jwetoken = jwe.JWE()
+    jwetoken.deserialize(json_encode(packaged_claim["claim"]), key=key)
+    return json_decode(jwetoken.payload.decode("utf-8"))
+
+
+def run(sizes=None, number=10, repeat=5):
+    key_string = generate_symmetric_encryption_key()
+    key = symmetric_encryption_key(key_string)
+    rotated_key_strings = [generate_symmetric_encryption_key(), key_string]
+    private_key, public_key = generate_keypair()
+    results = []
+    for size in sizes or PAYLOAD_SIZES:
+        claim = sized_claim(size)
+        for name, encryptor, encryption_key, decrypt in [
+            (
+                "symmetric",
+                SymmetricClaimEncryptor,
+                key,
+                lambda pc: SymmetricClaimDecryptor(pc, key).decrypt(),
+            ),
+            (
+                "asymmetric",
+                AsymmetricClaimEncryptor,
+                public_key,
+                lambda pc: AsymmetricClaimDecryptor(pc, private_key).decrypt(),
+            ),
+        ]:
+            packaged_claim = encryptor(
+                claim, encryption_key, compress=False
+            ).packaged_claim()
+            packaged_json = packaged_claim.as_json()
+            decryption_key = key if name == "symmetric" else private_key
+            benchmarks = [
+                (
+                    "encrypt",
+                    lambda: encryptor(claim, encryption_key, compress=False)
+                    .packaged_claim()
+                    .as_json(),
+                ),
+                ("as_json", packaged_claim.as_json),
+                ("as_json.legacy", lambda: legacy_as_json(packaged_claim)),
+                ("decrypt", lambda: decrypt(packaged_json)),
+                (
+                    "decrypt.legacy",
+                    lambda: legacy_decrypt(packaged_json, decryption_key),
+                ),
+            ]
+            if name == "symmetric":
+                benchmarks.append(
+                    (
+                        "decrypt.rotatable",
+                        lambda: RotatableSymmetricClaimDecryptor(
+                            packaged_json, rotated_key_strings
+                        ).decrypt(),
+                    )
+                )
+            for operation, func in benchmarks:
+                results.append(
+                    measure(
+                        f"claim_encryption.{name}.{operation}",
+                        func,
+                        number=number,
+                        repeat=repeat,
+                        size=size,
+                        envelope_bytes=len(packaged_json),
+                    )
+                )
+    return results
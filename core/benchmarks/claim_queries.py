@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# the Claim event queries, as joins over the generic "events" relation ("legacy")
+# and as EXISTS / NOT EXISTS subqueries, with their query plans.
+# "sizes" is the number of claims to seed, each with EVENTS_PER_CLAIM events,
+# e.g. --sizes 1000000 for 1M claims and 10M events. The seeded rows are rolled back.
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from api.management.load_data_generator import LoadDataGenerator
+from api.models import Claim, SWA
+from . import measure
+
+CLAIM_COUNTS = [10000]
+EVENTS_PER_CLAIM = 10
+
+
+def seed(claim_count, events_per_claim=EVENTS_PER_CLAIM, random_seed=0):
+    return LoadDataGenerator(
+        claim_count,
+        seed=random_seed,
+        events_per_claim=events_per_claim,
+        # the queries below measure expiry against now
+        as_of=timezone.now(),
+        report=lambda message: None,
+    ).generate()
+
+
+def legacy_expired_partial_claims():
+    threshold_date = timezone.now() - timedelta(
+        days=settings.DELETE_PARTIAL_CLAIM_AFTER_DAYS
+    )
+    return (
+        Claim.objects.filter(
+            updated_at__lt=threshold_date,
+            events__category=Claim.EventCategories.STORED,
+        )
+        .exclude(events__category=Claim.EventCategories.COMPLETED)
+        .exclude(events__category=Claim.EventCategories.DELETED)
+        .exclude(events__category=Claim.EventCategories.INITIATED_WITH_SWA_XID)
+        .distinct()
+    )
+
+
+def legacy_claim_queue(swa):
+    return (
+        swa.claim_set.filter(events__category=Claim.EventCategories.COMPLETED)
+        .exclude(
+            events__category__in=[
+                Claim.EventCategories.FETCHED,
+                Claim.EventCategories.RESOLVED,
+                Claim.EventCategories.DELETED,
+            ]
+        )
+        .order_by("created_at")
+    )
+
+
+def legacy_find(claim):
+    return (
+        Claim.objects.filter(swa=claim.swa, claimant=claim.claimant)
+        .exclude(
+            events__category__in=[
+                Claim.EventCategories.FETCHED,
+                Claim.EventCategories.RESOLVED,
+            ]
+        )
+        .order_by("created_at")
+    )
+
+
+def find(claim):
+    return (
+        Claim.objects.filter(swa=claim.swa, claimant=claim.claimant)
+        .without_events(Claim.EventCategories.FETCHED, Claim.EventCategories.RESOLVED)
+        .order_by("created_at")
+    )
+
+
+def queries():
+    swa = SWA.objects.order_by("id").first()
+    claim = Claim.objects.order_by("-id").select_related("swa", "claimant").first()
+    return [
+        # (name, queryset, how to evaluate it)
+        ("expired_partial_claims.legacy", legacy_expired_partial_claims(), "count"),
+        ("expired_partial_claims", Claim.expired_partial_claims.all(), "count"),
+        ("expired_identity_claims", Claim.expired_identity_claims.all(), "count"),
+        ("claim_queue.legacy", legacy_claim_queue(swa), "page"),
+        ("claim_queue", swa.claim_queue(), "page"),
+        ("claim_finder.find.legacy", legacy_find(claim), "last"),
+        ("claim_finder.find", find(claim), "last"),
+    ]
+
+
+def evaluate(queryset, how):
+    if how == "count":
+        return queryset.count()
+    if how == "page":
+        return list(queryset[:10])
+    return queryset.last()
+
+
+def run(sizes=None, number=10, repeat=5):
+    results = []
+    for claim_count in sizes or CLAIM_COUNTS:
+        with transaction.atomic():
+            seed(claim_count)
+            for name, queryset, how in queries():
+                result = measure(
+                    f"claim_queries.{name}",
+                    lambda: evaluate(queryset, how),
+                    number=number,
+                    repeat=repeat,
+                    claims=claim_count,
+                    events=claim_count * EVENTS_PER_CLAIM,
+                )
+                result["plan"] = queryset.explain()
+                results.append(result)
+            transaction.set_rollback(True)
+    return results
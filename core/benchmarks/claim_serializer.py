@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# ClaimSerializer for the SWA and the claimant, of a resolved Claim with EVENTS_PER_CLAIM events.
+# "queries" is the number of queries of a single call. The seeded rows are rolled back.
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from api.claim_serializer import ClaimSerializer
+from api.management.load_data_generator import RESOLVED
+from api.models import Claim
+from api.test_utils import create_claimant, create_idp, create_swa
+from . import measure
+
+EVENTS_PER_CLAIM = 10
+
+
+def seed():
+    swa, _ = create_swa(code="BM")
+    claim = Claim.objects.create(swa=swa, claimant=create_claimant(create_idp()))
+    categories = list(RESOLVED)
+    categories += [Claim.EventCategories.SUBMITTED] * (
+        EVENTS_PER_CLAIM - len(categories)
+    )
+    for category in categories:
+        claim.events.create(category=category, description="benchmark")
+    return Claim.objects.get(id=claim.id)
+
+
+def run(sizes=None, number=10, repeat=5):
+    results = []
+    with transaction.atomic():
+        claim = seed()
+        for name in ["for_swa", "for_claimant"]:
+            func = getattr(ClaimSerializer(claim), name)
+            with CaptureQueriesContext(connection) as queries:
+                func()
+            result = measure(
+                f"claim_serializer.{name}",
+                func,
+                number=number,
+                repeat=repeat,
+                events=EVENTS_PER_CLAIM,
+            )
+            result["queries"] = len(queries)
+            results.append(result)
+        transaction.set_rollback(True)
+    return results
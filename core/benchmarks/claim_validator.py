@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# ClaimValidator against the claim schema by payload size,
+# and against the identity schema with the example identities.
+from api.claim_validator import ClaimValidator
+from django.conf import settings
+from . import PAYLOAD_SIZES, measure, sized_claim
+import json
+
+IDENTITY_EXAMPLES = ["identity-v1.0-example-ial1", "identity-v1.0-example-ial2"]
+
+
+def example_identity(name):
+    with open(settings.BASE_DIR / "schemas" / f"{name}.json") as fh:
+        return json.load(fh)
+
+
+def run(sizes=None, number=10, repeat=5):
+    results = []
+    for size in sizes or PAYLOAD_SIZES:
+        claim = sized_claim(size)
+        results.append(
+            measure(
+                "claim_validator.claim",
+                lambda: ClaimValidator(claim),
+                number=number,
+                repeat=repeat,
+                size=size,
+            )
+        )
+    for name in IDENTITY_EXAMPLES:
+        identity = example_identity(name)
+        results.append(
+            measure(
+                "claim_validator.identity",
+                lambda: ClaimValidator(identity, schema_name="identity-v1.0"),
+                number=number,
+                repeat=repeat,
+                example=name,
+            )
+        )
+    return results
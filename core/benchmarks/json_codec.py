@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# response and request bodies of the partial-claim and claim listing endpoints, by payload size,
+# with django's JsonResponse and jwcrypto json_decode compared to core.json_codec.
+from django.http import JsonResponse
+from django.utils import timezone
+from jwcrypto import common
+from core.claim_encryption import SymmetricClaimEncryptor, symmetric_encryption_key
+from core.json_codec import FastJsonResponse, codec, json_decode
+from core.test_utils import generate_symmetric_encryption_key
+from . import PAYLOAD_SIZES, measure, sized_claim
+
+# claims per page of the SWA claim listing
+PAGE_SIZE = 10
+
+
+def run(sizes=None, number=10, repeat=5):
+    key = symmetric_encryption_key(generate_symmetric_encryption_key())
+    results = []
+    for size in sizes or PAYLOAD_SIZES:
+        claim = sized_claim(size)
+        partial_claim_body = {
+            "status": "ok",
+            "claim": claim,
+            "remaining_time": "167:59:59",
+            "expires": timezone.now().date(),
+        }
+        request_body = common.json_encode(claim).encode("utf-8")
+        envelopes = [
+            SymmetricClaimEncryptor(claim, key).packaged_claim().as_json()
+            for _ in range(PAGE_SIZE)
+        ]
+
+        def claim_listing(response_class, decode):
+            return response_class(
+                {
+                    "total_claims": PAGE_SIZE,
+                    "next": None,
+                    "claims": [decode(envelope) for envelope in envelopes],
+                }
+            )
+
+        for name, func in [
+            ("partial_claim.JsonResponse", lambda: JsonResponse(partial_claim_body)),
+            (
+                "partial_claim.FastJsonResponse",
+                lambda: FastJsonResponse(partial_claim_body),
+            ),
+            (
+                "partial_claim.request.jwcrypto",
+                lambda: common.json_decode(request_body),
+            ),
+            ("partial_claim.request.json_decode", lambda: json_decode(request_body)),
+            (
+                "claim_listing.JsonResponse",
+                lambda: claim_listing(JsonResponse, common.json_decode),
+            ),
+            (
+                "claim_listing.FastJsonResponse",
+                lambda: claim_listing(FastJsonResponse, json_decode),
+            ),
+        ]:
+            results.append(
+                measure(
+                    f"json_codec.{name}",
+                    func,
+                    number=number,
+                    repeat=repeat,
+                    size=size,
+                    codec=codec.name,
+                )
+            )
+    return results
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# SwaXid parsing, of a timestamped AR xid and of an opaque xid that is not parsed.
+from core.swa_xid import SwaXid
+from . import measure
+
+SWA_XIDS = [
+    ("AR", "20220419-152307-1234567-123456789"),
+    ("KS", "abc-123"),
+]
+
+
+def run(sizes=None, number=10, repeat=5):
+    results = []
+    for swa_code, swa_xid in SWA_XIDS:
+        parsed = SwaXid(swa_xid, swa_code)
+        for name, func in [
+            ("parse", lambda: SwaXid(swa_xid, swa_code)),
+            ("format_ok", parsed.format_ok),
+        ]:
+            results.append(
+                measure(
+                    f"swa_xid.{name}",
+                    func,
+                    number=number,
+                    repeat=repeat,
+                    swa_code=swa_code,
+                )
+            )
+    return results
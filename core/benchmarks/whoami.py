@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# WhoAmI round trips through the session, and the identity built from it, for IAL1 and IAL2.
+from api.test_utils import create_whoami
+from api.whoami import WhoAmI
+from . import measure
+
+
+def run(sizes=None, number=10, repeat=5):
+    ial2 = create_whoami()
+    ial1 = {
+        key: value
+        for key, value in ial2.items()
+        if key in ["email", "swa", "claimant_id"]
+    } | {"IAL": "1"}
+    results = []
+    for ial, whoami_dict in [("1", ial1), ("2", ial2)]:
+        whoami_dict["claimant_id"] = "some-claimant-id"
+        whoami = WhoAmI.from_dict(whoami_dict)
+        for name, func in [
+            ("from_dict", lambda: WhoAmI.from_dict(whoami_dict)),
+            ("as_dict", whoami.as_dict),
+            ("as_identity", whoami.as_identity),
+        ]:
+            results.append(
+                measure(f"whoami.{name}", func, number=number, repeat=repeat, IAL=ial)
+            )
+    return results
@@ -1,18 +1,130 @@
 # -*- coding: utf-8 -*-
-from jwcrypto import jwk, jwe
-from jwcrypto.common import json_encode, json_decode, base64url_decode
+from jwcrypto import jwk, jwe, jwa
+from jwcrypto.common import (
+    base64url_decode,
+    base64url_encode,
+)
+from django.apps import apps
 from django.conf import settings
 from .exceptions import ClaimStorageError, ClaimThumbprintMismatchError
+from .instrumentation import instrumented
+from .json_codec import json_encode, json_decode
 
 
 ALG = "ECDH-ES+A256KW"
 ENC = "A256GCM"
+SYMMETRIC_ALG = "A256GCMKW"
+DATA_KEY_SIZE = 256
+
+# PackagedClaim envelope "format" values. Envelopes without a "format" are FORMAT_JWE.
+FORMAT_JWE = "jwe"
+FORMAT_JWE_DEF = "jwe+def"  # JWE payload DEFLATE-compressed before encryption
+ENVELOPE_FORMATS = [FORMAT_JWE, FORMAT_JWE_DEF]
 
 
 def symmetric_encryption_key(key_string=None):
     return jwk.JWK(kty="oct", k=(key_string or settings.CLAIM_SECRET_KEY[0]))
 
 
+def compression_enabled(compress=None):
+    return settings.CLAIM_COMPRESSION if compress is None else compress
+
+
+def envelope_encryption_enabled(envelope=None):
+    return settings.CLAIM_ENVELOPE_ENCRYPTION if envelope is None else envelope
+
+
+def envelope_format(packaged_claim):
+    claim_format = packaged_claim.get("format", FORMAT_JWE)
+    if claim_format not in ENVELOPE_FORMATS:
+        raise ValueError("Unknown packaged_claim format: {}".format(claim_format))
+    return claim_format
+
+
+def data_key_model():
+    return apps.get_model("api", "DataKey")
+
+
+# detach the wrapped data key (the JWE content encryption key) from a JWE dict.
+def detach_data_key(jwetoken):
+    return json_encode(
+        {
+            "encrypted_key": jwetoken.pop("encrypted_key"),
+            "header": jwetoken.pop("header"),
+        }
+    )
+
+
+def attach_data_key(jwetoken, wrapped_key):
+    jwetoken.update(json_decode(wrapped_key))
+    return jwetoken
+
+
+# returns the data key (the JWE content encryption key) of a detached wrapped key
+def unwrap_data_key(wrapped_key, key):
+    wrapped_key = json_decode(wrapped_key)
+    return jwa.JWA.keymgmt_alg(SYMMETRIC_ALG).unwrap(
+        key,
+        DATA_KEY_SIZE,
+        base64url_decode(wrapped_key["encrypted_key"]),
+        wrapped_key["header"],
+    )
+
+
+# re-wrap a detached data key from old_key to new_key. The artifact is never decrypted.
+def rewrap_data_key(wrapped_key, old_key, new_key):
+    cek = unwrap_data_key(wrapped_key, old_key)
+    rewrapped = jwa.JWA.keymgmt_alg(SYMMETRIC_ALG).wrap(new_key, DATA_KEY_SIZE, cek, {})
+    return json_encode(
+        {
+            "encrypted_key": base64url_encode(rewrapped["ek"]),
+            "header": rewrapped["header"],
+        }
+    )
+
+
+# json_encode() sorts keys, so a serialized PackagedClaim always starts with the JWE
+# and the rest of the envelope follows it. This lets the JWE be spliced in and out
+# of the envelope as a string, instead of being decoded and re-encoded.
+ENVELOPE_PREFIX = '{"claim":'
+ENVELOPE_CLAIM_END = ',"claim_id":'
+
+
+def envelope_claim_end(packaged_claim_str):
+    if not isinstance(packaged_claim_str, str):
+        return -1
+    if not packaged_claim_str.startswith(ENVELOPE_PREFIX):
+        return -1
+    return packaged_claim_str.rfind(ENVELOPE_CLAIM_END)
+
+
+# returns the envelope dict, without the "claim" JWE
+def envelope_metadata(packaged_claim_str):
+    end = envelope_claim_end(packaged_claim_str)
+    if end < 0:
+        packaged_claim = json_decode(packaged_claim_str)
+        del packaged_claim["claim"]
+        return packaged_claim
+    return json_decode("{" + packaged_claim_str[end + 1 :])  # noqa: E203
+
+
+# returns (envelope dict without the "claim" JWE, the serialized JWE string)
+def split_envelope(packaged_claim_str):
+    end = envelope_claim_end(packaged_claim_str)
+    if end < 0:
+        packaged_claim = json_decode(packaged_claim_str)
+        return packaged_claim, json_encode(packaged_claim.pop("claim"))
+    return (
+        json_decode("{" + packaged_claim_str[end + 1 :]),  # noqa: E203
+        packaged_claim_str[len(ENVELOPE_PREFIX) : end],  # noqa: E203
+    )
+
+
+# the DataKeys of deleted artifacts
+def delete_data_keys(paths):
+    return data_key_model().objects.filter(path__in=paths).delete()
+
+
 # the hexdigest() of the JWK thumbprint()
 def encryption_key_hash(encryption_key):
     return base64url_decode(encryption_key.thumbprint()).hex()
@@ -21,9 +133,10 @@ def encryption_key_hash(encryption_key):
 class AsymmetricClaimEncryptor(object):
     """
     Requires "claim" (dict) and "public_key" (PEM string or JWK).
+    "compress" (optional) defaults to settings.CLAIM_COMPRESSION
     """
 
-    def __init__(self, claim, public_key):
+    def __init__(self, claim, public_key, compress=None):
         if isinstance(public_key, bytes):
             self.public_key = jwk.JWK.from_pem(public_key)
         elif isinstance(public_key, str):
@@ -32,14 +145,18 @@ class AsymmetricClaimEncryptor(object):
             self.public_key = public_key
         self.claim = claim
         self.public_key_thumbprint = self.public_key.thumbprint()
+        self.compress = compression_enabled(compress)
 
     def protected_header(self):
-        return {
+        header = {
             "alg": ALG,
             "enc": ENC,
             "typ": "JWE",
             "kid": self.public_key_thumbprint,
         }
+        if self.compress:
+            header["zip"] = "DEF"
+        return header
 
     def __encrypt(self):
         return jwe.JWE(
@@ -48,9 +165,15 @@ class AsymmetricClaimEncryptor(object):
             protected=self.protected_header(),
         )
 
+    @instrumented("crypto", "asymmetric_encrypt")
     def packaged_claim(self):
         jwetoken = self.__encrypt()
-        return PackagedClaim(jwetoken, self.public_key_thumbprint, self.claim["id"])
+        return PackagedClaim(
+            jwetoken,
+            self.public_key_thumbprint,
+            self.claim["id"],
+            claim_format=FORMAT_JWE_DEF if self.compress else FORMAT_JWE,
+        )
 
 
 class AsymmetricClaimDecryptor(object):
@@ -68,13 +191,14 @@ class AsymmetricClaimDecryptor(object):
             self.private_key = jwk.JWK.from_pem(private_key.encode("utf-8"), password)
         else:
             self.private_key = private_key
-        self.packaged_claim = json_decode(packaged_claim_str)
+        self.packaged_claim, self.serialized_jwe = split_envelope(packaged_claim_str)
+        envelope_format(self.packaged_claim)
 
+    @instrumented("crypto", "asymmetric_decrypt")
     def decrypt(self):
+        # jwcrypto inflates the payload itself if the header has "zip": "DEF"
         jwetoken = jwe.JWE()
-        jwetoken.deserialize(
-            json_encode(self.packaged_claim["claim"]), key=self.private_key
-        )
+        jwetoken.deserialize(self.serialized_jwe, key=self.private_key)
         self.packaged_claim["decrypted_claim"] = json_decode(
             jwetoken.payload.decode("utf-8")
         )
@@ -84,22 +208,83 @@ class AsymmetricClaimDecryptor(object):
 class SymmetricClaimEncryptor(object):
     """
     Requires "claim" (dict) and "jwkey" JWK (e.g. jwk.JWK(generate='oct', size=256))
+    "compress" (optional) defaults to settings.CLAIM_COMPRESSION
+    "envelope" (optional) defaults to settings.CLAIM_ENVELOPE_ENCRYPTION
+    "path" (optional) of the artifact. Its DataKey is re-used when the artifact
+    is overwritten, and deleted with it (see ClaimStore.delete).
     """
 
-    def __init__(self, claim, jwkey):
+    def __init__(self, claim, jwkey, compress=None, envelope=None, path=None):
         self.claim = claim
         self.key = jwkey
-
-    def __encrypt(self):
-        jwetoken = jwe.JWE(
-            json_encode(self.claim), json_encode({"alg": "A256GCMKW", "enc": ENC})
-        )
+        self.compress = compression_enabled(compress)
+        self.envelope = envelope_encryption_enabled(envelope)
+        self.path = path
+
+    # cek is None for a new data key
+    def __encrypt(self, cek=None):
+        header = {"alg": SYMMETRIC_ALG, "enc": ENC}
+        if self.compress:
+            header["zip"] = "DEF"
+        jwetoken = jwe.JWE(json_encode(self.claim), json_encode(header))
+        jwetoken.cek = cek
         jwetoken.add_recipient(self.key)
         return jwetoken
 
+    def current_data_key(self):
+        if not self.envelope or not self.path:
+            return None
+        return data_key_model().objects.filter(path=self.path).first()
+
+    # the data key of an existing DataKey, unwrapped with this key or an older
+    # CLAIM_SECRET_KEY. None if none of them wrapped it.
+    def existing_data_key(self, data_key):
+        keys = [self.key] + [
+            symmetric_encryption_key(k) for k in settings.CLAIM_SECRET_KEY
+        ]
+        for key in keys:
+            if key.thumbprint() == data_key.kek_kid:
+                return unwrap_data_key(data_key.wrapped_key, key)
+        return None
+
+    # replaces the data key of the artifact at "path", if any, in place.
+    def save_data_key(self, data_key, wrapped_key):
+        DataKey = data_key_model()
+        fields = {"kek_kid": self.key.thumbprint(), "wrapped_key": wrapped_key}
+        if data_key:
+            data_key.kek_kid = fields["kek_kid"]
+            data_key.wrapped_key = wrapped_key
+            data_key.save()
+            return data_key
+        if self.path:
+            data_key, _ = DataKey.objects.update_or_create(
+                path=self.path, defaults=fields
+            )
+            return data_key
+        return DataKey.objects.create(**fields)
+
+    @instrumented("crypto", "symmetric_encrypt")
     def packaged_claim(self):
-        jwetoken = self.__encrypt()
-        return PackagedClaim(jwetoken, self.key.thumbprint(), self.claim["id"])
+        # re-use the data key of the artifact being overwritten,
+        # so that artifact stays readable until the write replaces it.
+        data_key = self.current_data_key()
+        cek = self.existing_data_key(data_key) if data_key else None
+        jwetoken = self.__encrypt(cek)
+        packaged_claim = PackagedClaim(
+            jwetoken,
+            self.key.thumbprint(),
+            self.claim["id"],
+            claim_format=FORMAT_JWE_DEF if self.compress else FORMAT_JWE,
+        )
+        if self.envelope:
+            serialized_jwe = json_decode(packaged_claim.serialized_jwe)
+            wrapped_key = detach_data_key(serialized_jwe)
+            # a new data key, or the same one now wrapped with this key
+            if cek is None or data_key.kek_kid != self.key.thumbprint():
+                data_key = self.save_data_key(data_key, wrapped_key)
+            packaged_claim.serialized_jwe = json_encode(serialized_jwe)
+            packaged_claim.data_key = str(data_key.uuid)
+        return packaged_claim
 
 
 class SymmetricClaimDecryptor(object):
@@ -107,17 +292,33 @@ class SymmetricClaimDecryptor(object):
     Requires:
     * "packaged_claim" string
     * "jwkey" JWK
+    * "data_key" (optional) DataKey named by the packaged claim, if already loaded
     """
 
-    def __init__(self, packaged_claim_str, jwkey):
-        self.packaged_claim = json_decode(packaged_claim_str)
-        if self.packaged_claim["public_kid"] != jwkey.thumbprint():
+    def __init__(self, packaged_claim_str, jwkey, data_key=None):
+        self.packaged_claim, self.serialized_jwe = split_envelope(packaged_claim_str)
+        envelope_format(self.packaged_claim)
+        self.data_key = None
+        thumbprint = self.packaged_claim["public_kid"]
+        if "data_key" in self.packaged_claim:
+            # the db row is authoritative, since rotation does not touch the artifact.
+            self.data_key = data_key or data_key_model().objects.get(
+                uuid=self.packaged_claim["data_key"]
+            )
+            thumbprint = self.data_key.kek_kid
+        if thumbprint != jwkey.thumbprint():
             raise ClaimThumbprintMismatchError("Key thumbprints do not match")
         self.key = jwkey
 
+    @instrumented("crypto", "symmetric_decrypt")
     def decrypt(self):
+        serialized_jwe = self.serialized_jwe
+        if self.data_key:
+            serialized_jwe = json_encode(
+                attach_data_key(json_decode(serialized_jwe), self.data_key.wrapped_key)
+            )
         jwetoken = jwe.JWE()
-        jwetoken.deserialize(json_encode(self.packaged_claim["claim"]))
+        jwetoken.deserialize(serialized_jwe)
         jwetoken.decrypt(self.key)
         self.packaged_claim["decrypted_claim"] = json_decode(
             jwetoken.payload.decode("utf-8")
@@ -136,14 +337,21 @@ class RotatableSymmetricClaimDecryptor(object):
         self.packaged_claim_str = packaged_claim_str
         self.list_of_keys = list_of_keys if list_of_keys else settings.CLAIM_SECRET_KEY
 
+    @instrumented("crypto", "symmetric_decrypt")
     def decrypt(self):
         # find the correct key to decrypt with.
-        packaged_claim = json_decode(self.packaged_claim_str)
+        packaged_claim = envelope_metadata(self.packaged_claim_str)
         package_thumbprint = packaged_claim["public_kid"]
+        data_key = None
+        if "data_key" in packaged_claim:
+            data_key = data_key_model().objects.get(uuid=packaged_claim["data_key"])
+            package_thumbprint = data_key.kek_kid
         for k in self.list_of_keys:
             jwkey = symmetric_encryption_key(k)
             if jwkey.thumbprint() == package_thumbprint:
-                sd = SymmetricClaimDecryptor(self.packaged_claim_str, jwkey)
+                sd = SymmetricClaimDecryptor(
+                    self.packaged_claim_str, jwkey, data_key=data_key
+                )
                 return sd.decrypt()
         raise ValueError(
             "No key found matching packaged_claim public_kid: {}".format(
@@ -158,22 +366,46 @@ class PackagedClaim(object):
     * "jwetoken" as produced by jwt.JWE()
     * "public_key_thumbprint" as produced by ClaimEncryptor()
     * "claim_id" string from the claim encrypted within the jwetoken
+    * "claim_format" (optional) one of ENVELOPE_FORMATS
+    * "data_key" (optional) uuid string of the DataKey holding the detached wrapped key
     """
 
-    def __init__(self, jwetoken, public_key_thumbprint, claim_id):
-        self.jwetoken = json_decode(jwetoken.serialize())
+    def __init__(
+        self,
+        jwetoken,
+        public_key_thumbprint,
+        claim_id,
+        claim_format=FORMAT_JWE,
+        data_key=None,
+    ):
+        self.serialized_jwe = jwetoken.serialize()
         self.thumbprint = public_key_thumbprint
         self.claim_id = claim_id
+        self.claim_format = claim_format
+        self.data_key = data_key
 
-    def as_dict(self):
-        return {
+    @property
+    def jwetoken(self):
+        return json_decode(self.serialized_jwe)
+
+    def metadata(self):
+        packaged_claim = {
             "public_kid": self.thumbprint,
             "claim_id": self.claim_id,
-            "claim": self.jwetoken,
+            "format": self.claim_format,
         }
+        if self.data_key:
+            packaged_claim["data_key"] = self.data_key
+        return packaged_claim
+
+    def as_dict(self):
+        return dict(self.metadata(), claim=self.jwetoken)
 
+    # same as json_encode(self.as_dict()), without decoding and re-encoding the JWE
     def as_json(self):
-        return json_encode(self.as_dict())
+        return "{}{},{}".format(
+            ENVELOPE_PREFIX, self.serialized_jwe, json_encode(self.metadata())[1:]
+        )
 
 
 class SymmetricKeyRotator(object):
@@ -187,8 +419,9 @@ class SymmetricKeyRotator(object):
         self.old_key = old_key
         self.new_key = new_key
 
-    # takes a PackagedClaim, returns a PackagedClaim
-    def rotate(self, packaged_claim):
+    # takes a PackagedClaim (and the "path" of its artifact), returns a PackagedClaim.
+    # "envelope" (optional) is passed to SymmetricClaimEncryptor
+    def rotate(self, packaged_claim, path=None, envelope=None):
         try:
             old_key_decryptor = SymmetricClaimDecryptor(
                 (
@@ -200,23 +433,62 @@ class SymmetricKeyRotator(object):
             )
         except ClaimThumbprintMismatchError:
             return packaged_claim
+        if old_key_decryptor.data_key:
+            # only the data key is re-wrapped, the packaged claim itself is unchanged
+            self.rewrap(old_key_decryptor.data_key)
+            return packaged_claim
         decrypted_claim = old_key_decryptor.decrypt()
-        new_key_encryptor = SymmetricClaimEncryptor(decrypted_claim, self.new_key)
+        new_key_encryptor = SymmetricClaimEncryptor(
+            decrypted_claim, self.new_key, envelope=envelope, path=path
+        )
         return new_key_encryptor.packaged_claim()
 
-    # update all the related artifacts for a Claimant
+    def needs_rotation(self, packaged_claim_str):
+        packaged_claim = json_decode(packaged_claim_str)
+        return (
+            "data_key" not in packaged_claim
+            and packaged_claim["public_kid"] == self.old_key.thumbprint()
+        )
+
+    def rewrap(self, data_key):
+        data_key.wrapped_key = rewrap_data_key(
+            data_key.wrapped_key, self.old_key, self.new_key
+        )
+        data_key.kek_kid = self.new_key.thumbprint()
+        data_key.save()
+
+    # re-wrap every data key wrapped with the old key, returns the number re-wrapped
+    def rotate_data_keys(self, batch_size=1000):
+        DataKey = data_key_model()
+        old_kid = self.old_key.thumbprint()
+        new_kid = self.new_key.thumbprint()
+        count = 0
+        while True:
+            # re-wrapped rows no longer match, so each query returns the next batch
+            data_keys = list(DataKey.objects.filter(kek_kid=old_kid)[:batch_size])
+            if not data_keys:
+                return count
+            for data_key in data_keys:
+                data_key.wrapped_key = rewrap_data_key(
+                    data_key.wrapped_key, self.old_key, self.new_key
+                )
+                data_key.kek_kid = new_kid
+            DataKey.objects.bulk_update(data_keys, ["wrapped_key", "kek_kid"])
+            count += len(data_keys)
+
+    # update all the related artifacts for a Claimant.
+    # Envelope encrypted artifacts are skipped, see rotate_data_keys().
     def rotate_artifacts_for_claimant(self, claimant):
         from .claim_storage import ClaimWriter, ClaimReader
 
         count = 0
         for claimant_file in claimant.claimantfile_set.all():
             old_encrypted_package = claimant_file.get_encrypted_package()
-            if (
-                json_decode(old_encrypted_package)["public_kid"]
-                != self.old_key.thumbprint()
-            ):
+            if not self.needs_rotation(old_encrypted_package):
                 continue
-            new_encrypted_package = self.rotate(old_encrypted_package)
+            new_encrypted_package = self.rotate(
+                old_encrypted_package, path=claimant_file.payload_path()
+            )
             cw = ClaimWriter(
                 claim=claimant_file, payload=new_encrypted_package.as_json()
             )
@@ -234,12 +506,11 @@ class SymmetricKeyRotator(object):
             if not cr.exists():
                 continue
             old_encrypted_package = cr.read()
-            if (
-                json_decode(old_encrypted_package)["public_kid"]
-                != self.old_key.thumbprint()
-            ):
+            if not self.needs_rotation(old_encrypted_package):
                 continue
-            new_encrypted_package = self.rotate(old_encrypted_package)
+            new_encrypted_package = self.rotate(
+                old_encrypted_package, path=claim.partial_payload_path()
+            )
             cw = ClaimWriter(
                 claim,
                 payload=new_encrypted_package.as_json(),
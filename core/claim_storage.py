@@ -1,25 +1,81 @@
 # -*- coding: utf-8 -*-
 # wrapper around boto3 to read/write to a S3 bucket with consistent naming conventions
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
 import logging
 import os
+import time
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
+from .claim_encryption import delete_data_keys
+from .storage_backends import (
+    LocalStorageBackend,
+    MemoryStorageBackend,
+    S3StorageBackend,
+)
 
 BUCKET_TYPE_ARCHIVE = "archive"
 BUCKET_TYPE_SWA = "swa"
 
+GZIP_MAGIC = b"\x1f\x8b"
+
 logger = logging.getLogger(__name__)
 
 
+# archive copies are plaintext JSON, optionally gzipped.
+# gzip is self-describing (and JSON never starts with its magic bytes),
+# so every reader handles both formats.
+def encode_archive_payload(payload, compress=None):
+    payload = payload.encode("utf-8")
+    if settings.CLAIM_COMPRESSION if compress is None else compress:
+        return gzip.compress(payload, mtime=0)
+    return payload
+
+
+def decode_archive_payload(payload):
+    if payload.startswith(GZIP_MAGIC):
+        payload = gzip.decompress(payload)
+    return payload.decode("utf-8")
+
+
 class ClaimStore(object):
     def __init__(self, claim_bucket=None):
-        self.bucket_name = claim_bucket.name if claim_bucket else ClaimBucket().name
+        claim_bucket = claim_bucket or ClaimBucket()
+        self.bucket_name = claim_bucket.name
+        self.bucket_type = claim_bucket.bucket_type
+        self.backend_name = settings.CLAIM_STORAGE_BACKENDS.get(
+            claim_bucket.bucket_type, "s3"
+        )
+        self._s3_client = None
+        self.backend = self.__backend()
+
+    def __backend(self):
+        if self.backend_name == "s3":
+            # look up the client and bucket at call time so they can be patched in tests
+            return S3StorageBackend(
+                self.bucket_name, lambda: self.s3_client(), lambda: self.bucket()
+            )
+        elif self.backend_name == "local":
+            return LocalStorageBackend(
+                os.path.join(settings.CLAIM_STORAGE_LOCAL_ROOT, self.bucket_name)
+            )
+        elif self.backend_name == "memory":
+            return MemoryStorageBackend(self.bucket_name)
+        raise ValueError("Invalid storage backend {}".format(self.backend_name))
 
     def s3_client(self):
+        # boto3 clients are thread-safe once created, so re-use one per ClaimStore.
         # TODO region?
-        return boto3.client("s3", endpoint_url=settings.AWS_S3_ENDPOINT_URL)
+        if not self._s3_client:
+            self._s3_client = boto3.client(
+                "s3", endpoint_url=settings.AWS_S3_ENDPOINT_URL
+            )
+        return self._s3_client
 
     def bucket(self):
         return boto3.resource("s3", endpoint_url=settings.AWS_S3_ENDPOINT_URL).Bucket(
@@ -27,25 +83,35 @@ class ClaimStore(object):
         )
 
     def write(self, path, payload):
-        return self.s3_client().put_object(
-            Bucket=self.bucket_name, Key=path, Body=payload
-        )
+        return self.backend.put(path, payload)
 
     def read(self, path):
-        return self.s3_client().get_object(Bucket=self.bucket_name, Key=path)
+        return {"Body": io.BytesIO(self.backend.get(path))}
+
+    def tail(self, path, length):
+        return self.backend.tail(path, length)
+
+    def exists(self, path):
+        return self.backend.head(path)
+
+    def list(self, prefix=""):
+        return self.backend.list_prefix(prefix)
 
     def delete(self, paths):
         try:
-            payload = {"Objects": list(map(lambda path: {"Key": path}, paths))}
-            resp = self.bucket().delete_objects(Delete=payload)
+            resp = self.backend.delete_many(paths)
         except ClientError as e:
             logger.exception(e)
             return False
+        # only artifacts in the SWA bucket are envelope encrypted
+        if self.bucket_type == BUCKET_TYPE_SWA and resp.get("Deleted"):
+            delete_data_keys([deleted["Key"] for deleted in resp["Deleted"]])
         return resp
 
 
 class ClaimBucket:
     def __init__(self, bucket_type=BUCKET_TYPE_SWA):
+        self.bucket_type = bucket_type
         if bucket_type == BUCKET_TYPE_ARCHIVE:
             self.name = (
                 settings.TEST_ARCHIVE_BUCKET_NAME
@@ -76,8 +142,9 @@ class ClaimWriter(object):
 
     def write(self):
         try:
+            # write before opening the transaction so it is not held open during network I/O.
+            self.claim_store.write(self.path, self.payload)
             with transaction.atomic():
-                self.claim_store.write(self.path, self.payload)
                 self.claim.create_stored_event(self.claim_store.bucket_name)
                 self.claim.save()  # updates claim.updated_at
         except ClientError as e:
@@ -86,6 +153,94 @@ class ClaimWriter(object):
         return True
 
 
+class ClaimFanoutWriter(object):
+    """
+    Write one claim to several buckets concurrently.
+    Requires:
+    * "claim" Claim (or any object with EventCategories.STORED and events)
+    * "writes" list of (ClaimBucket, path, payload) tuples
+
+    After put(), "errors" holds an error string (or None) per write and
+    "timings" holds the seconds each write took.
+    """
+
+    def __init__(self, claim, writes):
+        self.claim = claim
+        self.writes = writes
+        self.errors = []
+        self.timings = []
+
+    # returns (error, seconds)
+    def __put(self, write, claim_store):
+        _, path, payload = write
+        start = time.perf_counter()
+        try:
+            claim_store.write(path, payload)
+        # OSError from the local backend
+        except (BotoCoreError, ClientError, OSError) as e:
+            logger.exception(e)
+            return str(e) or e.__class__.__name__, time.perf_counter() - start
+        return None, time.perf_counter() - start
+
+    # storage writes only. Returns True if every write succeeded.
+    def put(self):
+        if not self.writes:
+            return True
+        # create the stores (and their clients) before we fan out to threads,
+        # as creating a boto3 client is not thread-safe.
+        claim_stores = {}
+        for claim_bucket, _, _ in self.writes:
+            if claim_bucket.name not in claim_stores:
+                claim_store = ClaimStore(claim_bucket=claim_bucket)
+                if claim_store.backend_name == "s3":
+                    claim_store.s3_client()
+                claim_stores[claim_bucket.name] = claim_store
+        with ThreadPoolExecutor(max_workers=len(self.writes)) as executor:
+            results = list(
+                executor.map(
+                    self.__put,
+                    self.writes,
+                    [
+                        claim_stores[claim_bucket.name]
+                        for claim_bucket, _, _ in self.writes
+                    ],
+                )
+            )
+        self.errors = [error for error, _ in results]
+        self.timings = [seconds for _, seconds in results]
+        for (claim_bucket, path, _), seconds in zip(self.writes, self.timings):
+            logger.info(
+                "claim {} write to {} {} took {:.1f}ms".format(
+                    self.claim.uuid, claim_bucket.name, path, seconds * 1000
+                )
+            )
+        return not any(self.errors)
+
+    # one STORED event per write, or per write in "writes"
+    def create_stored_events(self, writes=None):
+        event_class = self.claim.events.model
+        content_type = ContentType.objects.get_for_model(self.claim)
+        event_class.objects.bulk_create(
+            [
+                event_class(
+                    model_name=content_type,
+                    model_id=self.claim.id,
+                    category=type(self.claim).EventCategories.STORED,
+                    description=claim_bucket.name,
+                )
+                for claim_bucket, _, _ in (self.writes if writes is None else writes)
+            ]
+        )
+        self.claim.save(update_fields=["updated_at"])
+
+    def write(self):
+        if not self.put():
+            return False
+        with transaction.atomic():
+            self.create_stored_events()
+        return True
+
+
 class ClaimReader(object):
     def __init__(self, claim, path=None, claim_store=None):
         self.claim_store = claim_store or ClaimStore()
@@ -99,15 +254,61 @@ class ClaimReader(object):
 
     def read(self):
         try:
-            return self.claim_store.read(self.path)["Body"].read().decode("utf-8")
+            return decode_archive_payload(
+                self.claim_store.read(self.path)["Body"].read()
+            )
         except ClientError as e:
             logger.exception(e)
             return False
 
     def exists(self):
         try:
-            return "Body" in self.claim_store.read(self.path)
+            return self.claim_store.exists(self.path)
         except ClientError:
             # no logging since we only care about binary true/false
             # and it's "normal" to return false
             return False
+
+
+class ClaimBatchReader(object):
+    """
+    Read the artifacts for many claims, fetching up to "max_workers" objects
+    concurrently but never holding more than "window" of them in memory.
+    Yields (claim, payload) tuples in the same order as "claims".
+    payload is False if the artifact could not be read.
+
+    "path_for" is a callable that returns the artifact path for a claim.
+    It is called in the calling thread, so it is safe for it to touch the database.
+    """
+
+    def __init__(
+        self, claims, path_for=None, claim_store=None, max_workers=None, window=None
+    ):
+        self.claims = claims
+        self.path_for = path_for or (lambda claim: claim.payload_path())
+        self.claim_store = claim_store or ClaimStore()
+        self.max_workers = max_workers or settings.CLAIM_READ_CONCURRENCY
+        self.window = window or self.max_workers * 2
+
+    def __read_path(self, path):
+        try:
+            return decode_archive_payload(self.claim_store.read(path)["Body"].read())
+        except ClientError as e:
+            logger.exception(e)
+            return False
+
+    def read(self):
+        # create the client before we fan out to threads.
+        if self.claim_store.backend_name == "s3":
+            self.claim_store.s3_client()
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for claim in self.claims:
+                future = executor.submit(self.__read_path, self.path_for(claim))
+                pending.append((claim, future))
+                if len(pending) >= self.window:
+                    claim, future = pending.popleft()
+                    yield claim, future.result()
+            while pending:
+                claim, future = pending.popleft()
+                yield claim, future.result()
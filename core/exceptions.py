@@ -22,3 +22,7 @@ class MalformedSwaXidError(SwaXidError):
 
 class MissingSwaXidError(SwaXidError):
     pass
+
+
+class QueryBudgetExceeded(Exception):
+    pass
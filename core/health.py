@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# /live/ answers from the latest sample of the DB, Redis and celery workers, shared by
+# every process in the HEALTH_CACHE_ALIAS cache, so a probe does not broadcast to every
+# celery worker and wait for their replies. Samples are taken on probe: once a sample is
+# HEALTH_SAMPLE_SECONDS old, the process that takes a short lock replaces it, and the
+# others answer from it until it is a few intervals old.
+# With HEALTH_SAMPLE_SECONDS=0 every probe takes a new sample.
+
+from django.core.cache import cache, caches
+from django.db import connection
+from . import settings
+from .celery import app as celery_app
+import logging
+import os
+import time
+
+logger = logging.getLogger("core")
+
+STALE_AFTER_INTERVALS = 3
+SAMPLE_KEY = "health-sample"
+LOCK_KEY = "health-sample-lock"
+
+
+def check_db():
+    try:
+        connection.ensure_connection()
+        return connection.is_usable()
+    except Exception as err:  # pragma: no cover
+        logger.exception(err)
+        return False
+
+
+def check_redis():
+    try:
+        return bool(cache.client.get_client().ping())
+    except Exception as err:  # pragma: no cover
+        logger.exception(err)
+        return False
+
+
+# number of active workers
+def check_celery():
+    try:
+        celery_workers = celery_app.control.inspect().active()
+    except Exception as err:  # pragma: no cover
+        logger.exception(err)
+        return 0
+    return len(celery_workers.keys()) if celery_workers else 0
+
+
+def sample():
+    status = {"sampled_at": time.time()}
+    for name, check in [
+        ("db", check_db),
+        ("redis", check_redis),
+        ("celery", check_celery),
+    ]:
+        start = time.time()
+        status[name] = check()
+        status[f"{name}_response"] = "{:.3f}".format(time.time() - start)
+    return status
+
+
+def is_healthy(status):
+    return status["db"] and status["redis"] and status["celery"] > 0
+
+
+class HealthSampler(object):
+    def __init__(self, interval, cache_alias=None):
+        self.interval = interval
+        self.cache_alias = cache_alias or settings.HEALTH_CACHE_ALIAS
+
+    def sample(self):
+        status = sample()
+        if self.interval > 0:
+            try:
+                caches[self.cache_alias].set(
+                    SAMPLE_KEY, status, self.interval * STALE_AFTER_INTERVALS
+                )
+            except Exception as err:
+                logger.exception(err)
+        return status
+
+    def shared(self):
+        try:
+            return caches[self.cache_alias].get(SAMPLE_KEY)
+        except Exception as err:
+            logger.exception(err)
+            return None
+
+    # true for the one process that samples this interval, or if the cache is unreachable
+    def lock(self):
+        try:
+            return caches[self.cache_alias].add(LOCK_KEY, os.getpid(), self.interval)
+        except Exception as err:
+            logger.exception(err)
+            return True
+
+    # the shared sample, or a new one if it is due and this process holds the lock,
+    # or if there is none or it is stale
+    def snapshot(self):
+        if self.interval <= 0:
+            return self.sample()
+        latest = self.shared()
+        if latest is None:
+            return self.sample()
+        age = time.time() - latest["sampled_at"]
+        if age >= self.interval and (
+            self.lock() or age > self.interval * STALE_AFTER_INTERVALS
+        ):
+            return self.sample()
+        return latest
+
+
+sampler = HealthSampler(settings.HEALTH_SAMPLE_SECONDS)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# Timings of the DB queries, S3 calls, cache calls, crypto operations and schema validation
+# made while serving a request, collected per thread by the RequestMetrics middleware
+# and exported by core.metrics. Outside of a request (e.g. celery tasks) nothing is recorded,
+# nor is anything done in other threads a request fans out to.
+
+from contextlib import contextmanager
+from django_redis.client import DefaultClient
+import boto3
+import functools
+import threading
+import time
+
+_local = threading.local()
+_boto3_lock = threading.Lock()
+_boto3_instrumented = False
+
+CACHE_OPERATIONS = [
+    "get",
+    "set",
+    "add",
+    "delete",
+    "get_many",
+    "set_many",
+    "delete_many",
+    "has_key",
+    "incr",
+    "decr",
+    "touch",
+    "expire",
+    "ttl",
+    "persist",
+]
+
+
+class RequestTimings(object):
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        # (kind, operation, seconds)
+        self.calls = []
+        # kinds being timed, so nested calls (e.g. set_many calling set) count once
+        self.timing = set()
+
+    # connection.execute_wrapper()
+    def time_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+
+def start_request():
+    _local.timings = RequestTimings()
+    return _local.timings
+
+
+def end_request():
+    _local.timings = None
+
+
+def current_timings():
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def timed(kind, operation):
+    timings = current_timings()
+    if timings is None or kind in timings.timing:
+        yield
+        return
+    timings.timing.add(kind)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.timing.discard(kind)
+        timings.calls.append((kind, operation, time.perf_counter() - start))
+
+
+def instrumented(kind, operation):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(kind, operation):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class InstrumentedRedisClient(DefaultClient):
+    """
+    django_redis CLIENT_CLASS that times the cache calls of each request.
+    """
+
+
+for operation in CACHE_OPERATIONS:
+    setattr(
+        InstrumentedRedisClient,
+        operation,
+        instrumented("cache", operation)(getattr(DefaultClient, operation)),
+    )
+
+
+def before_s3_call(model, context, **kwargs):
+    if current_timings() is not None:
+        context["instrumentation"] = (model.name, time.perf_counter())
+
+
+# after-call and after-call-error
+def after_s3_call(context, **kwargs):
+    timings = current_timings()
+    operation, start = context.pop("instrumentation", (None, None))
+    if timings is not None and operation:
+        timings.calls.append(("s3", operation, time.perf_counter() - start))
+
+
+# boto3 clients copy the event handlers of the session they are created from,
+# so this must run before the first S3 client is created.
+def instrument_boto3():
+    global _boto3_instrumented
+    with _boto3_lock:
+        if _boto3_instrumented:
+            return
+        if not boto3.DEFAULT_SESSION:
+            boto3.setup_default_session()
+        events = boto3.DEFAULT_SESSION.events
+        events.register("before-call.s3", before_s3_call)
+        events.register("after-call.s3", after_s3_call)
+        events.register("after-call-error.s3", after_s3_call)
+        _boto3_instrumented = True
@@ -3,7 +3,8 @@
 # pseudo identity provider for Local login (testing only)
 import json
 import logging
-from api.models import Claimant, Claim, SWA
+from api.models import Claimant, Claim
+from api.swa_registry import swa_registry
 from api.whoami import WhoAmI
 from api.identity_claim_maker import IdentityClaimMaker, IdentityClaimValidationError
 from api.claim_finder import ClaimFinder
@@ -44,7 +45,7 @@ class LocalIdentityProvider(object):
         if "swa_code" not in params:
             raise LocalIdentityProviderError("swa_code required")
 
-        swa = SWA.active.get(code=params["swa_code"])
+        swa = swa_registry.get(params["swa_code"])
         params["swa"] = swa.for_whoami()
         del params["swa_code"]
 
@@ -106,12 +107,11 @@ class LocalIdentityProvider(object):
         self.build_whoami_and_claimant()
         self.request.session["whoami"] = self.whoami.as_dict()
         self.request.session["authenticated"] = True
-        if (
-            self.whoami.swa.featureset == "Identity Only"
-            and self.claimant.pending_identity_only_claim()
-        ):
+        if self.whoami.swa.featureset != "Identity Only":
+            return
+        claim = self.claimant.pending_identity_only_claim()
+        if claim:
             logger.debug("🚀 create Identity claim")
-            claim = self.claimant.pending_identity_only_claim()
             claim_maker = IdentityClaimMaker(claim, self.whoami)
             try:
                 claim_maker.create()
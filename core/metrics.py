@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# Prometheus histograms of the per-request timings from core.instrumentation,
+# labeled by resolved view name and SWA code.
+#
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (see start-server.sh and gunicorn.conf.py)
+# so each worker writes its samples there and /metrics/ aggregates them across workers.
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from api.models import SWA
+import os
+import re
+
+NAMESPACE = "claimantsapi"
+LABELS = ["view", "swa"]
+# anything else in the session (e.g. from ?swa=) is not a label we want to keep
+SWA_CODE = re.compile(r"^[A-Z]{2}$")
+
+REQUEST_SECONDS = Histogram(
+    "request_seconds",
+    "Time to serve a request",
+    LABELS + ["method", "status"],
+    namespace=NAMESPACE,
+)
+DB_QUERIES = Histogram(
+    "request_db_queries",
+    "DB queries per request",
+    LABELS,
+    namespace=NAMESPACE,
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_SECONDS = Histogram(
+    "request_db_seconds",
+    "Total time in DB queries per request",
+    LABELS,
+    namespace=NAMESPACE,
+)
+# per call, by operation
+CALL_SECONDS = {
+    kind: Histogram(
+        f"{kind}_call_seconds",
+        description,
+        LABELS + ["operation"],
+        namespace=NAMESPACE,
+    )
+    for kind, description in [
+        ("s3", "Time per S3 call"),
+        ("cache", "Time per cache call"),
+        ("crypto", "Time per claim encryption or decryption"),
+        ("schema_validation", "Time per JSON schema validation"),
+    ]
+}
+QUERY_BUDGET_EXCEEDED = Counter(
+    "query_budget_exceeded",
+    "Requests that made more DB queries than the @query_budget of their view",
+    ["view"],
+    namespace=NAMESPACE,
+)
+
+
+def view_name(request):
+    if getattr(request, "resolver_match", None):
+        return request.resolver_match.view_name
+    return "unresolved"
+
+
+def swa_code(request):
+    # set by swa.middleware.auth.SWAAuth
+    user = getattr(request, "user", None)
+    if isinstance(user, SWA):
+        return user.code
+    # do not load a session the request did not need
+    session = getattr(request, "session", None)
+    if session is None or not session.accessed:
+        return ""
+    whoami_swa = (session.get("whoami") or {}).get("swa") or {}
+    code = whoami_swa.get("code") or session.get("swa") or ""
+    return code if SWA_CODE.match(code) else ""
+
+
+def observe(request, response, timings, seconds):
+    labels = {"view": view_name(request), "swa": swa_code(request)}
+    REQUEST_SECONDS.labels(
+        method=request.method, status=response.status_code, **labels
+    ).observe(seconds)
+    DB_QUERIES.labels(**labels).observe(timings.db_queries)
+    DB_SECONDS.labels(**labels).observe(timings.db_seconds)
+    for kind, operation, call_seconds in timings.calls:
+        CALL_SECONDS[kind].labels(operation=operation, **labels).observe(call_seconds)
+
+
+def exposition():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
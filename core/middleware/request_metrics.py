@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from django.db import connection
+from core import instrumentation, metrics
+import time
+
+
+class RequestMetrics(object):
+    def __init__(self, get_response):
+        """
+        One-time configuration and initialisation.
+        """
+        self.get_response = get_response
+        instrumentation.instrument_boto3()
+
+    def __call__(self, request):
+        timings = instrumentation.start_request()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.time_query):
+                response = self.get_response(request)
+        finally:
+            instrumentation.end_request()
+        metrics.observe(request, response, timings, time.perf_counter() - start)
+        return response
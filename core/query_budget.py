@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+# @query_budget(n) counts the DB queries a view makes, and the SQL it repeats
+# (usually an N+1 over a relation, e.g. Claim.events), and checks them against its budget.
+# Over budget, settings.QUERY_BUDGET_MODE decides what happens:
+# * "raise" raise QueryBudgetExceeded (the default in tests)
+# * "warn" log a warning (the default with DEBUG)
+# * "metric" count it in claimantsapi_query_budget_exceeded_total (the default otherwise)
+
+from collections import Counter
+from django.conf import settings
+from django.db import connection
+from .exceptions import QueryBudgetExceeded
+from .metrics import QUERY_BUDGET_EXCEEDED
+import functools
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter(object):
+    def __init__(self):
+        # SQL (with placeholders, not values) -> times it was run
+        self.statements = Counter()
+
+    # connection.execute_wrapper()
+    def __call__(self, execute, sql, params, many, context):
+        self.statements[sql] += 1
+        return execute(sql, params, many, context)
+
+    def total(self):
+        return sum(self.statements.values())
+
+    def repeated(self):
+        return {sql: count for sql, count in self.statements.items() if count > 1}
+
+
+def query_budget_mode():
+    if settings.QUERY_BUDGET_MODE:
+        return settings.QUERY_BUDGET_MODE
+    if os.environ.get("RUNNING_TESTS"):
+        return "raise"
+    return "warn" if settings.DEBUG else "metric"
+
+
+def check_query_budget(view_name, budget, query_counter):
+    queries = query_counter.total()
+    if queries <= budget:
+        return
+    message = "{} made {} queries, over its budget of {}. Repeated: {}".format(
+        view_name,
+        queries,
+        budget,
+        "; ".join(
+            "{}x {}".format(count, sql)
+            for sql, count in query_counter.repeated().items()
+        )
+        or "none",
+    )
+    mode = query_budget_mode()
+    if mode == "raise":
+        raise QueryBudgetExceeded(message)
+    if mode == "warn":
+        logger.warning(message)
+    else:
+        QUERY_BUDGET_EXCEEDED.labels(view=view_name).inc()
+
+
+def query_budget(budget):
+    def decorator(view):
+        view_name = f"{view.__module__}.{view.__name__}"
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            query_counter = QueryCounter()
+            with connection.execute_wrapper(query_counter):
+                response = view(request, *args, **kwargs)
+            check_query_budget(view_name, budget, query_counter)
+            return response
+
+        wrapper.query_budget = budget
+        return wrapper
+
+    return decorator
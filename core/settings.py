@@ -145,6 +145,7 @@ if os.environ.get("ENV_NAME") != "wcms":
     INSTALLED_APPS += ("django_extensions",)
 
 MIDDLEWARE = [
+    "core.middleware.request_metrics.RequestMetrics",  # first, so it times everything else
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -171,7 +172,8 @@ REDIS_DB = 0
 REDIS_URL = os.environ.get("REDIS_URL", f"rediss://elasticache:6379/{REDIS_DB}")
 redis_base_options = {
     "DB": REDIS_DB,
-    "CLIENT_CLASS": "django_redis.client.DefaultClient",
+    # times cache calls for core.metrics
+    "CLIENT_CLASS": "core.instrumentation.InstrumentedRedisClient",
     "SOCKET_CONNECT_TIMEOUT": 5,  # in seconds
     "SOCKET_TIMEOUT": 5,  # seconds
     "CONNECTION_POOL_KWARGS": {"ssl_cert_reqs": None},
@@ -325,6 +327,13 @@ EMAIL_REPLY_TO = env.str("EMAIL_REPLY_TO", default="no-reply@dol.gov")
 # Identity Providers
 LOGIN_DOT_GOV_REDIRECT_URI = os.environ.get("LOGIN_DOT_GOV_REDIRECT_URI")
 LOGIN_DOT_GOV_CLIENT_ID = os.environ.get("LOGIN_DOT_GOV_CLIENT_ID")
+# the login.gov discovery document and JWKS are cached for this long,
+# with the last good copy on disk for when login.gov cannot be reached (see login-dot-gov/oidc_http.py)
+LOGIN_DOT_GOV_OIDC_CACHE_SECONDS = env.int("LOGIN_DOT_GOV_OIDC_CACHE_SECONDS", 3600)
+LOGIN_DOT_GOV_OIDC_CACHE_DIR = env.str(
+    "LOGIN_DOT_GOV_OIDC_CACHE_DIR", "/tmp/logindotgov-oidc"
+)
+LOGIN_DOT_GOV_OIDC_TIMEOUT = env.int("LOGIN_DOT_GOV_OIDC_TIMEOUT", 10)
 
 if os.environ.get("LOGIN_DOT_GOV_ENV") == "test":
     # generate a new key pair on the fly
@@ -393,6 +402,49 @@ TEST_ARCHIVE_BUCKET_NAME = env.str(
     "TEST_S3_ARCHIVE_BUCKET_URL", "usdol-ui-archive-test"
 )
 ARCHIVE_BUCKET_NAME = env.str("S3_ARCHIVE_BUCKET_URL", "usdol-ui-archive")
+# storage backend per ClaimBucket type: "s3", "local" (files under CLAIM_STORAGE_LOCAL_ROOT) or "memory"
+CLAIM_STORAGE_BACKENDS = env.json(
+    "CLAIM_STORAGE_BACKENDS", {"swa": "s3", "archive": "s3"}
+)
+CLAIM_STORAGE_LOCAL_ROOT = env.str(
+    "CLAIM_STORAGE_LOCAL_ROOT", str(BASE_DIR / "claim-storage")
+)
+# max number of concurrent S3 reads when reading many claims at once (e.g. bulk export)
+CLAIM_READ_CONCURRENCY = env.int("CLAIM_READ_CONCURRENCY", 8)
+# max number of completed claims packed into a single SWA batch archive
+CLAIM_BATCH_ARCHIVE_MAX_CLAIMS = env.int("CLAIM_BATCH_ARCHIVE_MAX_CLAIMS", 5000)
+# the batch archive manifest is signed (ES256 JWS) with this EC private key (PEM),
+# so SWAs can verify it with the public key. Local and CI envs generate one on the fly.
+claim_batch_signing_key_file = (
+    BASE_DIR
+    / "certs"
+    / os.environ.get("CLAIM_BATCH_SIGNING_KEY_FILE", "claim-batch-signing.pem")
+)
+if os.path.exists(claim_batch_signing_key_file):  # pragma: no cover
+    with open(claim_batch_signing_key_file, "rb") as pf:
+        CLAIM_BATCH_SIGNING_KEY = pf.read()
+elif os.environ.get("ENV_NAME") in ["devlocal", "ci"]:
+    from jwcrypto import jwk
+
+    CLAIM_BATCH_SIGNING_KEY = jwk.JWK.generate(kty="EC", crv="P-256").export_to_pem(
+        True, None
+    )
+else:  # pragma: no cover
+    logger.warn("CLAIM_BATCH_SIGNING_KEY set to False as .pem could not be found")
+    CLAIM_BATCH_SIGNING_KEY = False
+# pending claim outbox writes are retried until they have been attempted this many times
+CLAIM_OUTBOX_MAX_ATTEMPTS = env.int("CLAIM_OUTBOX_MAX_ATTEMPTS", 5)
+# seconds to wait before reconciling a pending claim outbox write, so in-flight requests can finish
+CLAIM_OUTBOX_RECONCILE_AFTER = env.int("CLAIM_OUTBOX_RECONCILE_AFTER", 300)
+# partial claim validation results, by digest of the cleaned claim, kept in process (LRU).
+CLAIM_VALIDATION_CACHE_SIZE = env.int("CLAIM_VALIDATION_CACHE_SIZE", 1024)
+# optional shared tier, e.g. "default". Validation errors can echo claimant values,
+# so only use a cache with the secure serializer.
+CLAIM_VALIDATION_CACHE_ALIAS = env.str("CLAIM_VALIDATION_CACHE_ALIAS", "")
+CLAIM_VALIDATION_CACHE_TIMEOUT = env.int("CLAIM_VALIDATION_CACHE_TIMEOUT", 60 * 30)
+# compress claims before encryption (JWE "zip": "DEF") and gzip archive copies.
+# SWAs must be able to decrypt compressed JWEs before this is turned on.
+CLAIM_COMPRESSION = env.bool("CLAIM_COMPRESSION", False)
 
 # CLAIM_SECRET_KEY is what we use to symmetrically encrypt claims-in-progress
 # and Claimant files.
@@ -406,6 +458,9 @@ if claim_secret_key.startswith("["):
 else:  # pragma: no cover
     validate_secret_key(claim_secret_key, "CLAIM_SECRET_KEY")
     CLAIM_SECRET_KEY = [claim_secret_key]
+# symmetrically encrypted artifacts keep their wrapped data key in the db (DataKey)
+# so rotating CLAIM_SECRET_KEY re-wraps the db rows instead of re-writing every artifact.
+CLAIM_ENVELOPE_ENCRYPTION = env.bool("CLAIM_ENVELOPE_ENCRYPTION", False)
 
 # all sites except production should have this turned on, as policy.
 # we make it an env var so that we can test locally w/o it
@@ -428,3 +483,24 @@ SWA_XID_PATTERNS = env.json("SWA_XID_PATTERNS", {"AR": "^\\d{8}-\\d{6}-\\d{7}-\\
 REQUIRE_PREQUAL_START_PAGE = (
     os.environ.get("REQUIRE_PREQUAL_START_PAGE", "false").lower() == "true"
 )
+
+# bearer token for the Prometheus /metrics/ endpoint, which is disabled (404) without one
+METRICS_TOKEN = env.str("METRICS_TOKEN", "")
+
+# what @query_budget does when a view makes more queries than its budget:
+# "raise", "warn" or "metric". Default "raise" in tests, "warn" with DEBUG, otherwise "metric"
+QUERY_BUDGET_MODE = env.str("QUERY_BUDGET_MODE", "")
+
+# seconds between the samples of the DB, Redis and celery that /live/ answers from (see core/health.py).
+# 0 checks them on every probe
+HEALTH_SAMPLE_SECONDS = env.int("HEALTH_SAMPLE_SECONDS", 10)
+HEALTH_CACHE_ALIAS = "insecure"
+
+# how often each process checks whether a SWA has changed (see api/swa_registry.py),
+# through a version key in this cache
+SWA_REGISTRY_CHECK_SECONDS = env.int("SWA_REGISTRY_CHECK_SECONDS", 5)
+SWA_REGISTRY_CACHE_ALIAS = "insecure"
+
+# rendered pages that are the same for every visitor (see home/page_cache.py)
+PAGE_CACHE_ALIAS = "insecure"
+PAGE_CACHE_TIMEOUT = env.int("PAGE_CACHE_TIMEOUT", 60 * 60)
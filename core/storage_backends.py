@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# storage backends for ClaimStore. Every backend follows S3 semantics,
+# including raising botocore ClientError for a missing object,
+# so that callers behave the same regardless of where the bytes live.
+from botocore.exceptions import ClientError
+from collections import defaultdict
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# S3 accepts at most this many keys per delete_objects request
+S3_DELETE_BATCH_SIZE = 1000
+
+
+def no_such_key(path, operation_name="GetObject"):
+    return ClientError(
+        {"Error": {"Code": "NoSuchKey", "Message": f"{path} does not exist"}},
+        operation_name,
+    )
+
+
+def as_bytes(payload):
+    if hasattr(payload, "read"):
+        payload = payload.read()
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return payload
+
+
+class StorageBackend(object):
+    """
+    Interface for a single bucket.
+    * put(path, payload) payload may be str, bytes or a file-like object
+    * get(path) returns bytes, raises ClientError if path does not exist
+    * tail(path, length) returns the last length bytes, raises ClientError like get()
+    * head(path) returns True/False
+    * delete_many(paths) returns {"Deleted": [{"Key": path}, ...], "Errors": [...]}
+    * list_prefix(prefix) yields every path starting with prefix
+    """
+
+    def put(self, path, payload):  # pragma: no cover
+        raise NotImplementedError
+
+    def get(self, path):  # pragma: no cover
+        raise NotImplementedError
+
+    def tail(self, path, length):  # pragma: no cover
+        raise NotImplementedError
+
+    def head(self, path):  # pragma: no cover
+        raise NotImplementedError
+
+    def delete_many(self, paths):  # pragma: no cover
+        raise NotImplementedError
+
+    def list_prefix(self, prefix):  # pragma: no cover
+        raise NotImplementedError
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    Requires:
+    * "bucket_name" string
+    * "s3_client" callable returning a boto3 S3 client
+    * "s3_bucket" callable returning a boto3 S3 Bucket resource
+    """
+
+    def __init__(self, bucket_name, s3_client, s3_bucket):
+        self.bucket_name = bucket_name
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+
+    def put(self, path, payload):
+        return self.s3_client().put_object(
+            Bucket=self.bucket_name, Key=path, Body=payload
+        )
+
+    def get(self, path):
+        resp = self.s3_client().get_object(Bucket=self.bucket_name, Key=path)
+        return resp["Body"].read()
+
+    def tail(self, path, length):
+        # a suffix range returns the whole object if it is shorter than length
+        resp = self.s3_client().get_object(
+            Bucket=self.bucket_name, Key=path, Range=f"bytes=-{length}"
+        )
+        return resp["Body"].read()
+
+    def head(self, path):
+        try:
+            self.s3_client().head_object(Bucket=self.bucket_name, Key=path)
+        except ClientError:
+            return False
+        return True
+
+    def delete_many(self, paths):
+        resp = {}
+        for i in range(0, len(paths), S3_DELETE_BATCH_SIZE):
+            batch = paths[i : i + S3_DELETE_BATCH_SIZE]  # noqa: E203
+            payload = {"Objects": list(map(lambda path: {"Key": path}, batch))}
+            batch_resp = self.s3_bucket().delete_objects(Delete=payload)
+            for key in ["Deleted", "Errors"]:
+                if key in batch_resp:
+                    resp.setdefault(key, []).extend(batch_resp[key])
+        return resp
+
+    def list_prefix(self, prefix):
+        paginator = self.s3_client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Stores each object as a file under "root".
+    Writes go to a temporary file that is renamed into place, so readers
+    never see a partially written object.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def __full_path(self, path):
+        full_path = os.path.abspath(os.path.join(self.root, path))
+        if not full_path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid path {path}")
+        return full_path
+
+    def put(self, path, payload):
+        full_path = self.__full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(as_bytes(payload))
+            os.replace(tmp_path, full_path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return {}
+
+    def get(self, path):
+        try:
+            with open(self.__full_path(path), "rb") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            raise no_such_key(path)
+
+    def tail(self, path, length):
+        try:
+            with open(self.__full_path(path), "rb") as fh:
+                fh.seek(max(os.fstat(fh.fileno()).st_size - length, 0))
+                return fh.read()
+        except FileNotFoundError:
+            raise no_such_key(path)
+
+    def head(self, path):
+        return os.path.isfile(self.__full_path(path))
+
+    def delete_many(self, paths):
+        deleted = []
+        for path in paths:
+            try:
+                os.unlink(self.__full_path(path))
+            except FileNotFoundError:
+                pass
+            # like S3, deleting a missing object is not an error
+            deleted.append({"Key": path})
+        return {"Deleted": deleted}
+
+    def list_prefix(self, prefix):
+        paths = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith(".tmp-"):
+                    continue
+                path = os.path.relpath(os.path.join(dirpath, filename), self.root)
+                if path.startswith(prefix):
+                    paths.append(path)
+        yield from sorted(paths)
+
+
+class MemoryStorageBackend(StorageBackend):
+    """
+    Stores objects in a process-wide dict, shared by every instance
+    with the same "bucket_name". Intended for tests and benchmarks.
+    """
+
+    buckets = defaultdict(dict)
+    lock = threading.Lock()
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.buckets.clear()
+
+    def put(self, path, payload):
+        payload = as_bytes(payload)
+        with self.lock:
+            self.buckets[self.bucket_name][path] = payload
+        return {}
+
+    def get(self, path):
+        with self.lock:
+            if path not in self.buckets[self.bucket_name]:
+                raise no_such_key(path)
+            return self.buckets[self.bucket_name][path]
+
+    def tail(self, path, length):
+        return self.get(path)[-length:]
+
+    def head(self, path):
+        with self.lock:
+            return path in self.buckets[self.bucket_name]
+
+    def delete_many(self, paths):
+        with self.lock:
+            for path in paths:
+                self.buckets[self.bucket_name].pop(path, None)
+        return {"Deleted": [{"Key": path} for path in paths]}
+
+    def list_prefix(self, prefix):
+        with self.lock:
+            paths = [p for p in self.buckets[self.bucket_name] if p.startswith(prefix)]
+        yield from sorted(paths)
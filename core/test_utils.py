@@ -22,12 +22,17 @@ def generate_keypair():
 def create_s3_bucket(is_archive=False):
     claim_bucket = ClaimBucket(bucket_type=BUCKET_TYPE_ARCHIVE) if is_archive else None
     cs = ClaimStore(claim_bucket=claim_bucket)
+    if cs.backend_name != "s3":
+        return
     cs.bucket().create()
 
 
 def delete_s3_bucket(is_archive=False):
     claim_bucket = ClaimBucket(bucket_type=BUCKET_TYPE_ARCHIVE) if is_archive else None
     cs = ClaimStore(claim_bucket=claim_bucket)
+    if cs.backend_name != "s3":
+        cs.delete(list(cs.list()))
+        return
     # must delete all objects first, then delete bucket
     bucket = cs.bucket()
     bucket.objects.all().delete()
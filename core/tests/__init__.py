@@ -6,6 +6,11 @@ from .claim_storage import CoreClaimStorageTestCase
 from .claim_encryption import CoreClaimEncryptionTestCase
 from .launch_darkly import LaunchDarklyTestCase
 from .exceptions import CoreExceptionsTestCase
+from .storage_backends import StorageBackendsTestCase
+from .json_codec import JsonCodecTestCase
+from .benchmarks import BenchmarksTestCase
+from .metrics import MetricsTestCase
+from .query_budget import QueryBudgetTestCase
 
 __all__ = [
     "CoreTestCase",
@@ -15,4 +20,9 @@ __all__ = [
     "CoreClaimEncryptionTestCase",
     "LaunchDarklyTestCase",
     "CoreExceptionsTestCase",
+    "StorageBackendsTestCase",
+    "JsonCodecTestCase",
+    "BenchmarksTestCase",
+    "MetricsTestCase",
+    "QueryBudgetTestCase",
 ]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from core.benchmarks import compare
+from api.models import Claim
+import json
+import tempfile
+
+HOT_PATH_SUITES = ["claim_validator", "claim_serializer", "whoami", "swa_xid"]
+
+
+class BenchmarksTestCase(TestCase):
+    def run_benchmarks(self, *args):
+        with tempfile.NamedTemporaryFile() as output:
+            call_command(
+                "run_benchmarks",
+                *args,
+                "--sizes",
+                "1024",
+                "--number",
+                "1",
+                "--repeat",
+                "1",
+                "--output",
+                output.name,
+            )
+            return json.loads(output.read())
+
+    def test_hot_path_suites(self):
+        results = self.run_benchmarks(*HOT_PATH_SUITES)["results"]
+        names = [result["name"] for result in results]
+        self.assertEqual(
+            names,
+            [
+                "claim_validator.claim",
+                "claim_validator.identity",
+                "claim_validator.identity",
+                "claim_serializer.for_swa",
+                "claim_serializer.for_claimant",
+            ]
+            + [
+                f"whoami.{name}"
+                for _ in range(2)
+                for name in ["from_dict", "as_dict", "as_identity"]
+            ]
+            + [f"swa_xid.{name}" for _ in range(2) for name in ["parse", "format_ok"]],
+        )
+        self.assertEqual(results[0]["params"], {"size": 1024})
+        self.assertGreater(results[3]["queries"], 0)
+        # the seeded claim is rolled back
+        self.assertFalse(Claim.objects.exists())
+
+    def test_compare(self):
+        baseline = [
+            {"name": "a", "params": {"size": 1}, "median": 2.0},
+            {"name": "b", "params": {"size": 1}, "median": 1.0},
+        ]
+        results = [
+            {"name": "a", "params": {"size": 1}, "median": 3.0},
+            {"name": "a", "params": {"size": 2}, "median": 3.0},
+        ]
+        comparison = compare(results, baseline)
+        self.assertEqual(len(comparison), 1)
+        self.assertEqual(comparison[0]["baseline_median"], 2.0)
+        self.assertEqual(comparison[0]["change"], 0.5)
+
+    def test_max_regression(self):
+        with tempfile.NamedTemporaryFile("w") as baseline:
+            baseline.write(json.dumps(self.run_benchmarks("swa_xid")))
+            baseline.flush()
+            results = self.run_benchmarks("swa_xid", "--compare", baseline.name)
+            self.assertEqual(len(results["comparison"]), 4)
+            with self.assertRaises(CommandError) as context:
+                self.run_benchmarks(
+                    "swa_xid",
+                    "--compare",
+                    baseline.name,
+                    "--max-regression",
+                    "-1",
+                )
+        self.assertIn("swa_xid.parse", str(context.exception))
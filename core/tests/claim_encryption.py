@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
 from jwcrypto import jwe, jwk
 from jwcrypto.common import json_encode, json_decode
@@ -14,13 +15,18 @@ from core.claim_encryption import (
     RotatableSymmetricClaimDecryptor,
     SymmetricKeyRotator,
     symmetric_encryption_key,
+    FORMAT_JWE,
+    FORMAT_JWE_DEF,
 )
+from api.models import DataKey
 from core.test_utils import (
     generate_keypair,
     generate_symmetric_encryption_key,
 )
 from core.exceptions import ClaimThumbprintMismatchError
+import json
 import logging
+import tempfile
 
 
 logger = logging.getLogger(__name__)
@@ -134,3 +140,204 @@ class CoreClaimEncryptionTestCase(TestCase):
                 packaged_claim.as_json(), [generate_symmetric_encryption_key()]
             )
             rotable_decryptor.decrypt()
+
+    def test_compressed_claims(self):
+        private_key_jwk, public_key_jwk = generate_keypair()
+        key_string = generate_symmetric_encryption_key()
+        key = symmetric_encryption_key(key_string)
+        claim = {
+            "id": "123-abc",
+            "employers": [{"name": "Acme", "address": "123 Main St"}] * 50,
+        }
+
+        for encryptor, encryption_key, decrypt in [
+            (
+                AsymmetricClaimEncryptor,
+                public_key_jwk,
+                lambda pc: AsymmetricClaimDecryptor(pc, private_key_jwk).decrypt(),
+            ),
+            (
+                SymmetricClaimEncryptor,
+                key,
+                lambda pc: RotatableSymmetricClaimDecryptor(pc, [key_string]).decrypt(),
+            ),
+        ]:
+            plain = encryptor(claim, encryption_key, compress=False).packaged_claim()
+            compressed = encryptor(
+                claim, encryption_key, compress=True
+            ).packaged_claim()
+            self.assertEqual(plain.as_dict()["format"], FORMAT_JWE)
+            self.assertEqual(compressed.as_dict()["format"], FORMAT_JWE_DEF)
+            self.assertLess(len(compressed.as_json()), len(plain.as_json()) / 4)
+            self.assertEqual(decrypt(plain.as_json()), claim)
+            self.assertEqual(decrypt(compressed.as_json()), claim)
+
+            # envelopes written before "format" existed are still readable
+            legacy = plain.as_dict()
+            del legacy["format"]
+            self.assertEqual(decrypt(json_encode(legacy)), claim)
+
+            unknown = plain.as_dict() | {"format": "jwe+zstd"}
+            with self.assertRaises(ValueError) as context:
+                decrypt(json_encode(unknown))
+            self.assertIn("Unknown packaged_claim format", str(context.exception))
+
+        with override_settings(CLAIM_COMPRESSION=True):
+            packaged_claim = SymmetricClaimEncryptor(claim, key).packaged_claim()
+            self.assertEqual(packaged_claim.as_dict()["format"], FORMAT_JWE_DEF)
+
+    def test_envelope_encryption(self):
+        old_key_string = generate_symmetric_encryption_key()
+        new_key_string = generate_symmetric_encryption_key()
+        old_key = symmetric_encryption_key(old_key_string)
+        new_key = symmetric_encryption_key(new_key_string)
+        claim = {"id": "123-abc", "foo": "something-really-private-and-sensitive"}
+
+        packaged_claim = SymmetricClaimEncryptor(
+            claim, old_key, envelope=True
+        ).packaged_claim()
+        packaged_json = packaged_claim.as_json()
+        envelope = packaged_claim.as_dict()
+        self.assertNotIn("encrypted_key", envelope["claim"])
+        self.assertNotIn("header", envelope["claim"])
+        data_key = DataKey.objects.get(uuid=envelope["data_key"])
+        self.assertEqual(data_key.kek_kid, old_key.thumbprint())
+        self.assertEqual(
+            SymmetricClaimDecryptor(packaged_json, old_key).decrypt(), claim
+        )
+
+        # rotation re-wraps the data key only
+        rotator = SymmetricKeyRotator(old_key=old_key, new_key=new_key)
+        legacy_claim = SymmetricClaimEncryptor(
+            claim, old_key, envelope=False
+        ).packaged_claim()
+        self.assertEqual(rotator.rotate_data_keys(batch_size=1), 1)
+        self.assertEqual(rotator.rotate_data_keys(), 0)
+        data_key.refresh_from_db()
+        self.assertEqual(data_key.kek_kid, new_key.thumbprint())
+
+        with self.assertRaises(ClaimThumbprintMismatchError):
+            SymmetricClaimDecryptor(packaged_json, old_key)
+        self.assertEqual(
+            SymmetricClaimDecryptor(packaged_json, new_key).decrypt(), claim
+        )
+        self.assertEqual(
+            RotatableSymmetricClaimDecryptor(
+                packaged_json, [old_key_string, new_key_string]
+            ).decrypt(),
+            claim,
+        )
+        # packages without a data key still decrypt with the old key
+        self.assertEqual(
+            SymmetricClaimDecryptor(legacy_claim.as_json(), old_key).decrypt(), claim
+        )
+
+        # rotating an envelope returns it unchanged
+        self.assertEqual(
+            SymmetricKeyRotator(old_key=new_key, new_key=old_key).rotate(packaged_json),
+            packaged_json,
+        )
+        self.assertEqual(
+            SymmetricClaimDecryptor(packaged_json, old_key).decrypt(), claim
+        )
+
+    def test_envelope_data_key_per_path(self):
+        old_key_string = generate_symmetric_encryption_key()
+        new_key_string = generate_symmetric_encryption_key()
+        old_key = symmetric_encryption_key(old_key_string)
+        new_key = symmetric_encryption_key(new_key_string)
+        path = "XX/123-abc.partial.json"
+
+        def encrypt(claim, key):
+            return (
+                SymmetricClaimEncryptor(claim, key, envelope=True, path=path)
+                .packaged_claim()
+                .as_json()
+            )
+
+        first = encrypt({"id": "123-abc", "version": 1}, old_key)
+        data_key = DataKey.objects.get(path=path)
+        # overwriting the artifact re-uses its data key,
+        # so the artifact it replaces can still be read
+        second = encrypt({"id": "123-abc", "version": 2}, old_key)
+        self.assertEqual(DataKey.objects.filter(path=path).get(), data_key)
+        self.assertEqual(json_decode(second)["data_key"], str(data_key.uuid))
+        for packaged_json, version in [(first, 1), (second, 2)]:
+            with self.assertNumQueries(1):
+                decrypted = RotatableSymmetricClaimDecryptor(
+                    packaged_json, [old_key_string]
+                ).decrypt()
+            self.assertEqual(decrypted["version"], version)
+
+        # a data key wrapped with an older key is re-wrapped with the new one,
+        # so the artifacts it already encrypts stay readable
+        with override_settings(CLAIM_SECRET_KEY=[new_key_string, old_key_string]):
+            third = encrypt({"id": "123-abc", "version": 3}, new_key)
+        data_key.refresh_from_db()
+        self.assertEqual(data_key.kek_kid, new_key.thumbprint())
+        self.assertEqual(DataKey.objects.filter(path=path).count(), 1)
+        for packaged_json, version in [(second, 2), (third, 3)]:
+            self.assertEqual(
+                SymmetricClaimDecryptor(packaged_json, new_key).decrypt()["version"],
+                version,
+            )
+
+        # one wrapped with a key that is no longer known is replaced
+        other_key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        with override_settings(CLAIM_SECRET_KEY=[old_key_string]):
+            fourth = encrypt({"id": "123-abc", "version": 4}, other_key)
+        data_key.refresh_from_db()
+        self.assertEqual(data_key.kek_kid, other_key.thumbprint())
+        self.assertEqual(
+            SymmetricClaimDecryptor(fourth, other_key).decrypt()["version"], 4
+        )
+
+    def test_envelope_splicing(self):
+        private_key_jwk, public_key_jwk = generate_keypair()
+        key = symmetric_encryption_key(generate_symmetric_encryption_key())
+        claim = {"id": "123-abc", "foo": "something-really-private-and-sensitive"}
+
+        for packaged_claim, decrypt in [
+            (
+                AsymmetricClaimEncryptor(claim, public_key_jwk).packaged_claim(),
+                lambda pc: AsymmetricClaimDecryptor(pc, private_key_jwk).decrypt(),
+            ),
+            (
+                SymmetricClaimEncryptor(claim, key, envelope=False).packaged_claim(),
+                lambda pc: SymmetricClaimDecryptor(pc, key).decrypt(),
+            ),
+            (
+                SymmetricClaimEncryptor(claim, key, envelope=True).packaged_claim(),
+                lambda pc: SymmetricClaimDecryptor(pc, key).decrypt(),
+            ),
+        ]:
+            # byte-for-byte what json_encode() of the whole envelope produces
+            self.assertEqual(
+                packaged_claim.as_json(), json_encode(packaged_claim.as_dict())
+            )
+            self.assertEqual(decrypt(packaged_claim.as_json()), claim)
+            self.assertEqual(decrypt(packaged_claim.as_json().encode("utf-8")), claim)
+            # envelopes serialized some other way are still readable
+            self.assertEqual(
+                decrypt(json.dumps(packaged_claim.as_dict(), indent=2)), claim
+            )
+
+    def test_benchmarks(self):
+        with tempfile.NamedTemporaryFile() as output:
+            call_command(
+                "run_benchmarks",
+                "claim_encryption",
+                "--sizes",
+                "1024",
+                "--number",
+                "1",
+                "--repeat",
+                "1",
+                "--output",
+                output.name,
+            )
+            results = json_decode(output.read())["results"]
+        self.assertEqual(len(results), 11)
+        self.assertEqual(results[0]["name"], "claim_encryption.symmetric.encrypt")
+        self.assertEqual(results[0]["params"]["size"], 1024)
+        self.assertGreater(results[0]["median"], 0)
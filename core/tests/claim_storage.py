@@ -1,11 +1,23 @@
 # -*- coding: utf-8 -*-
 from unittest.mock import patch
 import boto3
+from botocore.exceptions import ClientError
 from botocore.stub import Stubber
 from api.test_utils import create_idp, create_swa, create_claimant
-from api.models import Claim
+from api.models import Claim, DataKey
+from jwcrypto.common import json_encode
 
-from core.claim_storage import ClaimWriter, ClaimReader, ClaimStore, ClaimBucket
+from core.claim_storage import (
+    ClaimWriter,
+    ClaimReader,
+    ClaimStore,
+    ClaimBucket,
+    ClaimBatchReader,
+    ClaimFanoutWriter,
+    BUCKET_TYPE_ARCHIVE,
+    encode_archive_payload,
+    decode_archive_payload,
+)
 from core.claim_encryption import (
     SymmetricClaimEncryptor,
     SymmetricClaimDecryptor,
@@ -13,6 +25,7 @@ from core.claim_encryption import (
 )
 from core.test_utils import BucketableTestCase
 import logging
+import threading
 
 
 logger = logging.getLogger(__name__)
@@ -69,6 +82,163 @@ class CoreClaimStorageTestCase(BucketableTestCase):
         decrypted_claim = cd.decrypt()
         self.assertEqual(decrypted_claim, claim_payload)
 
+    def test_claim_batch_reader(self):
+        idp = create_idp()
+        swa, _ = create_swa()
+        claimant = create_claimant(idp)
+        claims = []
+        for loop in range(7):
+            claim = Claim(claimant=claimant, swa=swa)
+            claim.save()
+            # leave one without an artifact
+            if loop != 3:
+                ClaimWriter(claim, f"payload {loop}").write()
+            claims.append(claim)
+
+        reader = ClaimBatchReader(claims, max_workers=2, window=3)
+        results = list(reader.read())
+        self.assertEqual([claim for claim, _ in results], claims)
+        self.assertEqual(
+            [payload for _, payload in results],
+            [
+                "payload 0",
+                "payload 1",
+                "payload 2",
+                False,
+                "payload 4",
+                "payload 5",
+                "payload 6",
+            ],
+        )
+
+    def test_claim_fanout_writer(self):
+        idp = create_idp()
+        swa, _ = create_swa()
+        claimant = create_claimant(idp)
+        claim = Claim(claimant=claimant, swa=swa)
+        claim.save()
+        updated_at = claim.updated_at
+        swa_bucket = ClaimBucket()
+        archive_bucket = ClaimBucket(BUCKET_TYPE_ARCHIVE)
+
+        writer = ClaimFanoutWriter(
+            claim,
+            [
+                (swa_bucket, claim.completed_payload_path(), "swa payload"),
+                (archive_bucket, claim.completed_payload_path(), "archive payload"),
+            ],
+        )
+        with self.assertLogs(level="INFO") as cm:
+            self.assertTrue(writer.write())
+            self.assertIn(
+                f"claim {claim.uuid} write to {swa_bucket.name}", "".join(cm.output)
+            )
+        self.assertEqual(writer.errors, [None, None])
+        self.assertEqual(len(writer.timings), 2)
+        self.assertEqual(
+            sorted(
+                claim.events.filter(category=Claim.EventCategories.STORED).values_list(
+                    "description", flat=True
+                )
+            ),
+            sorted([swa_bucket.name, archive_bucket.name]),
+        )
+        claim.refresh_from_db()
+        self.assertGreater(claim.updated_at, updated_at)
+
+        cr = ClaimReader(
+            claim,
+            claim.completed_payload_path(),
+            claim_store=ClaimStore(claim_bucket=archive_bucket),
+        )
+        self.assertEqual(cr.read(), "archive payload")
+
+        # one failed write means no events
+        def write(claim_store, path, payload):
+            if claim_store.bucket_name == archive_bucket.name:
+                raise ClientError({"Error": {"Code": "500"}}, "PutObject")
+
+        with patch("core.claim_storage.ClaimStore.write", autospec=True) as mock_write:
+            mock_write.side_effect = write
+            writer = ClaimFanoutWriter(
+                claim,
+                [
+                    (swa_bucket, "path/one", "payload"),
+                    (archive_bucket, "path/two", "payload"),
+                ],
+            )
+            with self.assertLogs(level="ERROR"):
+                self.assertFalse(writer.write())
+        self.assertEqual(len([error for error in writer.errors if error]), 1)
+        self.assertEqual(
+            claim.events.filter(category=Claim.EventCategories.STORED).count(), 2
+        )
+
+        # as does a failed write to the local backend
+        with patch("core.claim_storage.ClaimStore.write") as mock_write:
+            mock_write.side_effect = PermissionError("denied")
+            writer = ClaimFanoutWriter(claim, [(swa_bucket, "path/one", "payload")])
+            with self.assertLogs(level="ERROR"):
+                self.assertFalse(writer.write())
+        self.assertEqual(writer.errors, ["denied"])
+
+    def test_claim_fanout_writer_creates_clients_first(self):
+        idp = create_idp()
+        swa, _ = create_swa()
+        claim = Claim(claimant=create_claimant(idp), swa=swa)
+        claim.save()
+        threads = []
+        real_client = boto3.client
+
+        def client(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return real_client(*args, **kwargs)
+
+        writer = ClaimFanoutWriter(
+            claim,
+            [
+                (ClaimBucket(), "path/one", "payload"),
+                (ClaimBucket(BUCKET_TYPE_ARCHIVE), "path/one", "payload"),
+            ],
+        )
+        with patch("core.claim_storage.boto3.client", side_effect=client):
+            self.assertTrue(writer.put())
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+
+    def test_claim_store_delete_data_keys(self):
+        key = symmetric_encryption_key()
+        claim_store = ClaimStore()
+        for path in ["path/one", "path/two"]:
+            packaged_claim = SymmetricClaimEncryptor(
+                {"id": path}, key, envelope=True, path=path
+            ).packaged_claim()
+            claim_store.write(path, packaged_claim.as_json())
+            # the archive copy of an artifact shares its path
+            ClaimStore(ClaimBucket(BUCKET_TYPE_ARCHIVE)).write(path, "{}")
+
+        ClaimStore(ClaimBucket(BUCKET_TYPE_ARCHIVE)).delete(["path/one"])
+        self.assertEqual(DataKey.objects.filter(path="path/one").count(), 1)
+        claim_store.delete(["path/one"])
+        self.assertFalse(DataKey.objects.filter(path="path/one").exists())
+        self.assertTrue(DataKey.objects.filter(path="path/two").exists())
+
+    def test_archive_payload_compression(self):
+        payload = json_encode({"employers": [{"name": "Acme"}] * 50})
+        plain = encode_archive_payload(payload, compress=False)
+        compressed = encode_archive_payload(payload, compress=True)
+        self.assertEqual(plain, payload.encode("utf-8"))
+        self.assertLess(len(compressed), len(plain))
+        self.assertEqual(decode_archive_payload(plain), payload)
+        self.assertEqual(decode_archive_payload(compressed), payload)
+
+        # ClaimReader handles both
+        idp = create_idp()
+        swa, _ = create_swa()
+        claim = Claim(claimant=create_claimant(idp), swa=swa)
+        claim.save()
+        self.assertTrue(ClaimWriter(claim, compressed).write())
+        self.assertEqual(ClaimReader(claim).read(), payload)
+
     def test_claim_storage_exceptions(self):
         with self.assertRaises(ValueError) as context:
             ClaimWriter(True, True)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+from django.http import JsonResponse
+from django.utils import timezone
+from jwcrypto import common
+from decimal import Decimal
+from core.benchmarks import example_claim
+from core.benchmarks import json_codec as json_codec_benchmarks
+from core.json_codec import (
+    FastJsonResponse,
+    OrjsonJsonCodec,
+    StdlibJsonCodec,
+    orjson,
+)
+import core.json_codec
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class JsonCodecTestCase(TestCase):
+    def codecs(self):
+        codecs = [StdlibJsonCodec()]
+        if orjson:
+            codecs.append(OrjsonJsonCodec())
+        return codecs
+
+    def test_json_encode_matches_jwcrypto(self):
+        claim = example_claim()
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                self.assertEqual(codec.json_encode(claim), common.json_encode(claim))
+                # equivalent, though orjson does not escape non-ASCII
+                accented = {"name": "Zoë", "city": "São Paulo"}
+                self.assertEqual(
+                    codec.json_decode(codec.json_encode(accented)),
+                    common.json_decode(common.json_encode(accented)),
+                )
+                self.assertEqual(codec.json_encode(b"abc"), common.json_encode(b"abc"))
+                self.assertEqual(codec.json_decode(common.json_encode(claim)), claim)
+                self.assertEqual(
+                    codec.json_decode(common.json_encode(claim).encode("utf-8")), claim
+                )
+                # too big for orjson
+                self.assertEqual(
+                    codec.json_encode({"n": 2**70}), '{"n":1180591620717411303424}'
+                )
+
+    def test_response_content_matches_json_response(self):
+        data = {
+            "claim": example_claim(),
+            "created_at": timezone.now(),
+            "expires": timezone.now().date(),
+            "id": uuid.uuid4(),
+            "amount": Decimal("1.50"),
+            "big": 2**70,
+        }
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                self.assertEqual(
+                    common.json_decode(codec.response_content(data)),
+                    common.json_decode(JsonResponse(data).content),
+                )
+                with self.assertRaises(TypeError):
+                    codec.response_content({"unknown": object()})
+
+    def test_fast_json_response(self):
+        response = FastJsonResponse({"status": "ok"}, status=202)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(common.json_decode(response.content), {"status": "ok"})
+        self.assertEqual(
+            common.json_decode(FastJsonResponse([1, 2], safe=False).content), [1, 2]
+        )
+        with self.assertRaises(TypeError):
+            FastJsonResponse([1, 2])
+
+    def test_codec(self):
+        self.assertEqual(core.json_codec.codec.name, "orjson" if orjson else "json")
+        self.assertEqual(
+            core.json_codec.json_decode(core.json_codec.json_encode([1])), [1]
+        )
+
+    def test_benchmarks(self):
+        results = json_codec_benchmarks.run(sizes=[1024], number=1, repeat=1)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[0]["name"], "json_codec.partial_claim.JsonResponse")
+        self.assertEqual(results[0]["params"]["codec"], core.json_codec.codec.name)
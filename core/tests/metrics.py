@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
+from django.contrib.sessions.backends.cache import SessionStore
+from django.test import RequestFactory, TestCase
+from prometheus_client import REGISTRY
+from unittest.mock import patch
+from core import instrumentation, metrics
+from core.claim_storage import ClaimStore
+from core.test_utils import create_s3_bucket, delete_s3_bucket
+from api.test_utils import create_swa
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(f"claimantsapi_{name}", labels) or 0
+
+
+class MetricsTestCase(TestCase):
+    def tearDown(self):
+        instrumentation.end_request()
+
+    def test_timed(self):
+        # outside of a request, nothing is recorded
+        with instrumentation.timed("cache", "get"):
+            pass
+        self.assertIsNone(instrumentation.current_timings())
+
+        timings = instrumentation.start_request()
+        with instrumentation.timed("cache", "set_many"):
+            with instrumentation.timed("cache", "set"):
+                pass
+        with instrumentation.timed("crypto", "symmetric_decrypt"):
+            pass
+        self.assertEqual(
+            [(kind, operation) for kind, operation, _ in timings.calls],
+            [("cache", "set_many"), ("crypto", "symmetric_decrypt")],
+        )
+
+    def test_cache_and_s3_calls(self):
+        instrumentation.instrument_boto3()
+        create_s3_bucket()
+        try:
+            timings = instrumentation.start_request()
+            cache.set("metrics-test", "value")
+            cache.get("metrics-test")
+            ClaimStore().write("metrics-test.json", "{}")
+        finally:
+            instrumentation.end_request()
+            delete_s3_bucket()
+        operations = [(kind, operation) for kind, operation, _ in timings.calls]
+        self.assertIn(("cache", "set"), operations)
+        self.assertIn(("cache", "get"), operations)
+        if ClaimStore().backend_name == "s3":
+            self.assertIn(("s3", "PutObject"), operations)
+
+    def test_request_metrics(self):
+        swa, _ = create_swa(is_active=True)
+        labels = {"view": "whoami", "swa": swa.code}
+        requests = sample("request_seconds_count", method="GET", status="200", **labels)
+        queries = sample("request_db_queries_count", **labels)
+
+        self.client.post(
+            "/api/login/",
+            {"email": "someone@example.com", "IAL": "1", "swa_code": swa.code},
+        )
+        self.client.get("/api/whoami/")
+
+        self.assertEqual(
+            sample("request_seconds_count", method="GET", status="200", **labels),
+            requests + 1,
+        )
+        self.assertEqual(sample("request_db_queries_count", **labels), queries + 1)
+        self.assertGreater(
+            sample("cache_call_seconds_count", operation="get", **labels), 0
+        )
+
+    def test_swa_code(self):
+        swa, _ = create_swa(is_active=True)
+        request = RequestFactory().get("/swa/v1/claims/")
+        request.user = swa
+        self.assertEqual(metrics.swa_code(request), swa.code)
+
+        request = RequestFactory().get("/claimant/")
+        request.session = SessionStore()
+        request.session["swa"] = "not-a-swa"
+        self.assertEqual(metrics.swa_code(request), "")
+        request.session["whoami"] = {"swa": {"code": "KS"}}
+        self.assertEqual(metrics.swa_code(request), "KS")
+
+        # a session the view did not use is not loaded
+        request.session = SessionStore()
+        self.assertEqual(metrics.swa_code(request), "")
+        self.assertFalse(request.session.accessed)
+
+    def test_metrics_endpoint(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
+        with patch("core.views.settings.METRICS_TOKEN", "sekrit"):
+            self.assertEqual(self.client.get("/metrics/").status_code, 401)
+            self.assertEqual(
+                self.client.get(
+                    "/metrics/", HTTP_AUTHORIZATION="Bearer wrong"
+                ).status_code,
+                401,
+            )
+            response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer sekrit")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"claimantsapi_request_seconds_bucket", response.content)
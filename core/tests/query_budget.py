@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.urls import get_resolver
+from prometheus_client import REGISTRY
+from api.models import SWA
+from core.exceptions import QueryBudgetExceeded
+from core.query_budget import query_budget
+import api.urls
+import swa.urls
+
+
+@query_budget(2)
+def swa_codes(request):
+    for code in ["KS", "AR", "NJ"]:
+        SWA.objects.filter(code=code).exists()
+    return HttpResponse("ok")
+
+
+@query_budget(3)
+def swa_count(request):
+    return HttpResponse(SWA.objects.count())
+
+
+def exceeded(view):
+    return (
+        REGISTRY.get_sample_value(
+            "claimantsapi_query_budget_exceeded_total", {"view": view}
+        )
+        or 0
+    )
+
+
+class QueryBudgetTestCase(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+
+    def test_within_budget(self):
+        self.assertEqual(swa_count(self.request).status_code, 200)
+        self.assertEqual(swa_count.query_budget, 3)
+
+    def test_raise(self):
+        # the default in tests
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            swa_codes(self.request)
+        message = str(context.exception)
+        self.assertIn(
+            "core.tests.query_budget.swa_codes made 3 queries, over its budget of 2",
+            message,
+        )
+        self.assertIn("Repeated: 3x SELECT", message)
+
+    @override_settings(QUERY_BUDGET_MODE="warn")
+    def test_warn(self):
+        with self.assertLogs("core.query_budget", level="WARNING") as logs:
+            response = swa_codes(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("over its budget of 2", logs.output[0])
+
+    @override_settings(QUERY_BUDGET_MODE="metric")
+    def test_metric(self):
+        view = "core.tests.query_budget.swa_codes"
+        before = exceeded(view)
+        self.assertEqual(swa_codes(self.request).status_code, 200)
+        self.assertEqual(exceeded(view), before + 1)
+
+    def test_views_have_budgets(self):
+        for urls in [api.urls, swa.urls]:
+            for pattern in get_resolver(urls).url_patterns:
+                with self.subTest(view=pattern.lookup_str):
+                    self.assertIsInstance(
+                        getattr(pattern.callback, "query_budget", None), int
+                    )
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from django.test import override_settings
+from botocore.exceptions import ClientError
+from core.claim_storage import BUCKET_TYPE_ARCHIVE, ClaimBucket, ClaimStore
+from core.storage_backends import LocalStorageBackend, MemoryStorageBackend
+from core.test_utils import BucketableTestCase
+import io
+import os
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackendsTestCase(BucketableTestCase):
+    def exercise_backend(self, backend):
+        backend.put("a/1.json", "one")
+        backend.put("a/2.json", b"two")
+        backend.put("b/3.json", io.BytesIO(b"three"))
+
+        self.assertEqual(backend.get("a/1.json"), b"one")
+        self.assertEqual(backend.get("b/3.json"), b"three")
+        with self.assertRaises(ClientError):
+            backend.get("no/such/path")
+
+        self.assertEqual(backend.tail("b/3.json", 3), b"ree")
+        self.assertEqual(backend.tail("b/3.json", 100), b"three")
+        with self.assertRaises(ClientError):
+            backend.tail("no/such/path", 3)
+
+        self.assertTrue(backend.head("a/2.json"))
+        self.assertFalse(backend.head("a/3.json"))
+
+        self.assertEqual(list(backend.list_prefix("a/")), ["a/1.json", "a/2.json"])
+        self.assertEqual(len(list(backend.list_prefix(""))), 3)
+
+        # overwrite
+        backend.put("a/1.json", "uno")
+        self.assertEqual(backend.get("a/1.json"), b"uno")
+
+        resp = backend.delete_many(["a/1.json", "a/2.json"])
+        self.assertCountEqual(
+            [deleted["Key"] for deleted in resp["Deleted"]], ["a/1.json", "a/2.json"]
+        )
+        self.assertEqual(list(backend.list_prefix("")), ["b/3.json"])
+
+    def test_s3_backend(self):
+        claim_store = ClaimStore(claim_bucket=ClaimBucket(BUCKET_TYPE_ARCHIVE))
+        self.assertEqual(claim_store.backend_name, "s3")
+        self.exercise_backend(claim_store.backend)
+
+    def test_memory_backend(self):
+        self.exercise_backend(MemoryStorageBackend("test-bucket"))
+        # shared across instances
+        self.assertTrue(MemoryStorageBackend("test-bucket").head("b/3.json"))
+        self.assertFalse(MemoryStorageBackend("other-bucket").head("b/3.json"))
+        MemoryStorageBackend.reset()
+        self.assertFalse(MemoryStorageBackend("test-bucket").head("b/3.json"))
+
+    def test_local_backend(self):
+        with tempfile.TemporaryDirectory() as root:
+            backend = LocalStorageBackend(root)
+            self.exercise_backend(backend)
+            self.assertTrue(os.path.isfile(os.path.join(root, "b", "3.json")))
+            # no temporary files left behind
+            self.assertEqual(os.listdir(os.path.join(root, "b")), ["3.json"])
+            with self.assertRaises(ValueError):
+                backend.put("../escape.json", "nope")
+
+    def test_backend_per_bucket_type(self):
+        with tempfile.TemporaryDirectory() as root:
+            with override_settings(
+                CLAIM_STORAGE_BACKENDS={"swa": "local", "archive": "memory"},
+                CLAIM_STORAGE_LOCAL_ROOT=root,
+            ):
+                claim_store = ClaimStore()
+                self.assertIsInstance(claim_store.backend, LocalStorageBackend)
+                claim_store.write("path/to/claim.json", "swa payload")
+                self.assertTrue(claim_store.exists("path/to/claim.json"))
+                self.assertEqual(
+                    claim_store.read("path/to/claim.json")["Body"].read(),
+                    b"swa payload",
+                )
+                self.assertTrue(
+                    os.path.isfile(
+                        os.path.join(
+                            root, claim_store.bucket_name, "path/to/claim.json"
+                        )
+                    )
+                )
+
+                archive_store = ClaimStore(
+                    claim_bucket=ClaimBucket(BUCKET_TYPE_ARCHIVE)
+                )
+                self.assertIsInstance(archive_store.backend, MemoryStorageBackend)
+                self.assertFalse(archive_store.exists("path/to/claim.json"))
+
+            with override_settings(CLAIM_STORAGE_BACKENDS={"swa": "nope"}):
+                with self.assertRaises(ValueError):
+                    ClaimStore()
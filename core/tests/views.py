@@ -2,6 +2,9 @@
 from django.test import TestCase, Client
 from django.core import mail
 from core.email import Email
+from django.conf import settings
+from django.core.cache import caches
+from core.health import LOCK_KEY, SAMPLE_KEY, HealthSampler, is_healthy
 import logging
 from unittest.mock import patch, MagicMock
 
@@ -13,6 +16,10 @@ class CoreTestCase(TestCase):
     def setUp(self):
         # Empty the test outbox
         mail.outbox = []
+        # a fresh sample for every probe, not shared with other tests
+        patcher = patch("core.views.health_sampler", HealthSampler(0))
+        self.health_sampler = patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_claimant_page(self):
         response = self.client.get("/claimant/")
@@ -38,7 +45,7 @@ class CoreTestCase(TestCase):
         resp = c.get("/500/")
         self.assertContains(resp, "Sorry, we had a problem", status_code=500)
 
-    @patch("core.views.celery_app.control")
+    @patch("core.health.celery_app.control")
     def test_live_ok(self, patched_celery_app):
         mocked_inspect = MagicMock()
         mocked_active = MagicMock()
@@ -48,7 +55,7 @@ class CoreTestCase(TestCase):
         response = self.client.get("/live/")
         self.assertEqual(response.status_code, 200)
 
-    @patch("core.views.celery_app.control")
+    @patch("core.health.celery_app.control")
     def test_live_zero_celery_workers(self, patched_celery_app):
         mocked_inspect = MagicMock()
         mocked_active = MagicMock()
@@ -62,8 +69,8 @@ class CoreTestCase(TestCase):
             self.assertIn('"celery": 0', cm.output[0])
             self.assertEqual(response.status_code, 503)
 
-    @patch("core.views.celery_app.control")
-    @patch("core.views.connection")
+    @patch("core.health.celery_app.control")
+    @patch("core.health.connection")
     def test_live_db_unreachable(self, patched_db_connection, patched_celery_app):
         mocked_inspect = MagicMock()
         mocked_active = MagicMock()
@@ -79,8 +86,8 @@ class CoreTestCase(TestCase):
             self.assertIn('"celery": 3', cm.output[0])
             self.assertEqual(response.status_code, 503)
 
-    @patch("core.views.celery_app.control")
-    @patch("core.views.cache")
+    @patch("core.health.celery_app.control")
+    @patch("core.health.cache")
     def test_live_redis_unreachable(self, patched_redis_cache, patched_celery_app):
         mocked_inspect = MagicMock()
         mocked_active = MagicMock()
@@ -97,3 +104,61 @@ class CoreTestCase(TestCase):
             self.assertIn('"redis": false', cm.output[0])
             self.assertIn('"celery": 3', cm.output[0])
             self.assertEqual(response.status_code, 503)
+
+    @patch("core.health.celery_app.control")
+    def test_live_cached(self, patched_celery_app):
+        patched_celery_app.inspect.return_value.active.return_value = {"worker1": []}
+        sampler = self.shared_sampler()
+        with patch("core.views.health_sampler", sampler):
+            self.assertEqual(self.client.get("/live/").status_code, 200)
+            self.assertEqual(self.client.get("/live/").status_code, 200)
+            self.assertEqual(patched_celery_app.inspect.call_count, 1)
+
+            # on demand
+            patched_celery_app.inspect.return_value.active.return_value = None
+            with self.assertLogs("core", level="INFO") as cm:
+                self.assertEqual(self.client.get("/live/?deep=1").status_code, 503)
+                self.assertIn('"celery": 0', cm.output[0])
+            self.assertEqual(patched_celery_app.inspect.call_count, 2)
+            # which is now the shared sample
+            with self.assertLogs("core", level="INFO"):
+                self.assertEqual(self.client.get("/live/").status_code, 503)
+            self.assertEqual(patched_celery_app.inspect.call_count, 2)
+
+            # a stale sample is replaced, even while another process holds the lock
+            patched_celery_app.inspect.return_value.active.return_value = {
+                "worker1": []
+            }
+            caches[settings.HEALTH_CACHE_ALIAS].add(LOCK_KEY, 0, 60)
+            self.age_shared_sample(60 * 3 + 1)
+            self.assertEqual(self.client.get("/live/").status_code, 200)
+            self.assertEqual(patched_celery_app.inspect.call_count, 3)
+
+    @patch("core.health.celery_app.control")
+    def test_live_shared_between_processes(self, patched_celery_app):
+        patched_celery_app.inspect.return_value.active.return_value = {"worker1": []}
+        first, second = self.shared_sampler(), self.shared_sampler()
+        self.assertTrue(is_healthy(first.snapshot()))
+        self.assertTrue(is_healthy(second.snapshot()))
+        self.assertEqual(patched_celery_app.inspect.call_count, 1)
+
+        # a due sample is taken by the one process that gets the lock
+        self.age_shared_sample(60)
+        first.snapshot()
+        second.snapshot()
+        self.assertEqual(patched_celery_app.inspect.call_count, 2)
+        self.age_shared_sample(60)
+        second.snapshot()
+        self.assertEqual(patched_celery_app.inspect.call_count, 2)
+
+    def shared_sampler(self):
+        cache = caches[settings.HEALTH_CACHE_ALIAS]
+        cache.delete_many([SAMPLE_KEY, LOCK_KEY])
+        self.addCleanup(cache.delete_many, [SAMPLE_KEY, LOCK_KEY])
+        return HealthSampler(60)
+
+    def age_shared_sample(self, seconds):
+        cache = caches[settings.HEALTH_CACHE_ALIAS]
+        status = cache.get(SAMPLE_KEY)
+        status["sampled_at"] -= seconds
+        cache.set(SAMPLE_KEY, status)
@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.urls import include, path, re_path
 
-from core.views import claimant as claimant_app, live, raise_error
+from core.views import claimant as claimant_app, live, metrics, raise_error
 
 handler404 = "home.views.handle_404"
 handler500 = "home.views.handle_500"
@@ -30,5 +30,6 @@ urlpatterns = [
     path("api/", include("api.urls")),
     path("swa/", include("swa.urls")),
     path("live/", live, name="live"),
+    path("metrics/", metrics, name="metrics"),
     path("reference/", include("reference.urls")),
 ]
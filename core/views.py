@@ -3,14 +3,13 @@ from django.shortcuts import render
 from django.views.decorators.cache import never_cache
 import logging
 import json
-import time
 from django.http import HttpResponse
-from django.db import connection
-from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils.crypto import constant_time_compare
 
 from . import settings
-from .celery import app as celery_app
+from .health import is_healthy, sampler as health_sampler
+from .metrics import exposition
 
 
 logger = logging.getLogger("core")
@@ -38,28 +37,32 @@ def claimant(request):
 
 @never_cache
 def live(request):
-    try:
-        db_start = time.time()
-        connection.ensure_connection()
-        db_ok = connection.is_usable()
-        db_response_time = time.time() - db_start
-    except Exception as err:  # pragma: no cover
-        logger.exception(err)
-        db_ok = False
-        db_response_time = 0
-    redis_start = time.time()
-    redis_ok = cache.client.get_client().ping()
-    redis_response_time = time.time() - redis_start
-    celery_workers = celery_app.control.inspect().active()
-    celery_worker_count = len(celery_workers.keys()) if celery_workers else 0
-    status = 200 if redis_ok and db_ok and celery_worker_count > 0 else 503
-    if status != 200:
-        backend_services_status = {
-            "db": db_ok,
-            "db_response": "{:.3f}".format(db_response_time),
-            "redis": redis_ok,
-            "redis_response": "{:.3f}".format(redis_response_time),
-            "celery": celery_worker_count,
-        }
-        logger.error(json.dumps(backend_services_status))
-    return HttpResponse(status=status)
+    """
+    The latest sample from core.health, or with ?deep=1 a new one.
+    """
+    if request.GET.get("deep") == "1":
+        status = health_sampler.sample()
+    else:
+        status = health_sampler.snapshot()
+    if not is_healthy(status):
+        logger.error(
+            json.dumps(
+                {key: value for key, value in status.items() if key != "sampled_at"}
+            )
+        )
+        return HttpResponse(status=503)
+    return HttpResponse(status=200)
+
+
+@never_cache
+def metrics(request):
+    """
+    Prometheus text format, for a scraper configured with the METRICS_TOKEN bearer token.
+    """
+    if not settings.METRICS_TOKEN:
+        return HttpResponse(status=404)
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    if not constant_time_compare(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+        return HttpResponse(status=401)
+    content, content_type = exposition()
+    return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+# gunicorn reads this file from the directory it is started in (see start-server.sh)
+import os
+
+
+def child_exit(server, worker):
+    # as prometheus_client requires in multiprocess mode, see core/metrics.py
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
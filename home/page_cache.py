@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# @cached_page caches the rendered content of pages that are the same for every visitor
+# (no session, CSRF token or per-user context), in the shared PAGE_CACHE_ALIAS cache.
+# The key varies with everything else the page is rendered from:
+# * the host and path, and only the query params the view reads
+# * the language chosen by LocaleMiddleware
+# * the LaunchDarkly flags the templates read (core.context_processors.ld_flags)
+#   and the settings the views read
+# * a digest of the templates, and of the _swa/<code> templates of the SWA in the path
+# * the SWA registry version, which changes whenever a SWA is saved (see api/swa_registry.py)
+# Responses carry an ETag and Last-Modified, and a matching conditional GET gets a 304.
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils import timezone, translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from api.models import SWA
+from api.swa_registry import swa_registry
+from core.context_processors import ld_flags
+from core.json_codec import json_encode
+import functools
+import hashlib
+import os
+
+KEY_PREFIX = "page"
+TEMPLATE_DIRS = [
+    settings.BASE_DIR / "home" / "templates",
+    settings.BASE_DIR / "reference" / "templates",
+]
+SWA_TEMPLATES = settings.BASE_DIR / "home" / "templates" / "_swa"
+SETTINGS = [
+    "REQUIRE_PREQUAL_START_PAGE",
+    "SHOW_IDP_PAGE_FOR_ALL_SWAS",
+    "ENABLE_TEST_LOGIN",
+    "DISPLAY_TEST_SITE_BANNER",
+]
+
+
+def directory_digest(directory, exclude=None):
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != exclude)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, directory).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def cached_template_version(swa_code):
+    digests = [
+        directory_digest(directory, exclude=str(SWA_TEMPLATES))
+        for directory in TEMPLATE_DIRS
+    ]
+    # only the known SWA directories, so a path cannot name another one
+    if swa_code and swa_code in os.listdir(SWA_TEMPLATES):
+        digests.append(directory_digest(SWA_TEMPLATES / swa_code))
+    return ":".join(digests)
+
+
+# templates change only with a deploy, except in development
+def template_version(swa_code=None):
+    if settings.DEBUG:
+        cached_template_version.cache_clear()
+    return cached_template_version(swa_code)
+
+
+def page_key(request, params, swa_code=None):
+    swa_code = swa_code.upper() if swa_code else None
+    varies_by = {
+        "host": request.get_host(),
+        "scheme": request.scheme,
+        "path": request.path,
+        "params": {param: request.GET.get(param) for param in params},
+        "language": translation.get_language(),
+        "flags": ld_flags(request),
+        "settings": {name: getattr(settings, name) for name in SETTINGS},
+        "templates": template_version(swa_code),
+        "swas": swa_registry.shared_version(),
+    }
+    digest = hashlib.sha256(json_encode(varies_by).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{digest}"
+
+
+def conditional_response(request, page):
+    response = HttpResponse(page["content"], content_type=page["content_type"])
+    response["ETag"] = page["etag"]
+    response["Last-Modified"] = page["last_modified"]
+    # browsers may keep it, but must revalidate with the ETag
+    patch_cache_control(response, no_cache=True)
+    return get_conditional_response(
+        request,
+        etag=page["etag"],
+        last_modified=int(page["rendered_at"]),
+        response=response,
+    )
+
+
+def is_known_swa(swa_code):
+    try:
+        swa_registry.get(swa_code)
+        return True
+    except SWA.DoesNotExist:
+        return False
+
+
+# "params" are the query params the view reads, and requests with any of
+# "uncached_params" (e.g. free text) are not cached, nor are pages for unknown SWAs,
+# so that arbitrary URLs cannot fill the cache.
+def cached_page(params=(), uncached_params=()):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            swa_code = kwargs.get("swa_code")
+            if (
+                request.method not in ("GET", "HEAD")
+                # inside a transaction (e.g. tests) SWAs may yet be rolled back
+                or not swa_registry.cacheable()
+                or any(request.GET.get(param) for param in uncached_params)
+                or (swa_code and not is_known_swa(swa_code))
+            ):
+                return view(request, *args, **kwargs)
+
+            cache = caches[settings.PAGE_CACHE_ALIAS]
+            key = page_key(request, params, swa_code)
+            page = cache.get(key)
+            if page is None:
+                response = view(request, *args, **kwargs)
+                # only complete pages that set nothing for this visitor
+                if response.status_code != 200 or response.cookies:
+                    return response
+                rendered_at = timezone.now()
+                page = {
+                    "content": response.content,
+                    "content_type": response["Content-Type"],
+                    "etag": quote_etag(hashlib.sha256(response.content).hexdigest()),
+                    "rendered_at": rendered_at.timestamp(),
+                    "last_modified": http_date(rendered_at.timestamp()),
+                }
+                cache.set(key, page, settings.PAGE_CACHE_TIMEOUT)
+            return conditional_response(request, page)
+
+        return wrapper
+
+    return decorator
@@ -2,9 +2,11 @@
 from .views import HomeViewsTestCase
 from .local_login import LocalLoginTestCase
 from .identity import IdentityTestCase
+from .page_cache import PageCacheTestCase
 
 __all__ = [
     "HomeViewsTestCase",
     "LocalLoginTestCase",
     "IdentityTestCase",
+    "PageCacheTestCase",
 ]
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import caches
+from django.test import TestCase
+from unittest.mock import patch
+from api.swa_registry import swa_registry
+from api.test_utils import create_swa
+from home import views
+
+
+# TestCase runs each test in a transaction, which the page cache does not cache
+@patch("api.swa_registry.SWARegistry.cacheable", return_value=True)
+class PageCacheTestCase(TestCase):
+    def setUp(self):
+        create_swa(is_active=True, code="ZZ", name="Zed")
+        swa_registry.changed()
+        self.addCleanup(swa_registry.clear)
+        self.addCleanup(caches["insecure"].clear)
+
+    def test_cached_page(self, cacheable):
+        with patch("home.views.render", wraps=views.render) as render:
+            response = self.client.get("/start/ZZ/")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("ETag", response)
+            self.assertIn("Last-Modified", response)
+            self.assertIn("no-cache", response["Cache-Control"])
+
+            cached = self.client.get("/start/ZZ/")
+            self.assertEqual(cached.content, response.content)
+            self.assertEqual(cached["ETag"], response["ETag"])
+            self.assertEqual(render.call_count, 1)
+
+            # a conditional GET
+            not_modified = self.client.get(
+                "/start/ZZ/", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(render.call_count, 1)
+
+            # each language is its own page
+            self.client.get("/start/ZZ/", HTTP_ACCEPT_LANGUAGE="es")
+            self.assertEqual(render.call_count, 2)
+
+            # as is each SWA param of the IdP page, but not other params
+            self.client.get("/idp/?swa=ZZ")
+            self.client.get("/idp/?swa=ZZ&swa_xid=abc")
+            self.assertEqual(render.call_count, 3)
+
+            # free text params are never cached
+            self.client.get("/idp/?swa=ZZ&redirect_to=/claimant/")
+            self.client.get("/idp/?swa=ZZ&redirect_to=/claimant/")
+            self.assertEqual(render.call_count, 5)
+
+            # saving a SWA changes every key
+            swa_registry.changed()
+            self.client.get("/start/ZZ/")
+            self.assertEqual(render.call_count, 6)
+
+    def test_not_cached(self, cacheable):
+        with patch("home.views.render", wraps=views.render) as render:
+            # unknown SWAs
+            for _ in range(2):
+                response = self.client.get("/swa-redirect/XX/")
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("ETag", response)
+            self.assertEqual(render.call_count, 2)
+
+            # errors
+            for _ in range(2):
+                self.assertEqual(self.client.get("/idp/?swa=XX").status_code, 404)
+
+        cacheable.return_value = False
+        self.assertNotIn("ETag", self.client.get("/start/ZZ/"))
@@ -8,7 +8,9 @@ from datetime import timedelta
 from core.utils import session_as_dict, register_local_login
 from django.http import JsonResponse, HttpResponse
 from api.models import SWA
+from api.swa_registry import swa_registry
 from api.whoami import WhoAmI
+from .page_cache import cached_page
 from api.claim_finder import ClaimFinder
 from api.models.claim import DuplicateSwaXid
 import django.middleware.csrf
@@ -47,12 +49,12 @@ def handle_500(request):
 
 
 def active_swas_ordered_by_name():
-    return SWA.active.order_by("name").all()
+    return swa_registry.active_ordered_by_name()
 
 
 def active_swas_with_featuresets():
     swas = {}
-    for swa in SWA.active.all():
+    for swa in swa_registry.active_ordered_by_name():
         swas[swa.code] = swa.for_whoami()
     return swas
 
@@ -62,9 +64,10 @@ def index(request):
 
 
 # the swa-specific pages should be cache-able
+@cached_page()
 def swa_index(request, swa_code):
     try:
-        swa = SWA.active.get(code=swa_code)
+        swa = swa_registry.get(swa_code)
         template_file = (
             "swa-index-identity-only.html"
             if swa.is_identity_only()
@@ -94,7 +97,7 @@ def swa_contact(request, swa_code):
 
     whoami = WhoAmI.from_dict(request.session.get("whoami"))
     try:
-        swa = SWA.active.get(code=swa_code)
+        swa = swa_registry.get(swa_code)
         return render(
             request,
             f"_swa/{swa.code}/contact.html",
@@ -114,12 +117,12 @@ def swa_contact(request, swa_code):
 
 # our IdP "login" page
 # currently only one IdP offered, but could be multiple.
-# TODO support redirect_to via path arg rather than param so we can cache only on path
+@cached_page(params=["swa"], uncached_params=["redirect_to"])
 def idp(request, swa_code=None):
     requested_swa = swa_code if swa_code else request.GET.get("swa", None)
     if requested_swa:
         try:
-            SWA.active.get(code=requested_swa)
+            swa_registry.get(requested_swa)
         except SWA.DoesNotExist:
             return handle_invalid_swa(request, requested_swa)
     elif not settings.SHOW_IDP_PAGE_FOR_ALL_SWAS:
@@ -144,9 +147,10 @@ def idp(request, swa_code=None):
 
 
 # some unhappy-path answer on the /start/* page results in redirect to here
+@cached_page()
 def swa_redirect(request, swa_code):
     try:
-        swa = SWA.active.get(code=swa_code)
+        swa = swa_registry.get(swa_code)
     except SWA.DoesNotExist:
         swa = None
     try:
@@ -309,6 +313,7 @@ def get_states():
     return states
 
 
+@cached_page()
 def start(request):
     if not settings.REQUIRE_PREQUAL_START_PAGE:
         return handle_404(
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from core.json_codec import json_decode, json_encode
+import hashlib
+import logging
+import os
+import requests
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger("logindotgov")
+
+"""
+
+Stands in for the requests module in logindotgov.oidc, so that:
+
+* discovery, JWKS, token and userinfo calls share one pooled Session (and its TLS connections)
+* the discovery document and the JWKS it points to are fetched lazily and cached for
+  LOGIN_DOT_GOV_OIDC_CACHE_SECONDS. The last good copy of each is kept on disk in
+  LOGIN_DOT_GOV_OIDC_CACHE_DIR, and served if login.gov cannot be reached.
+
+"""
+
+DISCOVERY_PATH = "/.well-known/openid-configuration"
+POOL_SIZE = 10
+
+
+class CachedResponse(object):
+    def __init__(self, url, document):
+        self.url = url
+        self.document = document
+        self.status_code = 200
+        self.ok = True
+        self.headers = {"Content-Type": "application/json"}
+
+    @property
+    def text(self):
+        return json_encode(self.document)
+
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
+    def json(self):
+        return self.document
+
+    def raise_for_status(self):
+        pass
+
+
+class OIDCHttp(object):
+    def __init__(self, cache_seconds=None, cache_dir=None, timeout=None):
+        self.cache_seconds = (
+            settings.LOGIN_DOT_GOV_OIDC_CACHE_SECONDS
+            if cache_seconds is None
+            else cache_seconds
+        )
+        self.cache_dir = cache_dir or settings.LOGIN_DOT_GOV_OIDC_CACHE_DIR
+        self.timeout = timeout or settings.LOGIN_DOT_GOV_OIDC_TIMEOUT
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.lock = threading.Lock()
+        # url -> (fetched_at, document)
+        self.documents = {}
+        self.jwks_uris = set()
+
+    # the rest of the requests module (exceptions etc.)
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def is_cacheable(self, url):
+        return url.endswith(DISCOVERY_PATH) or url in self.jwks_uris
+
+    def get(self, url, **kwargs):
+        if not kwargs.get("params") and self.is_cacheable(url):
+            return self.cached_get(url, **kwargs)
+        return self.request("get", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("post", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def cached_get(self, url, **kwargs):
+        with self.lock:
+            cached = self.documents.get(url)
+        if cached and time.time() - cached[0] < self.cache_seconds:
+            return CachedResponse(url, cached[1])
+
+        try:
+            response = self.request("get", url, **kwargs)
+            response.raise_for_status()
+            document = response.json()
+        except (requests.RequestException, ValueError) as error:
+            document = cached[1] if cached else self.read_snapshot(url)
+            if document is None:
+                raise
+            logger.warning("using the last good copy of {}: {}".format(url, error))
+            with self.lock:
+                self.add_jwks_uri(url, document)
+            return CachedResponse(url, document)
+
+        self.remember(url, document)
+        return response
+
+    def remember(self, url, document):
+        with self.lock:
+            self.documents[url] = (time.time(), document)
+            self.add_jwks_uri(url, document)
+        self.write_snapshot(url, document)
+
+    # so the JWKS is cached (and has a last good copy) however discovery was served
+    def add_jwks_uri(self, url, document):
+        if url.endswith(DISCOVERY_PATH) and document.get("jwks_uri"):
+            self.jwks_uris.add(document["jwks_uri"])
+
+    def snapshot_path(self, url):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def read_snapshot(self, url):
+        try:
+            with open(self.snapshot_path(url)) as snapshot:
+                return json_decode(snapshot.read())
+        except (OSError, ValueError):
+            return None
+
+    # several workers may write the same snapshot, so replace it atomically
+    def write_snapshot(self, url, document):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.cache_dir, suffix=".tmp", delete=False
+            ) as snapshot:
+                snapshot.write(json_encode(document))
+            os.replace(snapshot.name, self.snapshot_path(url))
+        except OSError as error:
+            logger.warning("could not write snapshot of {}: {}".format(url, error))
+
+
+def install(oidc_module):
+    if not isinstance(oidc_module.requests, OIDCHttp):
+        oidc_module.requests = OIDCHttp()
+    return oidc_module.requests
@@ -9,7 +9,10 @@ from django.conf import settings
 from api.test_utils import create_swa, create_whoami
 from api.models import IdentityProvider, Claimant, Claim, SWA
 from core.test_utils import create_s3_bucket, delete_s3_bucket
+from .oidc_http import OIDCHttp
 import logging
+import requests
+import tempfile
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -601,3 +604,73 @@ class LoginDotGovTestCase(TestCase):
             f"/logindotgov/?ial=1&swa={swa.code}&swa_xid=badtoken"
         )
         self.assertContains(response, "Web address invalid", status_code=400)
+
+
+class OIDCHttpTestCase(TestCase):
+    discovery_url = "https://idp.example.com/.well-known/openid-configuration"
+    jwks_url = "https://idp.example.com/api/openid_connect/certs"
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def oidc_http(self, **kwargs):
+        http = OIDCHttp(cache_dir=self.cache_dir.name, **kwargs)
+        http.session = MagicMock()
+        http.session.request.side_effect = lambda method, url, **kwargs: MagicMock(
+            status_code=200,
+            json=MagicMock(
+                return_value={"jwks_uri": self.jwks_url}
+                if url == self.discovery_url
+                else {"url": url}
+            ),
+        )
+        return http
+
+    def test_cached(self):
+        http = self.oidc_http()
+        for _ in range(2):
+            self.assertEqual(
+                http.get(self.discovery_url).json(), {"jwks_uri": self.jwks_url}
+            )
+            self.assertEqual(http.get(self.jwks_url).json(), {"url": self.jwks_url})
+            http.post("https://idp.example.com/api/openid_connect/token")
+        self.assertEqual(
+            [call.args for call in http.session.request.call_args_list],
+            [
+                ("get", self.discovery_url),
+                ("get", self.jwks_url),
+                ("post", "https://idp.example.com/api/openid_connect/token"),
+                ("post", "https://idp.example.com/api/openid_connect/token"),
+            ],
+        )
+        self.assertEqual(http.session.request.call_args.kwargs["timeout"], 10)
+
+    def test_last_good_copy(self):
+        self.oidc_http().get(self.discovery_url)
+
+        # a new process, with login.gov unreachable
+        http = self.oidc_http(cache_seconds=0)
+        http.session.request.side_effect = requests.ConnectionError("unreachable")
+        with self.assertLogs("logindotgov", level="WARNING"):
+            response = http.get(self.discovery_url)
+        self.assertEqual(response.json(), {"jwks_uri": self.jwks_url})
+
+        # with no copy at all
+        with self.assertRaises(requests.ConnectionError):
+            http.get("https://other.example.com/.well-known/openid-configuration")
+
+    def test_offline_boot(self):
+        online = self.oidc_http()
+        online.get(self.discovery_url)
+        online.get(self.jwks_url)
+
+        # a new process boots with login.gov unreachable
+        http = self.oidc_http()
+        http.session.request.side_effect = requests.ConnectionError("unreachable")
+        with self.assertLogs("logindotgov", level="WARNING"):
+            self.assertEqual(
+                http.get(self.discovery_url).json(), {"jwks_uri": self.jwks_url}
+            )
+            self.assertEqual(http.get(self.jwks_url).json(), {"url": self.jwks_url})
+        self.assertEqual(http.jwks_uris, {self.jwks_url})
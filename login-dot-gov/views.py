@@ -10,8 +10,10 @@ import os
 import core.context_processors
 import appoptics_apm
 from logindotgov.oidc import LoginDotGovOIDCClient, LoginDotGovOIDCError, IAL2, IAL1
+import logindotgov.oidc
 from core.utils import session_as_dict, hash_idp_user_xid, get_session
 from api.models import Claimant, IdentityProvider, SWA, Claim
+from api.swa_registry import swa_registry
 from api.models.claim import DuplicateSwaXid
 from django.conf import settings
 from api.whoami import WhoAmI, WhoAmIAddress, WhoAmISWA
@@ -19,13 +21,12 @@ from api.identity_claim_maker import IdentityClaimMaker, IdentityClaimValidation
 from core.exceptions import ClaimStorageError
 from core.swa_xid import SwaXid
 from home.views import handle_invalid_swa, handle_404
+from . import oidc_http
 
 logger = logging.getLogger("logindotgov")
 
-if os.environ.get("LOGIN_DOT_GOV_ENV") == "test":
-    logindotgov_config = None
-else:  # pragma: no cover
-    logindotgov_config = LoginDotGovOIDCClient.discover()
+# one pooled HTTP session, and cached discovery and JWKS, for every client
+oidc_http.install(logindotgov.oidc)
 
 DEFAULT_IAL = 1
 ALLOWED_IALS = Claimant.IALOptions.values
@@ -52,8 +53,9 @@ def logindotgov_client():
         private_key=settings.LOGIN_DOT_GOV_PRIVATE_KEY,
         logger=logger,
     )
-    if logindotgov_config:  # pragma: no cover
-        client.config = logindotgov_config
+    # discovered on first use rather than at import, so workers boot without login.gov
+    if os.environ.get("LOGIN_DOT_GOV_ENV") != "test":  # pragma: no cover
+        client.config = LoginDotGovOIDCClient.discover()
     return client
 
 
@@ -132,7 +134,7 @@ def index(request):
         return handle_404(request, "Missing swa or swa_code")
 
     try:
-        swa = SWA.active.get(code=swa_code)
+        swa = swa_registry.get(swa_code)
     except SWA.DoesNotExist:
         return handle_invalid_swa(request, swa_code)
 
@@ -238,7 +240,7 @@ def result(request):
     except LoginDotGovOIDCError as error:
         logger.exception(error)
         if "swa" in request.session:
-            swa = SWA.active.get(code=request.session.get("swa"))
+            swa = swa_registry.get(request.session.get("swa"))
             return render(
                 request,
                 "auth-error.html",
@@ -365,7 +367,7 @@ def initiate_claimant_session(request, userinfo):
     whoami, claimant = build_whoami_and_claimant(userinfo, request_IAL, claimant_IAL)
 
     # 'swa' key must exist because we required it in index()
-    swa = SWA.active.get(code=request.session["swa"])
+    swa = swa_registry.get(request.session["swa"])
     whoami.swa = WhoAmISWA(**swa.for_whoami())
 
     # create db artifacts, and optionally, Identity claim
@@ -385,8 +387,10 @@ def initiate_claimant_session(request, userinfo):
             status=500,
         )
 
-    if swa.is_identity_only() and claimant.pending_identity_only_claim():
-        write_identity_only_claim(whoami, claimant)
+    if swa.is_identity_only():
+        claim = claimant.pending_identity_only_claim()
+        if claim:
+            write_identity_only_claim(whoami, claim)
 
     request.session["logindotgov"]["userinfo"] = userinfo
     request.session["whoami"] = whoami.as_dict()
@@ -424,8 +428,7 @@ def initiate_claim_with_swa_xid(request, whoami, claimant, swa):
         whoami.claim_id = str(claim.uuid)
 
 
-def write_identity_only_claim(whoami, claimant):
-    claim = claimant.pending_identity_only_claim()
+def write_identity_only_claim(whoami, claim):
     claim_maker = IdentityClaimMaker(claim, whoami)
     try:
         claim_maker.create()
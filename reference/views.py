@@ -1,20 +1,25 @@
 # -*- coding: utf-8 -*-
 from django.shortcuts import render
+from home.page_cache import cached_page
 
 
+@cached_page()
 def index(request):
     return render(request, "reference/index.html", {"active": "introduction"})
 
 
+@cached_page()
 def plain_language(request):
     return render(
         request, "reference/plain_language.html", {"active": "plain_language"}
     )
 
 
+@cached_page()
 def open_source(request):
     return render(request, "reference/open_source.html", {"active": "open_source"})
 
 
+@cached_page()
 def iterating(request):
     return render(request, "reference/iterating.html", {"active": "iterating"})
@@ -16,4 +16,7 @@ do
 done
 make celery-touch-logs
 make celery-watch-logs &
+# gunicorn workers share their Prometheus metrics through files here, see core/metrics.py
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 gunicorn core.wsgi:application --bind 0.0.0.0:8000 --access-logfile -
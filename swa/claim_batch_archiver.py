@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# pack newly completed Claims for a SWA into a single gzipped NDJSON archive,
+# plus a signed manifest of per-Claim digests, and write them to the SWA bucket.
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from jwcrypto import jwk, jws
+from jwcrypto.common import base64url_encode, json_encode
+from api.models import Claim, Event
+from core.claim_storage import ClaimBatchReader, ClaimStore
+from core.exceptions import ClaimStorageError
+import gzip
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# spill the archive to disk once it grows past this many bytes
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+MISSING_ARTIFACT = "missing artifact"
+SIGNING_ALG = "ES256"
+
+
+def signing_key(key):
+    if isinstance(key, jwk.JWK):
+        return key
+    return jwk.JWK.from_pem(key if isinstance(key, bytes) else key.encode("utf-8"))
+
+
+# a compact JWS of the manifest, with the payload detached (the manifest itself)
+def sign_manifest(manifest, key):
+    key = signing_key(key)
+    token = jws.JWS(manifest)
+    token.add_signature(
+        key,
+        alg=SIGNING_ALG,
+        protected=json_encode({"alg": SIGNING_ALG, "kid": key.thumbprint()}),
+    )
+    token.detach_payload()
+    return token.serialize(compact=True)
+
+
+# raises jwcrypto.jws.InvalidJWSSignature unless "signature" signs "manifest" (bytes)
+def verify_manifest(manifest, signature, public_key):
+    header, _, sig = signature.split(".")
+    token = jws.JWS()
+    token.deserialize(
+        ".".join([header, base64url_encode(manifest), sig]),
+        key=signing_key(public_key),
+        alg=SIGNING_ALG,
+    )
+    return True
+
+
+class ClaimBatchArchiver(object):
+    """
+    Requires:
+    * "swa" SWA whose newly completed Claims to archive
+    * "claim_store" (optional) ClaimStore to write the archive to
+    * "signing_key" (optional) private key (PEM or JWK) the manifest is signed with,
+      defaults to settings.CLAIM_BATCH_SIGNING_KEY
+    """
+
+    def __init__(self, swa, claim_store=None, max_claims=None, signing_key=None):
+        self.swa = swa
+        self.signing_key = signing_key or settings.CLAIM_BATCH_SIGNING_KEY
+        self.claim_store = claim_store or ClaimStore()
+        self.max_claims = max_claims or settings.CLAIM_BATCH_ARCHIVE_MAX_CLAIMS
+        self.created_at = timezone.now()
+        batch_name = self.created_at.strftime("%Y%m%d-%H%M%S-%f")
+        self.archive_path = f"{swa.code}/batches/{batch_name}.ndjson.gz"
+        self.manifest_path = f"{swa.code}/batches/{batch_name}.manifest.json"
+        self.signature_path = f"{swa.code}/batches/{batch_name}.manifest.jws"
+
+    def claims(self):
+        return (
+            self.swa.claim_queue()
+            .without_events(Claim.EventCategories.BATCHED)
+            .select_related("swa")
+            .order_by("created_at", "id")[: self.max_claims]
+        )
+
+    def manifest(self, claim_entries, archive_digest):
+        return {
+            "swa_code": self.swa.code,
+            "created_at": self.created_at.isoformat(),
+            "archive": self.archive_path,
+            "archive_sha256": archive_digest,
+            "signature": self.signature_path,
+            "total_claims": len(claim_entries),
+            "claims": claim_entries,
+        }
+
+    # returns the list of Claims included in the archive
+    def archive(self):
+        if not self.signing_key:
+            raise ClaimStorageError("CLAIM_BATCH_SIGNING_KEY is not configured")
+        claim_entries = []
+        archived_claims = []
+        missing_claims = []
+        reader = ClaimBatchReader(
+            self.claims(),
+            path_for=lambda claim: claim.completed_payload_path(),
+            claim_store=self.claim_store,
+        )
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as archive_file:
+            with gzip.GzipFile(fileobj=archive_file, mode="wb") as gz:
+                for claim, packaged_claim in reader.read():
+                    if not packaged_claim:
+                        logger.error("Missing artifact for claim {}".format(claim.uuid))
+                        # a Claim whose artifact cannot be read is retried next time,
+                        # but one with no artifact would hold its place in every batch.
+                        if not self.claim_store.exists(claim.completed_payload_path()):
+                            missing_claims.append(claim)
+                        continue
+                    line = packaged_claim.strip().encode("utf-8")
+                    gz.write(line + b"\n")
+                    claim_entries.append(
+                        {
+                            "claim_id": str(claim.uuid),
+                            "line": len(claim_entries) + 1,
+                            "sha256": hashlib.sha256(line).hexdigest(),
+                        }
+                    )
+                    archived_claims.append(claim)
+
+            self.record_batched_claims(missing_claims, MISSING_ARTIFACT)
+            if not archived_claims:
+                logger.debug("🚀 no new completed claims for {}".format(self.swa.code))
+                return []
+
+            archive_file.seek(0)
+            archive_digest = hashlib.sha256()
+            for chunk in iter(lambda: archive_file.read(1024 * 1024), b""):
+                archive_digest.update(chunk)
+            archive_file.seek(0)
+            try:
+                manifest = json_encode(
+                    self.manifest(claim_entries, archive_digest.hexdigest())
+                ).encode("utf-8")
+                self.claim_store.write(self.archive_path, archive_file)
+                self.claim_store.write(
+                    self.signature_path, sign_manifest(manifest, self.signing_key)
+                )
+                # the manifest is written last so its presence means the archive is complete.
+                self.claim_store.write(self.manifest_path, manifest)
+            except Exception as error:
+                logger.exception(error)
+                raise ClaimStorageError(
+                    "Failed to write claim batch archive {}".format(self.archive_path)
+                )
+
+        self.record_batched_claims(archived_claims, self.archive_path)
+        logger.info(
+            "Archived {} claims for {} to {}".format(
+                len(archived_claims), self.swa.code, self.archive_path
+            )
+        )
+        return archived_claims
+
+    def record_batched_claims(self, claims, description):
+        if not claims:
+            return
+        claim_content_type = ContentType.objects.get_for_model(Claim)
+        with transaction.atomic():
+            Event.objects.bulk_create(
+                [
+                    Event(
+                        model_name=claim_content_type,
+                        model_id=claim.id,
+                        category=Claim.EventCategories.BATCHED,
+                        description=description,
+                    )
+                    for claim in claims
+                ]
+            )
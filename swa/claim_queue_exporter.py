@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# stream every Claim in a SWA's queue as newline-delimited JSON (NDJSON)
+from django.db.models import Q
+from jwcrypto.common import json_encode
+from core.claim_storage import ClaimBatchReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+# how many Claim rows to fetch from the db per query
+BATCH_SIZE = 100
+
+
+class ClaimQueueExporter(object):
+    """
+    Requires:
+    * "swa" SWA whose claim_queue() to export
+    * "after" (optional) Claim to resume after, as the last Claim delivered in a previous export
+    """
+
+    def __init__(self, swa, after=None, batch_size=None):
+        self.swa = swa
+        self.after = after
+        self.batch_size = batch_size or BATCH_SIZE
+
+    def queue(self):
+        return self.swa.claim_queue().select_related("swa").order_by("created_at", "id")
+
+    # walk the queue in keyset-paginated batches so that memory use is flat
+    # regardless of queue size, and so that each query is cheap.
+    def claims(self):
+        last = self.after
+        while True:
+            queryset = self.queue()
+            if last:
+                queryset = queryset.filter(
+                    Q(created_at__gt=last.created_at)
+                    | Q(created_at=last.created_at, id__gt=last.id)
+                )
+            batch = list(queryset[: self.batch_size])
+            for claim in batch:
+                yield claim
+            if len(batch) < self.batch_size:
+                return
+            last = batch[-1]
+
+    def lines(self):
+        reader = ClaimBatchReader(
+            self.claims(), path_for=lambda claim: claim.completed_payload_path()
+        )
+        for claim, packaged_claim in reader.read():
+            if not packaged_claim:
+                yield json_encode(
+                    {
+                        "claim_id": str(claim.uuid),
+                        "error": f"claim {claim.uuid} missing",
+                    }
+                ) + "\n"
+            else:
+                yield packaged_claim.strip() + "\n"
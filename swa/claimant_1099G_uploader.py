@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
-from jwcrypto.common import json_decode, base64url_decode
+from jwcrypto.common import base64url_decode
 import os
 from api.models import ClaimantFile
 from core.exceptions import ClaimStorageError
 from core.claim_storage import ClaimWriter
+from core.json_codec import json_decode
 from core.claim_encryption import (
     SymmetricClaimEncryptor,
     symmetric_encryption_key,
@@ -22,7 +23,7 @@ class InvalidUploadError(Exception):
 class Claimant1099GUploader(object):
     def __init__(self, request, claimant):
         self.swa = request.user
-        self.payload = json_decode(request.body.decode("utf-8"))
+        self.payload = json_decode(request.body)
         self.claimant = claimant
         self.invalid = None
         self.error = None
@@ -46,7 +47,9 @@ class Claimant1099GUploader(object):
         # conveniently, a ClaimantFile has the same interface as a Claim so we treat it like one.
         self.payload["id"] = str(self.claimant_file.uuid)
         sym_encryptor = SymmetricClaimEncryptor(
-            self.payload, symmetric_encryption_key()
+            self.payload,
+            symmetric_encryption_key(),
+            path=self.claimant_file.payload_path(),
         )
         packaged_file = sym_encryptor.packaged_claim()
         packaged_payload = packaged_file.as_json()
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from api.models import SWA
+from api.swa_registry import swa_registry
 
 # NOTE this is *not* the jwcrypto.jwt library, but pyjwt
 # we use pyjwt because it has an API to allow for verify_signature:false
@@ -92,7 +93,7 @@ class JwtAuthorizer(object):
         # are they an active SWA?
         swa_code = unverified_claims["iss"]
         try:
-            swa = SWA.active.get(code=swa_code)
+            swa = swa_registry.get(swa_code)
         except SWA.DoesNotExist:
             raise JwtError("Invalid iss value: {}".format(swa_code))
 
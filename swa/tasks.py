@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+from celery import shared_task
+from api.models import SWA
+from .claim_batch_archiver import ClaimBatchArchiver
+
+
+@shared_task
+def archive_completed_claims(swa_code):
+    swa = SWA.active.get(code=swa_code)
+    return len(ClaimBatchArchiver(swa).archive())
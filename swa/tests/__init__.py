@@ -2,5 +2,11 @@
 from .views import SwaTestCase
 from .uploader import Claimant1099GUploaderTestCase
 from .jwt_authorizer import JwtAuthorizerTestCase
+from .claim_batch_archiver import ClaimBatchArchiverTestCase
 
-__all__ = ["SwaTestCase", "Claimant1099GUploaderTestCase", "JwtAuthorizerTestCase"]
+__all__ = [
+    "SwaTestCase",
+    "Claimant1099GUploaderTestCase",
+    "JwtAuthorizerTestCase",
+    "ClaimBatchArchiverTestCase",
+]
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from botocore.exceptions import ClientError
+from django.test import override_settings
+from jwcrypto import jwk
+from jwcrypto.common import json_decode, json_encode
+from jwcrypto.jws import InvalidJWSSignature
+from api.models import Claim
+from api.test_utils import create_swa, create_idp, create_claimant
+from core.claim_storage import ClaimStore, ClaimWriter
+from core.exceptions import ClaimStorageError
+from core.test_utils import BucketableTestCase
+from swa.claim_batch_archiver import (
+    ClaimBatchArchiver,
+    MISSING_ARTIFACT,
+    verify_manifest,
+)
+from unittest.mock import patch
+import gzip
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimBatchArchiverTestCase(BucketableTestCase):
+    def setUp(self):
+        super().setUp()
+        idp = create_idp()
+        self.claimant = create_claimant(idp)
+        self.swa, _ = create_swa(True)
+
+    def create_completed_claim(self, payload):
+        claim = Claim(claimant=self.claimant, swa=self.swa)
+        claim.save()
+        claim.events.create(category=Claim.EventCategories.COMPLETED)
+        if payload:
+            ClaimWriter(claim, json_encode(payload)).write()
+        return claim
+
+    def read_object(self, path):
+        return ClaimStore().read(path)["Body"].read()
+
+    def test_archive(self):
+        claims = [self.create_completed_claim({"doc": loop}) for loop in range(3)]
+        claim_with_no_payload = self.create_completed_claim(None)
+        fetched_claim = self.create_completed_claim({"doc": "fetched"})
+        fetched_claim.events.create(category=Claim.EventCategories.FETCHED)
+
+        archiver = ClaimBatchArchiver(self.swa)
+        with self.assertLogs(level="ERROR") as cm:
+            archived_claims = archiver.archive()
+            self.assertIn(
+                f"Missing artifact for claim {claim_with_no_payload.uuid}",
+                "".join(cm.output),
+            )
+        self.assertEqual(archived_claims, claims)
+
+        archive = self.read_object(archiver.archive_path)
+        lines = gzip.decompress(archive).splitlines()
+        self.assertEqual(
+            [json_decode(line) for line in lines], [{"doc": loop} for loop in range(3)]
+        )
+
+        manifest_bytes = self.read_object(archiver.manifest_path)
+        manifest = json_decode(manifest_bytes)
+        self.assertEqual(manifest["swa_code"], self.swa.code)
+        self.assertEqual(manifest["archive"], archiver.archive_path)
+        self.assertEqual(
+            manifest["archive_sha256"], hashlib.sha256(archive).hexdigest()
+        )
+        self.assertEqual(manifest["total_claims"], 3)
+        self.assertEqual(manifest["signature"], archiver.signature_path)
+        self.assertEqual(
+            manifest["claims"],
+            [
+                {
+                    "claim_id": str(claim.uuid),
+                    "line": idx + 1,
+                    "sha256": hashlib.sha256(lines[idx]).hexdigest(),
+                }
+                for idx, claim in enumerate(claims)
+            ],
+        )
+
+        for claim in claims:
+            event = claim.events.get(category=Claim.EventCategories.BATCHED)
+            self.assertEqual(event.description, archiver.archive_path)
+        # so that it is not a candidate for every later batch
+        event = claim_with_no_payload.events.get(category=Claim.EventCategories.BATCHED)
+        self.assertEqual(event.description, MISSING_ARTIFACT)
+        # batched claims remain in the API queue until fetched
+        self.assertEqual(self.swa.claim_queue().count(), 4)
+
+        # nothing new to archive
+        archiver = ClaimBatchArchiver(self.swa)
+        self.assertEqual(archiver.archive(), [])
+
+        # max_claims caps the archive size
+        newer_claims = [self.create_completed_claim({"doc": loop}) for loop in range(3)]
+        archived_claims = ClaimBatchArchiver(self.swa, max_claims=2).archive()
+        self.assertEqual(archived_claims, newer_claims[:2])
+
+    def test_archive_signature(self):
+        self.create_completed_claim({"doc": 1})
+        signing_key = jwk.JWK.generate(kty="EC", crv="P-256")
+        public_key = signing_key.export_to_pem()
+        archiver = ClaimBatchArchiver(self.swa, signing_key=signing_key)
+        archiver.archive()
+
+        manifest = self.read_object(archiver.manifest_path)
+        signature = self.read_object(archiver.signature_path).decode("utf-8")
+        self.assertTrue(verify_manifest(manifest, signature, public_key))
+        with self.assertRaises(InvalidJWSSignature):
+            verify_manifest(manifest.replace(b"}", b" }"), signature, public_key)
+        other_key = jwk.JWK.generate(kty="EC", crv="P-256")
+        with self.assertRaises(InvalidJWSSignature):
+            verify_manifest(manifest, signature, other_key.export_to_pem())
+
+        # never unsigned
+        with override_settings(CLAIM_BATCH_SIGNING_KEY=False):
+            with self.assertRaises(ClaimStorageError):
+                ClaimBatchArchiver(self.swa).archive()
+
+    def test_archive_read_error(self):
+        claim = self.create_completed_claim({"doc": 1})
+        archiver = ClaimBatchArchiver(self.swa)
+        with patch.object(archiver.claim_store, "read") as mocked_read:
+            mocked_read.side_effect = ClientError({}, "GetObject")
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(archiver.archive(), [])
+        # an artifact that exists is retried by the next batch
+        self.assertFalse(
+            claim.events.filter(category=Claim.EventCategories.BATCHED).exists()
+        )
+        self.assertEqual(ClaimBatchArchiver(self.swa).archive(), [claim])
+
+    def test_archive_storage_error(self):
+        claim = self.create_completed_claim({"doc": 1})
+        archiver = ClaimBatchArchiver(self.swa)
+        with patch.object(archiver.claim_store, "write") as mocked_write:
+            mocked_write.side_effect = Exception("boom")
+            with self.assertRaises(ClaimStorageError), self.assertLogs(level="ERROR"):
+                archiver.archive()
+        self.assertFalse(
+            claim.events.filter(category=Claim.EventCategories.BATCHED).exists()
+        )
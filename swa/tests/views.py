@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 from django.conf import settings
 from unittest.mock import MagicMock, patch
-from jwcrypto.common import json_encode, base64url_encode, base64url_decode
+from jwcrypto.common import (
+    json_encode,
+    json_decode,
+    base64url_encode,
+    base64url_decode,
+)
 import logging
 from core.test_utils import generate_auth_token
 from core.test_utils import BucketableTestCase
@@ -349,6 +354,75 @@ class SwaTestCase(BucketableTestCase):
             },
         )
 
+    def test_client_GET_v1_claims_export(self):
+        idp = create_idp()
+        swa, private_key_jwk = create_swa(True)
+        claimant = create_claimant(idp)
+
+        # empty queue
+        header_token = generate_auth_token(private_key_jwk, swa.code)
+        response = self.client.get(
+            "/swa/v1/claims/export/", HTTP_AUTHORIZATION=format_jwt(header_token)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(b"".join(response.streaming_content), b"")
+
+        # more claims than a single batch, in created_at order
+        claims = []
+        for loop in range(5):
+            claim = Claim(claimant=claimant, swa=swa)
+            claim.save()
+            claim.events.create(category=Claim.EventCategories.COMPLETED)
+            cw = ClaimWriter(claim, json_encode({"doc": loop}))
+            cw.write()
+            claims.append(claim)
+
+        # one with a missing artifact
+        claim_with_no_payload = Claim(swa=swa, claimant=claimant)
+        claim_with_no_payload.save()
+        claim_with_no_payload.events.create(category=Claim.EventCategories.COMPLETED)
+
+        with patch("swa.claim_queue_exporter.BATCH_SIZE", 2):
+            header_token = generate_auth_token(private_key_jwk, swa.code)
+            response = self.client.get(
+                "/swa/v1/claims/export/", HTTP_AUTHORIZATION=format_jwt(header_token)
+            )
+            lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(
+            [json_decode(line) for line in lines],
+            [{"doc": loop} for loop in range(5)]
+            + [
+                {
+                    "claim_id": str(claim_with_no_payload.uuid),
+                    "error": f"claim {claim_with_no_payload.uuid} missing",
+                }
+            ],
+        )
+
+        # resume after the 3rd claim
+        header_token = generate_auth_token(private_key_jwk, swa.code)
+        response = self.client.get(
+            f"/swa/v1/claims/export/?after={claims[2].uuid}",
+            HTTP_AUTHORIZATION=format_jwt(header_token),
+        )
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json_decode(lines[0]), {"doc": 3})
+
+        # invalid resume point
+        for after in ["not-a-uuid", str(uuid.uuid4())]:
+            header_token = generate_auth_token(private_key_jwk, swa.code)
+            response = self.client.get(
+                f"/swa/v1/claims/export/?after={after}",
+                HTTP_AUTHORIZATION=format_jwt(header_token),
+            )
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(
+                response.json(),
+                {"status": "error", "error": "invalid after claim id"},
+            )
+
     def test_v1_act_on_claim_GET_details(self):
         idp = create_idp()
         swa, private_key_jwk = create_swa(True)
@@ -6,6 +6,8 @@ from . import views
 urlpatterns = [
     path("", views.index, name="index"),
     path("v1/claims/", views.GET_v1_claims, name="GET_v1_claims"),
+    # must come before the <claim_uuid_or_swa_xid> pattern
+    path("v1/claims/export/", views.GET_v1_claims_export, name="GET_v1_claims_export"),
     path(
         "v1/claims/<claim_uuid_or_swa_xid>/",
         views.v1_act_on_claim,
@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
 from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_http_methods
 import core.context_processors
-from jwcrypto.common import json_decode
+from core.json_codec import FastJsonResponse, json_decode
+from core.query_budget import query_budget
 from core.claim_storage import ClaimReader
 from core.swa_xid import SwaXid
 from api.models import Claim, Claimant
 from api.claim_serializer import ClaimSerializer
 from .claimant_1099G_uploader import Claimant1099GUploader
+from .claim_queue_exporter import ClaimQueueExporter
 import logging
 import uuid
 
@@ -18,11 +21,13 @@ from launchdarkly.client import ld_client
 logger = logging.getLogger(__name__)
 
 
+@query_budget(0)
 @never_cache
 def index(request):
     return HttpResponse("hello world")
 
 
+@query_budget(3)
 @require_http_methods(["GET"])
 @never_cache
 def GET_v1_claims(request):
@@ -37,14 +42,15 @@ def GET_v1_claims(request):
         )
     encrypted_claims = []
     for claim in page_of_claims.object_list:
-        cr = ClaimReader(claim)
+        # the queue holds only completed claims
+        cr = ClaimReader(claim, path=claim.completed_payload_path())
         encrypted_claim = cr.read()
         if not encrypted_claim:
             encrypted_claims.append({"error": f"claim {claim.uuid} missing"})
         else:
             encrypted_claims.append(json_decode(encrypted_claim))
 
-    return JsonResponse(
+    return FastJsonResponse(
         {
             "total_claims": queue.count,
             "next": next_page_url,
@@ -54,12 +60,38 @@ def GET_v1_claims(request):
     )
 
 
+"""
+Stream the entire Claim queue as newline-delimited JSON, one packaged Claim per line.
+Pass ?after=<claim id> to resume after the last Claim received in a previous export.
+"""
+
+
+@query_budget(2)
+@require_http_methods(["GET"])
+@never_cache
+def GET_v1_claims_export(request):
+    after = None
+    if request.GET.get("after"):
+        try:
+            after = Claim.objects.get(uuid=request.GET["after"], swa=request.user)
+        except (Claim.DoesNotExist, ValidationError):
+            return FastJsonResponse(
+                {"status": "error", "error": "invalid after claim id"}, status=404
+            )
+
+    exporter = ClaimQueueExporter(request.user, after=after)
+    return StreamingHttpResponse(
+        exporter.lines(), content_type="application/x-ndjson", status=200
+    )
+
+
 """
 Act on an individual Claim. Based on the HTTP method
 and request payload, route further to specific method.
 """
 
 
+@query_budget(8)
 @require_http_methods(["GET", "DELETE", "PATCH"])
 @never_cache
 def v1_act_on_claim(request, claim_uuid_or_swa_xid):
@@ -70,7 +102,7 @@ def v1_act_on_claim(request, claim_uuid_or_swa_xid):
         if not swa_xid.format_ok():
             logger.exception(err)
             logger.error("Invalid swa_xid")
-            return JsonResponse(
+            return FastJsonResponse(
                 {"status": "error", "error": "invalid claim id format"}, status=400
             )
 
@@ -79,7 +111,7 @@ def v1_act_on_claim(request, claim_uuid_or_swa_xid):
         if not claim:
             raise Claim.DoesNotExist("no match for {}".format(claim_uuid_or_swa_xid))
     except Claim.DoesNotExist:
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "invalid claim id"}, status=404
         )
 
@@ -87,7 +119,7 @@ def v1_act_on_claim(request, claim_uuid_or_swa_xid):
     # at this point we know it's a valid SWA that somehow got the wrong ID value.
     # so "we're among friends" might be appropriate to return 401 to be explicit about why we fail.
     if claim.swa != request.user:
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "permission denied"}, status=401
         )
 
@@ -95,9 +127,9 @@ def v1_act_on_claim(request, claim_uuid_or_swa_xid):
     if request.method == "GET":
         return GET_v1_claim_details(claim)
     elif request.method == "PATCH":
-        payload = json_decode(request.body.decode("utf-8"))
+        payload = json_decode(request.body)
         if len(payload) != 1:
-            return JsonResponse(
+            return FastJsonResponse(
                 {"status": "error", "error": "only one value expected in payload"},
                 status=400,
             )
@@ -113,21 +145,21 @@ def v1_act_on_claim(request, claim_uuid_or_swa_xid):
     elif request.method == "DELETE":
         return DELETE_v1_claim(claim)
 
-    return JsonResponse({"status": "error", "error": "unknown action"}, status=400)
+    return FastJsonResponse({"status": "error", "error": "unknown action"}, status=400)
 
 
 def GET_v1_claim_details(claim):
     serializer = ClaimSerializer(claim)
-    return JsonResponse(serializer.for_swa(), status=200)
+    return FastJsonResponse(serializer.for_swa(), status=200)
 
 
 def PATCH_v1_claim_status(claim, new_status):
     try:
         claim.change_status(new_status)
-        return JsonResponse({"status": "ok"}, status=200)
+        return FastJsonResponse({"status": "ok"}, status=200)
     except Exception as err:
         logger.exception(err)
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "failed to save change"}, status=500
         )
 
@@ -135,10 +167,10 @@ def PATCH_v1_claim_status(claim, new_status):
 def PATCH_v1_claim_fetched(claim):
     try:
         claim.events.create(category=Claim.EventCategories.FETCHED)
-        return JsonResponse({"status": "ok"}, status=200)
+        return FastJsonResponse({"status": "ok"}, status=200)
     except Exception as err:
         logger.exception(err)
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "failed to save change"}, status=500
         )
 
@@ -149,10 +181,10 @@ def PATCH_v1_claim_resolved(claim, reason):
             category=Claim.EventCategories.RESOLVED,
             description=(reason if reason else "[none]"),
         )
-        return JsonResponse({"status": "ok"}, status=200)
+        return FastJsonResponse({"status": "ok"}, status=200)
     except Exception as err:
         logger.exception(err)
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "failed to save change"}, status=500
         )
 
@@ -160,15 +192,15 @@ def PATCH_v1_claim_resolved(claim, reason):
 def DELETE_v1_claim(claim):
     from api.models.claim import SUCCESS, NOOP
 
-    error_response = JsonResponse(
+    error_response = FastJsonResponse(
         {"status": "error", "error": "failed to delete artifacts"}, status=500
     )
     try:
         resp = claim.delete_artifacts()
         if resp == SUCCESS:
-            return JsonResponse({"status": "ok"}, status=200)
+            return FastJsonResponse({"status": "ok"}, status=200)
         elif resp == NOOP:
-            return JsonResponse({"status": "noop"}, status=404)
+            return FastJsonResponse({"status": "noop"}, status=404)
         else:  # pragma: no cover
             return error_response
     except Exception as err:
@@ -181,6 +213,7 @@ upload a 1099-G file
 """
 
 
+@query_budget(8)
 @require_http_methods(["POST"])
 @never_cache
 def v1_act_on_claimant_1099G(request, claimant_id):
@@ -189,13 +222,15 @@ def v1_act_on_claimant_1099G(request, claimant_id):
     )
     if not ld_flag_set:
         logger.debug("allow-1099g-upload off")
-        return JsonResponse({"status": "error", "error": "route not found"}, status=404)
+        return FastJsonResponse(
+            {"status": "error", "error": "route not found"}, status=404
+        )
 
     if request.method == "POST":
         return v1_POST_1099G(request, claimant_id)
 
     # in theory we never get here but some defensiveness in case someone fails to sync require_http_methods
-    return JsonResponse(
+    return FastJsonResponse(
         {"status": "error", "error": "unknown action"}, status=400
     )  # pragma: no cover
 
@@ -205,14 +240,20 @@ def v1_POST_1099G(request, claimant_id):
         claimant = Claimant.objects.get(idp_user_xid=claimant_id)
     except Claimant.DoesNotExist:
         logger.debug("🚀 no claimant for claimant_id {}".format(claimant_id))
-        return JsonResponse(
+        return FastJsonResponse(
             {"status": "error", "error": "no such Claimant"}, status=404
         )
 
     uploader = Claimant1099GUploader(request, claimant)
     if uploader.invalid:
-        return JsonResponse({"status": "error", "error": uploader.invalid}, status=400)
+        return FastJsonResponse(
+            {"status": "error", "error": uploader.invalid}, status=400
+        )
     if uploader.save():
-        return JsonResponse({"status": "ok", "1099G": uploader.form_uuid()}, status=200)
+        return FastJsonResponse(
+            {"status": "ok", "1099G": uploader.form_uuid()}, status=200
+        )
     else:
-        return JsonResponse({"status": "error", "error": uploader.error}, status=500)
+        return FastJsonResponse(
+            {"status": "error", "error": uploader.error}, status=500
+        )